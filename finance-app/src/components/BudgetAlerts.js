@@ -6,6 +6,9 @@ function BudgetAlerts() {
   const [alerts, setAlerts] = useState([]);
 
   useEffect(() => {
+    let eventSource;
+    let closed = false;
+
     const fetchAlerts = async () => {
       try {
         const response = await api.get('/budget_alerts');
@@ -15,13 +18,35 @@ function BudgetAlerts() {
       }
     };
 
-    fetchAlerts();
+    // New alerts are pushed over server-sent events instead of polling
+    const connect = () => {
+      const token = localStorage.getItem('jwt_token');
+      if (!token || closed) return;
+      eventSource = new EventSource(`${api.defaults.baseURL}/events?jwt=${token}`);
+      eventSource.addEventListener('budget_alert', (event) => {
+        const alert = JSON.parse(event.data);
+        setAlerts((current) => [alert, ...current.filter((existing) => existing.id !== alert.id)]);
+      });
+      eventSource.onerror = async () => {
+        // The token may have expired: refetch (which refreshes it) and reconnect
+        eventSource.close();
+        await fetchAlerts();
+        setTimeout(connect, 5000);
+      };
+    };
+
+    fetchAlerts().then(connect);
+
+    return () => {
+      closed = true;
+      if (eventSource) eventSource.close();
+    };
   }, []);
 
   return (
     <Box sx={{ mb: 3 }}>
       {alerts.map((alert, index) => (
-        <Alert key={index} severity="warning" sx={{ mb: 1 }}>
+        <Alert key={alert.id || index} severity="warning" sx={{ mb: 1 }}>
           {alert.message}
         </Alert>
       ))}
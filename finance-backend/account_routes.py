@@ -0,0 +1,100 @@
+from flask import Blueprint, current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db, cache
+from replica_routing import read_only
+from query_budget import query_budget
+from models import Account, Transaction
+from archive_service import delete_account_archives
+
+account_bp = Blueprint('account', __name__)
+
+
+@account_bp.route('/accounts', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(1)
+def get_accounts():
+    user_id = get_jwt_identity()
+    try:
+        accounts = Account.query.filter_by(user_id=user_id).all()
+        return jsonify([account.to_dict() for account in accounts]), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching accounts for user {user_id}: {str(e)}")
+        return jsonify({"error": "An error occurred while fetching accounts"}), 500
+
+
+@account_bp.route('/accounts/<int:account_id>', methods=['GET'])
+@jwt_required()
+@read_only
+def get_account(account_id):
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"Fetching account {account_id} for user {user_id}")
+    try:
+        account = Account.query.filter_by(id=account_id, user_id=user_id).first()
+        if not account:
+            return jsonify({"error": "Account not found"}), 404
+
+        formatted_account = {
+            'id': account.id,
+            'name': account.name,
+            'balance': account.balance,
+            'type': account.type,
+            'subtype': account.subtype,
+            'plaid_account_id': account.plaid_account_id
+        }
+
+        return jsonify(formatted_account), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching account {account_id} for user {user_id}: {str(e)}")
+        return jsonify({"error": "An error occurred while fetching the account"}), 500
+
+
+@account_bp.route('/accounts_summary', methods=['GET'])
+@jwt_required()
+def get_accounts_summary():
+    user_id = get_jwt_identity()
+    accounts = Account.query.filter_by(user_id=user_id).all()
+    total_balance = sum(account.balance for account in accounts)
+    # Add real-time balance check using Plaid's Balance API
+    updated_balances = get_real_time_balances(access_token)
+    # Update account balances in the database
+    update_account_balances(user_id, updated_balances)
+    cache.delete(f'accounts_user_{user_id}')
+    return jsonify({
+        'totalBalance': total_balance,
+        'numberOfAccounts': len(accounts)
+    }), 200
+
+
+@account_bp.route('/accounts/<string:account_id>', methods=['DELETE'])
+@jwt_required()
+def delete_account(account_id):
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"Attempting to delete account {account_id} for user {user_id}")
+
+    try:
+        # Find the account
+        account = Account.query.filter_by(
+            plaid_account_id=account_id,
+            user_id=user_id
+        ).first()
+
+        if not account:
+            current_app.logger.warning(f"Account {account_id} not found for user {user_id}")
+            return jsonify({"error": "Account not found"}), 404
+
+        # Delete related transactions first, archived ones included
+        Transaction.query.filter_by(account_id=account.id).delete()
+        delete_account_archives(user_id, account.id)
+
+        # Delete the account
+        db.session.delete(account)
+        db.session.commit()
+
+        current_app.logger.info(f"Successfully deleted account {account_id} for user {user_id}")
+        return jsonify({"message": "Account deleted successfully"}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deleting account {account_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,30 @@
+import hmac
+from functools import wraps
+from flask import current_app, jsonify, request
+
+
+def bearer_token_matches(token):
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def token_required(config_key):
+    """Protect a view with the bearer token in config_key.
+
+    The view answers 404 while the token is unset, so operator endpoints
+    are off unless configured.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = current_app.config[config_key]
+            if not token:
+                return jsonify({"error": "Not found"}), 404
+            if not bearer_token_matches(token):
+                return jsonify({"error": "Unauthorized"}), 401
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+admin_required = token_required('ADMIN_TOKEN')
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, jsonify, request, send_file
+from admin_auth import admin_required
+from slow_query import top_slow_queries
+from profiling import PROFILE_HEADER, create_profile_token, list_profiles, get_profile, profile_stats_path
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+@admin_bp.route('/slow_queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    """The slowest statements by total time, from this process's ring buffer
+    or, with ?source=table, from the slow_query table"""
+    source = request.args.get('source', 'buffer')
+    if source not in ('buffer', 'table'):
+        return jsonify({"error": "source must be 'buffer' or 'table'"}), 400
+    if source == 'table' and not current_app.config['SLOW_QUERY_STORE']:
+        return jsonify({"error": "Slow queries are not stored; set SLOW_QUERY_STORE"}), 400
+    limit = request.args.get('limit', 20, type=int)
+    if limit is None or not 1 <= limit <= 100:
+        return jsonify({"error": "limit must be between 1 and 100"}), 400
+    hours = request.args.get('hours', type=int)
+    since = datetime.utcnow() - timedelta(hours=hours) if hours else None
+
+    return jsonify({
+        "threshold_ms": current_app.config['SLOW_QUERY_MS'],
+        "source": source,
+        "queries": top_slow_queries(limit, source, since)
+    }), 200
+
+
+@admin_bp.route('/profile_tokens', methods=['POST'])
+@admin_required
+def create_profile_token_route():
+    """A token that runs requests to one path under the profiler until it expires.
+
+    Send it in the X-Profile-Token header (or ?_profile=) of the request to
+    profile; the response's X-Profile-Id names the stored profile.
+    """
+    data = request.get_json() or {}
+    path = data.get('path')
+    method = data.get('method', 'GET').upper()
+    ttl_seconds = data.get('ttl_seconds', 300)
+    max_ttl = current_app.config['PROFILE_TOKEN_MAX_TTL']
+    if not path or not path.startswith('/'):
+        return jsonify({"error": "path must be a URL path such as /balance_history"}), 400
+    if not isinstance(ttl_seconds, int) or not 1 <= ttl_seconds <= max_ttl:
+        return jsonify({"error": f"ttl_seconds must be between 1 and {max_ttl}"}), 400
+
+    token, expires = create_profile_token(method, path, ttl_seconds)
+    return jsonify({
+        "token": token,
+        "header": PROFILE_HEADER,
+        "method": method,
+        "path": path,
+        "expires_at": datetime.utcfromtimestamp(expires).isoformat()
+    }), 201
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+@admin_required
+def get_profiles():
+    return jsonify(list_profiles()), 200
+
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def get_profile_route(profile_id):
+    profile = get_profile(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify(profile), 200
+
+
+@admin_bp.route('/profiles/<profile_id>/download', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    """The raw cProfile stats, for pstats, snakeviz and the like"""
+    path = profile_stats_path(profile_id)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{profile_id}.prof')
@@ -0,0 +1,252 @@
+import json
+import zlib
+from collections import defaultdict
+from datetime import date
+from flask import current_app
+from sqlalchemy import func, insert
+from extensions import db
+from models import Transaction, TransactionArchive, TransactionDailyRollup
+from money import minor_units, to_minor_units, from_minor_units
+from partitioning import month_start, add_months, create_month_partition, drop_empty_partitions
+
+# Budget periods are at most a year, so the current one never reaches back
+# into archived months; a shorter TRANSACTION_ARCHIVE_MONTHS is raised to this
+MIN_ARCHIVE_MONTHS = 13
+
+# Transaction columns kept in an archive, in order
+ARCHIVED_COLUMNS = [column.name for column in Transaction.__table__.columns]
+_DATE_COLUMNS = {'date', 'authorized_date'}
+
+
+def archive_horizon(today=None):
+    """The first day still kept live: transactions dated before it are
+    archived, or None when archiving is off"""
+    months = current_app.config['TRANSACTION_ARCHIVE_MONTHS']
+    if not months:
+        return None
+    return add_months(month_start(today or date.today()), -max(months, MIN_ARCHIVE_MONTHS))
+
+
+def reaches_archive(start_date):
+    """Whether a range starting at start_date covers archived months"""
+    horizon = archive_horizon()
+    return horizon is not None and start_date is not None and start_date < horizon
+
+
+def _encode_row(transaction):
+    row = []
+    for column in ARCHIVED_COLUMNS:
+        value = getattr(transaction, column)
+        if column == 'amount':
+            value = to_minor_units(value)
+        elif column in _DATE_COLUMNS and value is not None:
+            value = value.isoformat()
+        row.append(value)
+    return row
+
+
+def _decode_row(row):
+    values = dict(zip(ARCHIVED_COLUMNS, row))
+    values['amount'] = from_minor_units(values['amount'])
+    for column in _DATE_COLUMNS:
+        if values[column] is not None:
+            values[column] = date.fromisoformat(values[column])
+    # Never added to a session; read like any queried transaction
+    return Transaction(**values)
+
+
+def _pack(rows):
+    return zlib.compress(json.dumps({'columns': ARCHIVED_COLUMNS, 'rows': rows}, separators=(',', ':')).encode())
+
+
+def _unpack(payload):
+    data = json.loads(zlib.decompress(payload))
+    # Archives written before a column was added lack it
+    columns = data['columns']
+    return [[dict(zip(columns, row)).get(column) for column in ARCHIVED_COLUMNS] for row in data['rows']]
+
+
+def _add_rollups(user_id, transactions):
+    """Fold transactions into the daily rollup, adding to existing rows"""
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    for transaction in transactions:
+        amount = to_minor_units(transaction.amount)
+        entry = totals[(transaction.account_id, transaction.date, transaction.category)]
+        entry[0] += 1
+        entry[1] += amount
+        entry[2] += max(amount, 0)
+        entry[3] += max(-amount, 0)
+
+    days = {day for _, day, _ in totals}
+    existing = {
+        (rollup.account_id, rollup.date, rollup.category): rollup
+        for rollup in TransactionDailyRollup.query.filter(
+            TransactionDailyRollup.user_id == user_id,
+            TransactionDailyRollup.date >= min(days),
+            TransactionDailyRollup.date <= max(days)
+        )
+    }
+    for (account_id, day, category), (count, total, deposits, withdrawals) in totals.items():
+        rollup = existing.get((account_id, day, category))
+        if rollup is None:
+            db.session.add(TransactionDailyRollup(
+                user_id=user_id, account_id=account_id, date=day, category=category, transaction_count=count,
+                total=from_minor_units(total), deposits=from_minor_units(deposits),
+                withdrawals=from_minor_units(withdrawals)
+            ))
+            continue
+        rollup.transaction_count += count
+        rollup.total = from_minor_units(to_minor_units(rollup.total) + total)
+        rollup.deposits = from_minor_units(to_minor_units(rollup.deposits) + deposits)
+        rollup.withdrawals = from_minor_units(to_minor_units(rollup.withdrawals) + withdrawals)
+
+
+def archive_user_month(user_id, month):
+    """Move one user's transactions for one month into its archive and the
+    daily rollup, in a single database transaction; returns how many moved"""
+    transactions = Transaction.query.filter(
+        Transaction.user_id == user_id,
+        Transaction.date >= month,
+        Transaction.date < add_months(month, 1)
+    ).order_by(Transaction.date, Transaction.id).all()
+    if not transactions:
+        return 0
+
+    archive = TransactionArchive.query.filter_by(user_id=user_id, month=month).first()
+    rows = _unpack(archive.payload) if archive else []
+    # Late arrivals for an archived month join its existing archive
+    rows.extend(_encode_row(transaction) for transaction in transactions)
+    if archive is None:
+        archive = TransactionArchive(user_id=user_id, month=month)
+        db.session.add(archive)
+    archive.payload = _pack(rows)
+    archive.row_count = len(rows)
+
+    _add_rollups(user_id, transactions)
+    Transaction.query.filter(Transaction.id.in_([transaction.id for transaction in transactions])).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    return len(transactions)
+
+
+def archive_transactions(logger=None):
+    """Archive every transaction dated before the archive horizon.
+
+    Each user-month is archived and committed on its own, so a failed or
+    interrupted run leaves nothing half-moved and the next one carries on.
+    Returns the number of transactions archived.
+    """
+    horizon = archive_horizon()
+    if horizon is None:
+        return 0
+
+    archived = 0
+    oldest = db.session.query(Transaction.user_id, func.min(Transaction.date)).filter(
+        Transaction.date < horizon
+    ).group_by(Transaction.user_id).all()
+    for user_id, first_date in oldest:
+        month = month_start(first_date)
+        while month < horizon:
+            try:
+                archived += archive_user_month(user_id, month)
+            except Exception as e:
+                db.session.rollback()
+                if logger:
+                    logger.error(f"Error archiving transactions of user {user_id} for {month:%Y-%m}: {str(e)}")
+            month = add_months(month, 1)
+
+    # Emptied monthly partitions give their space back at once
+    dropped = drop_empty_partitions(horizon)
+    if logger:
+        logger.info(f"Archived {archived} transactions from before {horizon}"
+                    + (f", dropped partitions {', '.join(dropped)}" if dropped else ""))
+    return archived
+
+
+def archived_transactions(user_id, start_date, end_date=None):
+    """A user's archived transactions dated from start_date (to end_date),
+    newest first, as unsaved Transaction objects.
+
+    Reads nothing unless the range reaches past the archive horizon.
+    """
+    if not reaches_archive(start_date):
+        return []
+    archives = TransactionArchive.query.filter(
+        TransactionArchive.user_id == user_id,
+        TransactionArchive.month >= month_start(start_date),
+        *([TransactionArchive.month <= end_date] if end_date else [])
+    ).all()
+    transactions = [
+        transaction for archive in archives for transaction in map(_decode_row, _unpack(archive.payload))
+        if transaction.date >= start_date and (end_date is None or transaction.date <= end_date)
+    ]
+    return sorted(transactions, key=lambda transaction: (transaction.date, transaction.id), reverse=True)
+
+
+def with_archived(transactions, user_id, start_date, end_date=None):
+    """Live transactions (newest first) followed by the archived ones in the range"""
+    archived = archived_transactions(user_id, start_date, end_date)
+    return transactions + archived if archived else transactions
+
+
+def rollup_totals(user_id, start_date, end_date, *columns, filters=(), group_by=()):
+    """Sums of rollup columns (in minor units) over archived days in a range,
+    for adding to the same sums over live transactions. Runs no query when
+    the range is entirely live."""
+    if not reaches_archive(start_date):
+        return []
+    return db.session.query(
+        *group_by, *(func.coalesce(func.sum(minor_units(column)), 0) for column in columns)
+    ).filter(
+        TransactionDailyRollup.user_id == user_id,
+        *([TransactionDailyRollup.date >= start_date] if start_date else []),
+        *([TransactionDailyRollup.date <= end_date] if end_date else []),
+        *filters
+    ).group_by(*group_by).all()
+
+
+def delete_account_archives(user_id, account_id):
+    """Remove an account's transactions from the archives and rollups"""
+    TransactionDailyRollup.query.filter_by(user_id=user_id, account_id=account_id).delete()
+    for archive in TransactionArchive.query.filter_by(user_id=user_id).all():
+        rows = [row for row in _unpack(archive.payload)
+                if row[ARCHIVED_COLUMNS.index('account_id')] != account_id]
+        if not rows:
+            db.session.delete(archive)
+        elif len(rows) != archive.row_count:
+            archive.payload = _pack(rows)
+            archive.row_count = len(rows)
+
+
+def restore_archives(since, user_id=None, logger=None):
+    """Move archived months from `since` onwards back into the transaction
+    table, e.g. after raising TRANSACTION_ARCHIVE_MONTHS; returns how many
+    transactions were restored"""
+    query = TransactionArchive.query.filter(TransactionArchive.month >= month_start(since))
+    if user_id is not None:
+        query = query.filter(TransactionArchive.user_id == user_id)
+
+    restored = 0
+    for archive in query.order_by(TransactionArchive.user_id, TransactionArchive.month).all():
+        rows = [dict(zip(ARCHIVED_COLUMNS, row)) for row in _unpack(archive.payload)]
+        for row in rows:
+            for column in _DATE_COLUMNS:
+                if row[column] is not None:
+                    row[column] = date.fromisoformat(row[column])
+            row['amount'] = from_minor_units(row['amount'])
+        # A partition dropped once the month was archived has to come back first
+        create_month_partition(archive.month)
+        db.session.execute(insert(Transaction), rows)
+        # Rollup rows only ever hold archived days, so the month's go entirely
+        TransactionDailyRollup.query.filter(
+            TransactionDailyRollup.user_id == archive.user_id,
+            TransactionDailyRollup.date >= archive.month,
+            TransactionDailyRollup.date < add_months(archive.month, 1)
+        ).delete(synchronize_session=False)
+        db.session.delete(archive)
+        db.session.commit()
+        restored += len(rows)
+        if logger:
+            logger.info(f"Restored {len(rows)} transactions of user {archive.user_id} for {archive.month:%Y-%m}")
+    return restored
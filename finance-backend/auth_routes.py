@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from werkzeug.security import check_password_hash
+from extensions import db, cache, limiter
+from models import User
+
+auth_bp = Blueprint('auth', __name__)
+
+
+@auth_bp.route('/register', methods=['POST'])
+def register():
+    data = request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+    email = data.get('email')
+
+    if not username or not password or not email:
+        return jsonify({'message': 'Username, email, and password are required'}), 400
+
+    # Check if user already exists
+    if User.query.filter_by(username=username).first():
+        return jsonify({'message': 'Username already exists'}), 400
+
+    if User.query.filter_by(email=email).first():
+        return jsonify({'message': 'Email already exists'}), 400
+
+    try:
+        new_user = User(
+            username=username,
+            email=email
+        )
+        new_user.set_password(password)  # Use the model's method to hash password
+
+        db.session.add(new_user)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'User created successfully',
+            'user': {
+                'id': new_user.id,
+                'username': new_user.username,
+                'email': new_user.email
+            }
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error creating user: {str(e)}")
+        return jsonify({'message': 'Error creating user'}), 500
+
+
+@auth_bp.route('/login', methods=['POST'])
+@limiter.limit("5 per minute")
+def login():
+    data = request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+
+    current_app.logger.info(f"Login attempt: username={username}")
+
+    if not username or not password:
+        return jsonify({'message': 'Username and password are required'}), 400
+
+    user = User.query.filter_by(username=username).first()
+
+    if user and check_password_hash(user.password_hash, password):
+        access_token = create_access_token(identity=user.id)
+
+        return jsonify({
+            'access_token': access_token,
+            'user': {
+                'id': user.id,
+                'email': user.email,
+                'username': user.username,
+            }
+        }), 200
+
+    # Handle failed login attempt
+    if user:
+        user.failed_login_attempts += 1
+        if user.failed_login_attempts >= 5:  # Lock account after 5 failed attempts
+            user.account_locked_until = datetime.now(timezone.utc) + timedelta(minutes=15)
+        db.session.commit()
+
+    return jsonify({'message': 'Invalid credentials'}), 401
+
+
+@auth_bp.route('/check_users', methods=['GET'])
+def check_users():
+    users = User.query.all()
+    return jsonify([{"id": user.id, "username": user.username} for user in users])
+
+
+@auth_bp.route('/protected', methods=['GET'])
+@jwt_required()
+def protected():
+    current_user = get_jwt_identity()
+    return jsonify(logged_in_as=current_user), 200
+
+
+@auth_bp.route('/refresh_token', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh_token():
+    try:
+        user_id = get_jwt_identity()
+        new_token = create_access_token(identity=user_id)
+        return jsonify(access_token=new_token), 200
+    except Exception as e:
+        current_app.logger.error(f"Token refresh failed: {str(e)}")
+        return jsonify({"msg": "Token refresh failed"}), 401
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"User {user_id} logged out")
+    return jsonify({"message": "Logged out successfully"}), 200
+
+
+@auth_bp.route('/profile', methods=['GET'])
+@jwt_required()
+def get_profile():
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify({
+        "username": user.username,
+        "email": user.email
+    })
+
+
+@auth_bp.route('/profile', methods=['PUT'])
+@jwt_required()
+def update_profile():
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    data = request.json
+    user.username = data.get('username', user.username)
+    user.email = data.get('email', user.email)
+    db.session.commit()
+    cache.delete(f'profile_user_{user_id}')
+
+    return jsonify({"message": "Profile updated successfully"})
@@ -0,0 +1,40 @@
+import traceback
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db
+from batch_service import validate_sub_requests, run_batch
+from rate_limiting import rate_cost, sub_requests_cost
+
+batch_bp = Blueprint('batch', __name__)
+
+
+def _batch_cost():
+    # A batch draws on the caller's budget as its sub-requests would
+    data = request.get_json(silent=True)
+    return sub_requests_cost(data.get('requests') if isinstance(data, dict) else None)
+
+
+@batch_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@rate_cost(_batch_cost)
+def batch():
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    sub_requests = data.get('requests')
+
+    error = validate_sub_requests(sub_requests, current_app.config['BATCH_MAX_REQUESTS'])
+    if error:
+        return jsonify({"error": error}), 400
+
+    current_app.logger.info(f"Dispatching batch of {len(sub_requests)} requests for user {user_id}")
+    headers = {'Authorization': request.headers.get('Authorization')}
+    max_workers = min(len(sub_requests), current_app.config['BATCH_MAX_WORKERS'])
+
+    try:
+        responses = run_batch(sub_requests, headers, max_workers)
+        return jsonify({"responses": responses}), 200
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in batch: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({"error": "An error occurred while processing the batch"}), 500
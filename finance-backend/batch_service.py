@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.exceptions import HTTPException
+
+ALLOWED_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+READ_ONLY_METHODS = {'GET'}
+
+
+def validate_sub_requests(sub_requests, max_requests):
+    """Return an error message for a malformed batch, or None if it is valid"""
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return "requests must be a non-empty list"
+    if len(sub_requests) > max_requests:
+        return f"A batch may contain at most {max_requests} requests"
+
+    for sub in sub_requests:
+        if not isinstance(sub, dict):
+            return "Each request must be an object"
+        method = str(sub.get('method', 'GET')).upper()
+        path = sub.get('path')
+        if method not in ALLOWED_METHODS:
+            return f"Unsupported method: {method}"
+        if not isinstance(path, str) or not path.startswith('/'):
+            return "Each request needs a path starting with '/'"
+        if path.split('?')[0].rstrip('/') == '/batch':
+            return "Nested batch requests are not allowed"
+    return None
+
+
+def dispatch_sub_request(app, sub, headers):
+    """Run one sub-request through the app's URL map and view functions.
+
+    The request is dispatched without the before/after request hooks, so the
+    rate limiter only counts the outer /batch call, which is charged the
+    sub-requests' costs. The view decorators (jwt_required, caching and
+    per-route limits) still apply as normal.
+    """
+    method = str(sub.get('method', 'GET')).upper()
+    with app.test_request_context(
+        sub['path'],
+        method=method,
+        query_string=sub.get('query'),
+        json=sub.get('body'),
+        headers=headers
+    ):
+        try:
+            try:
+                rv = app.dispatch_request()
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.make_response(rv)
+        except HTTPException as e:
+            response = e.get_response()
+        except Exception as e:
+            app.logger.error(f"Error in batch sub-request {method} {sub['path']}: {str(e)}")
+            return {'status': 500, 'body': {'error': 'An unexpected error occurred'}}
+
+        if response.is_json:
+            body = response.get_json()
+        else:
+            body = response.get_data(as_text=True)
+        return {'status': response.status_code, 'body': body}
+
+
+def _dispatch_read_only(app, sub, headers):
+    # Each worker thread gets its own app context and therefore its own session
+    with app.app_context():
+        return dispatch_sub_request(app, sub, headers)
+
+
+def run_batch(sub_requests, headers, max_workers):
+    """Dispatch a list of sub-requests and return their results in order.
+
+    Consecutive read-only requests are run concurrently on a thread pool.
+    Writes run one at a time in the caller's app context so they share its
+    database session and are applied in the order they were sent.
+    """
+    app = current_app._get_current_object()
+    results = [None] * len(sub_requests)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        for index, sub in enumerate(sub_requests):
+            method = str(sub.get('method', 'GET')).upper()
+            if method in READ_ONLY_METHODS and max_workers > 1:
+                pending.append((index, executor.submit(_dispatch_read_only, app, sub, headers)))
+                continue
+
+            # Reads sent before a write must see the state before it
+            for pending_index, future in pending:
+                results[pending_index] = future.result()
+            pending = []
+            results[index] = dispatch_sub_request(app, sub, headers)
+
+        for pending_index, future in pending:
+            results[pending_index] = future.result()
+
+    return results
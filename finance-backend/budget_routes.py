@@ -0,0 +1,324 @@
+from datetime import datetime, date, timedelta
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from extensions import db, cache
+from replica_routing import read_only
+from query_budget import query_budget
+from rate_limiting import rate_cost
+from models import Budget, BudgetAlert, Transaction
+from budget_service import (
+    get_user_budget_alerts,
+    resolve_recurrence_period,
+    budget_history,
+    RECURRENCE_PERIODS,
+    FIXED_PERIOD
+)
+from money import minor_units, to_minor_units, from_minor_units
+
+budget_bp = Blueprint('budget', __name__)
+
+
+def _valid_recurrence_period(recurrence_period):
+    """A named period, 'N days', or none for a one-off budget"""
+    return recurrence_period is None or recurrence_period in RECURRENCE_PERIODS or (
+        isinstance(recurrence_period, str) and FIXED_PERIOD.match(recurrence_period) is not None
+    )
+
+
+def _duplicate_period_response(recurrence_period, budget_category, start_date):
+    # uq_budget_recurring_period: this period of the chain already exists
+    db.session.rollback()
+    return jsonify({"error": f"A {recurrence_period} {budget_category} budget starting {start_date} already exists"}), 409
+
+
+@budget_bp.route('/set_budget', methods=['POST'])
+@jwt_required()
+def set_budget():
+    user_id = get_jwt_identity()
+    data = request.json
+    budget_category = data.get('budget_category')
+    budget_limit = data.get('budget_limit')
+    start_date = date.fromisoformat(data.get('start_date', date.today().isoformat()))
+    end_date = date.fromisoformat(data.get('end_date', (date.today() + timedelta(days=30)).isoformat()))
+    is_recurring = data.get('is_recurring', False)
+    recurrence_period = data.get('recurrence_period')
+    current_spending = data.get('current_spending', 0.0)
+
+    if not all([budget_category, budget_limit]):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    if not _valid_recurrence_period(recurrence_period):
+        return jsonify({"error": "recurrence_period must be weekly, monthly, yearly or 'N days'"}), 400
+
+    new_budget = Budget(
+        user_id=user_id,
+        budget_category=budget_category,
+        budget_limit=budget_limit,
+        start_date=start_date,
+        end_date=end_date,
+        is_recurring=is_recurring,
+        recurrence_period=recurrence_period,
+        current_spending=current_spending
+    )
+    db.session.add(new_budget)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        return _duplicate_period_response(recurrence_period, budget_category, start_date)
+    return jsonify({"message": "Budget created successfully"}), 201
+
+
+@budget_bp.route('/budget_status', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(1)
+def get_budget_status():
+    user_id = get_jwt_identity()
+    # Each budget's spending as a correlated subquery, so one statement
+    # however many budgets there are
+    spent = db.session.query(func.sum(Transaction.amount)).filter(
+        Transaction.user_id == Budget.user_id,
+        Transaction.category == Budget.budget_category,
+        Transaction.date >= Budget.start_date,
+        Transaction.date <= Budget.end_date
+    ).scalar_subquery()
+    budgets = db.session.query(Budget, spent).filter(Budget.user_id == user_id).all()
+    budget_status = []
+
+    for budget, total_spent in budgets:
+        total_spent = total_spent or 0.0
+
+        remaining = from_minor_units(
+            to_minor_units(budget.budget_limit) - to_minor_units(total_spent)
+        )
+        status = "On Track" if remaining > 0 else "Over Budget"
+
+        budget_status.append({
+            "id": budget.id,
+            "category": budget.budget_category,
+            "limit": float(budget.budget_limit),
+            "spent": float(total_spent),
+            "remaining": float(remaining),
+            "status": status,
+            "start_date": budget.start_date.isoformat(),
+            "end_date": budget.end_date.isoformat(),
+            "is_recurring": budget.is_recurring,
+            "recurrence_period": budget.recurrence_period
+        })
+
+    return jsonify(budget_status), 200
+
+
+@budget_bp.route('/budget_history/<int:budget_id>', methods=['GET'])
+@jwt_required()
+@read_only
+@rate_cost(3)
+def get_budget_history(budget_id):
+    user_id = get_jwt_identity()
+    budget = Budget.query.filter_by(id=budget_id, user_id=user_id).first()
+    if not budget:
+        return jsonify({"error": "Budget not found"}), 404
+
+    periods = request.args.get('periods', 12, type=int)
+    max_periods = current_app.config['BUDGET_HISTORY_MAX_PERIODS']
+    if periods is None or not 1 <= periods <= max_periods:
+        return jsonify({"error": f"periods must be between 1 and {max_periods}"}), 400
+
+    try:
+        return jsonify({
+            "id": budget.id,
+            "category": budget.budget_category,
+            "recurrence_period": resolve_recurrence_period(budget),
+            "periods": budget_history(budget, periods)
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Error getting history for budget {budget_id}: {str(e)}")
+        return jsonify({"error": "An error occurred while fetching the budget history"}), 500
+
+
+@budget_bp.route('/budget_summary', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(1)
+def get_budget_summary():
+    user_id = get_jwt_identity()
+    total_budget, total_spent = db.session.query(
+        func.coalesce(func.sum(minor_units(Budget.budget_limit)), 0),
+        func.coalesce(func.sum(minor_units(Budget.current_spending)), 0)
+    ).filter(Budget.user_id == user_id).one()
+    return jsonify({
+        'totalBudget': from_minor_units(total_budget),
+        'totalSpent': from_minor_units(total_spent),
+        'remaining': from_minor_units(total_budget - total_spent)
+    }), 200
+
+
+@budget_bp.route('/update_budget/<int:budget_id>', methods=['PUT'])
+@jwt_required()
+def update_budget(budget_id):
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"Attempting to update budget {budget_id} for user {user_id}")
+    budget = Budget.query.filter_by(id=budget_id, user_id=user_id).first()
+
+    if not budget:
+        current_app.logger.warning(f"Budget {budget_id} not found for user {user_id}")
+        return jsonify({"error": "Budget not found"}), 404
+
+    data = request.json
+    current_app.logger.info(f"Received data for budget update: {data}")
+    if not _valid_recurrence_period(data.get('recurrence_period', budget.recurrence_period)):
+        return jsonify({"error": "recurrence_period must be weekly, monthly, yearly or 'N days'"}), 400
+
+    budget.budget_category = data.get('budget_category', budget.budget_category)
+    budget.budget_limit = data.get('budget_limit', budget.budget_limit)
+    budget.start_date = date.fromisoformat(data.get('start_date', budget.start_date.isoformat()))
+    budget.end_date = date.fromisoformat(data.get('end_date', budget.end_date.isoformat()))
+    budget.is_recurring = data.get('is_recurring', budget.is_recurring)
+    budget.recurrence_period = data.get('recurrence_period', budget.recurrence_period)
+    period = (budget.recurrence_period, budget.budget_category, budget.start_date)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        return _duplicate_period_response(*period)
+    current_app.logger.info(f"Budget {budget_id} updated successfully")
+    cache.delete(f'budgets_user_{user_id}')
+
+    updated_budget = {
+        "id": budget.id,
+        "budget_category": budget.budget_category,
+        "budget_limit": float(budget.budget_limit),
+        "start_date": budget.start_date.isoformat(),
+        "end_date": budget.end_date.isoformat(),
+        "is_recurring": budget.is_recurring,
+        "recurrence_period": budget.recurrence_period
+    }
+    return jsonify(updated_budget), 200
+
+
+@budget_bp.route('/delete_budget/<int:budget_id>', methods=['DELETE'])
+@jwt_required()
+def delete_budget(budget_id):
+    user_id = get_jwt_identity()
+    budget = Budget.query.filter_by(id=budget_id, user_id=user_id).first()
+
+    if not budget:
+        return jsonify({"error": "Budget not found"}), 404
+
+    try:
+        # Explicitly delete associated alerts
+        BudgetAlert.query.filter_by(budget_id=budget_id).delete()
+
+        db.session.delete(budget)
+        db.session.commit()
+        current_app.logger.info(f"Budget {budget_id} and its alerts deleted successfully")
+        cache.delete(f'budgets_user_{user_id}')
+
+        return jsonify({"message": "Budget and associated alerts deleted successfully"}), 200
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deleting budget {budget_id}: {str(e)}")
+        return jsonify({"error": "An error occurred while deleting the budget"}), 500
+
+
+@budget_bp.route('/set_recurring_budget', methods=['POST'])
+@jwt_required()
+def set_recurring_budget():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    budget_category = data.get('budget_category')
+    budget_limit = data.get('budget_limit')
+    start_date = datetime.strptime(data.get('start_date'), '%Y-%m-%d').date()
+    end_date = datetime.strptime(data.get('end_date'), '%Y-%m-%d').date()
+    recurrence_period = data.get('recurrence_period')
+
+    if not all([budget_category, budget_limit, start_date, end_date, recurrence_period]):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    if recurrence_period not in RECURRENCE_PERIODS:
+        return jsonify({"error": f"recurrence_period must be one of {', '.join(RECURRENCE_PERIODS)}"}), 400
+
+    new_budget = Budget(
+        user_id=user_id,
+        budget_category=budget_category,
+        budget_limit=budget_limit,
+        start_date=start_date,
+        end_date=end_date,
+        is_recurring=True,
+        recurrence_period=recurrence_period
+    )
+
+    db.session.add(new_budget)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        return _duplicate_period_response(recurrence_period, budget_category, start_date)
+    cache.delete(f'budgets_user_{user_id}')
+
+    return jsonify({'message': 'Recurring budget set successfully'}), 201
+
+
+@budget_bp.route('/recurring_budgets', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(1)
+def get_recurring_budgets():
+    user_id = get_jwt_identity()
+    recurring_budgets = Budget.query.filter_by(user_id=user_id, is_recurring=True).all()
+    return jsonify([{
+        'id': budget.id,
+        'category': budget.budget_category,
+        'limit': budget.budget_limit,
+        'start_date': budget.start_date.isoformat(),
+        'end_date': budget.end_date.isoformat()
+    } for budget in recurring_budgets]), 200
+
+
+@budget_bp.route('/stop_recurring_budget/<int:budget_id>', methods=['POST'])
+@jwt_required()
+def stop_recurring_budget(budget_id):
+    user_id = get_jwt_identity()
+    budget = Budget.query.filter_by(id=budget_id, user_id=user_id, is_recurring=True).first()
+    if not budget:
+        return jsonify({"error": "Recurring budget not found"}), 404
+    budget.is_recurring = False
+    db.session.commit()
+    return jsonify({"message": "Recurring budget stopped successfully"}), 200
+
+
+@budget_bp.route('/budget_alerts', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(1)
+def get_budget_alerts():
+    user_id = get_jwt_identity()
+    # Alerts are raised after each sync (evaluate_budget_alerts) and pushed
+    # over server-sent events, so this only reads the unread ones
+    alerts = get_user_budget_alerts(user_id, is_read=False)
+
+    return jsonify([{
+        'id': alert.id,
+        'budget_category': alert.budget.budget_category,
+        'alert_type': alert.alert_type,
+        'message': alert.message,
+        'created_at': alert.created_at.isoformat()
+    } for alert in alerts]), 200
+
+
+@budget_bp.route('/budget_alerts/<int:alert_id>/read', methods=['POST'])
+@jwt_required()
+def mark_alert_as_read(alert_id):
+    user_id = get_jwt_identity()
+    alert = BudgetAlert.query.filter_by(id=alert_id, user_id=user_id).first()
+
+    if not alert:
+        return jsonify({"error": "Alert not found"}), 404
+
+    alert.is_read = True
+    db.session.commit()
+    cache.delete(f'budgets_alerts_user_{user_id}')
+
+    return jsonify({"message": "Alert marked as read"}), 200
@@ -1,24 +1,33 @@
-from models import Budget, Transaction, BudgetAlert
+from models import Budget, Transaction, TransactionDailyRollup, BudgetAlert, OutboxMessage
 from flask import current_app
 from extensions import db
-from datetime import datetime, timedelta
-from sqlalchemy import func
+import re
+import bisect
+import calendar
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, case, insert, update, true, false
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import aliased, joinedload
+from money import minor_units, to_minor_units, from_minor_units
+from archive_service import rollup_totals
+from notification_service import queue_notification
+from events_service import publish_event, alert_event
+
+RECURRENCE_PERIODS = ('weekly', 'monthly', 'yearly')
+FIXED_PERIOD = re.compile(r'^[1-9][0-9]* days$')
+# Budget rows per rollover insert statement
+ROLLOVER_BATCH_SIZE = 1000
 
 
 def update_budget_spending(user_id):
-    budgets = Budget.query.filter_by(user_id=user_id).all()
-    
-    for budget in budgets:
-        total_spent = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.category == budget.budget_category,
-            Transaction.date >= budget.start_date,
-            Transaction.date <= budget.end_date
-        ).scalar() or 0.0
-
-        budget.current_spending = total_spent
-        db.session.add(budget)
-    
+    """Recompute current_spending for all of the user's budgets in one UPDATE"""
+    spent = db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
+        Transaction.user_id == Budget.user_id,
+        Transaction.category == Budget.budget_category,
+        Transaction.date >= Budget.start_date,
+        Transaction.date <= Budget.end_date
+    ).scalar_subquery()
+    db.session.execute(update(Budget).where(Budget.user_id == user_id).values(current_spending=spent))
     db.session.commit()
 
 def check_budget_alerts(user_id):
@@ -29,16 +38,23 @@ def check_budget_alerts(user_id):
     print(f"Checking budget alerts for user {user_id}")
     print(f"Number of budgets: {len(budgets)}")
     
+    # The unread alerts of all these budgets in one query, not one per budget.
+    # "= false" rather than "IS false" so the partial unread index matches
+    unread = set(db.session.query(BudgetAlert.budget_id, BudgetAlert.alert_type).filter(
+        BudgetAlert.user_id == user_id,
+        BudgetAlert.is_read == false()
+    ).all())
+
     for budget in budgets:
         if budget.budget_limit > 0:  # Avoid division by zero
             percentage = (budget.current_spending / budget.budget_limit) * 100
             print(f"Budget {budget.id}: {budget.budget_category}, Limit: {budget.budget_limit}, Current: {budget.current_spending}, Percentage: {percentage:.2f}%")
             
-            if 80 <= percentage < 100 and not BudgetAlert.query.filter_by(budget_id=budget.id, alert_type='80%', is_read=False).first():
+            if 80 <= percentage < 100 and (budget.id, '80%') not in unread:
                 print(f"Creating 80% alert for budget {budget.id}")
                 alert = create_budget_alert(budget, '80%', f"You've spent {percentage:.1f}% of your {budget.budget_category} budget.")
                 alerts.append(alert)
-            elif percentage >= 100 and not BudgetAlert.query.filter_by(budget_id=budget.id, alert_type='over', is_read=False).first():
+            elif percentage >= 100 and (budget.id, 'over') not in unread:
                 print(f"Creating over budget alert for budget {budget.id}")
                 alert = create_budget_alert(budget, 'over', f"You've exceeded your {budget.budget_category} budget by {(percentage - 100):.1f}%.")
                 alerts.append(alert)
@@ -54,11 +70,83 @@ def create_budget_alert(budget, alert_type, message):
         message=message
     )
     db.session.add(alert)
+    # Emailed by the outbox worker, committed together with the alert
+    queue_notification(budget.user_id, "Budget Alert", message)
     db.session.commit()
     return alert
 
+def evaluate_budget_alerts(today=None, user_id=None):
+    """Refresh spending and raise threshold alerts for every active budget of
+    every user, or only of user_id, e.g. right after their sync.
+
+    A handful of statements regardless of user count: one correlated UPDATE
+    for current_spending, one SELECT that picks the threshold crossed and
+    anti-joins unread alerts of that type, and bulk inserts of the alerts
+    and their outbox emails. New alerts are pushed over server-sent events.
+    Returns the new alerts.
+    """
+    today = today or datetime.now().date()
+    active = (Budget.start_date <= today, Budget.end_date >= today,
+              *([Budget.user_id == user_id] if user_id is not None else []))
+
+    spent = db.session.query(func.coalesce(func.sum(minor_units(Transaction.amount)), 0)).filter(
+        Transaction.user_id == Budget.user_id,
+        Transaction.category == Budget.budget_category,
+        Transaction.date >= Budget.start_date,
+        Transaction.date <= Budget.end_date
+    ).scalar_subquery()
+    db.session.execute(update(Budget).where(*active).values(current_spending=spent))
+
+    spending, limit = minor_units(Budget.current_spending), minor_units(Budget.budget_limit)
+    alert_type = case(
+        (spending >= limit, 'over'),
+        (spending * 5 >= limit * 4, '80%')
+    )
+    candidates = db.session.query(
+        Budget.id, Budget.user_id, Budget.budget_category, spending, limit, alert_type
+    ).filter(
+        *active,
+        limit > 0,
+        alert_type.isnot(None),
+        ~db.session.query(BudgetAlert.id).filter(
+            BudgetAlert.budget_id == Budget.id,
+            BudgetAlert.alert_type == alert_type,
+            BudgetAlert.is_read == false()
+        ).exists()
+    ).all()
+    if not candidates:
+        db.session.commit()
+        return []
+
+    now = datetime.utcnow()
+    rows = []
+    for budget_id, user_id, category, budget_spending, budget_limit, new_alert_type in candidates:
+        percentage = budget_spending / budget_limit * 100
+        if new_alert_type == 'over':
+            message = f"You've exceeded your {category} budget by {(percentage - 100):.1f}%."
+        else:
+            message = f"You've spent {percentage:.1f}% of your {category} budget."
+        rows.append({'budget_id': budget_id, 'user_id': user_id, 'alert_type': new_alert_type,
+                     'message': message, 'created_at': now, 'is_read': False})
+
+    alerts = db.session.execute(
+        insert(BudgetAlert).returning(BudgetAlert.id, BudgetAlert.user_id, BudgetAlert.budget_id,
+                                      BudgetAlert.alert_type, BudgetAlert.message, BudgetAlert.created_at),
+        rows
+    ).all()
+    db.session.execute(insert(OutboxMessage), [
+        {'user_id': row['user_id'], 'subject': "Budget Alert", 'body': row['message']} for row in rows
+    ])
+    db.session.commit()
+
+    # Bulk inserts skip the ORM flush hook, so push the events here
+    for alert in alerts:
+        publish_event(alert.user_id, 'budget_alert', alert_event(alert))
+    return alerts
+
 def get_user_budget_alerts(user_id, is_read=None):
-    query = BudgetAlert.query.filter_by(user_id=user_id)
+    # Callers show each alert's budget category
+    query = BudgetAlert.query.options(joinedload(BudgetAlert.budget)).filter_by(user_id=user_id)
     if is_read is not None:
         query = query.filter_by(is_read=is_read)
     return query.order_by(BudgetAlert.created_at.desc()).all()
@@ -71,20 +159,223 @@ def mark_alert_as_read(alert_id):
         return True
     return False
 
-def create_next_recurring_budgets():
-    today = datetime.now().date()
-    recurring_budgets = Budget.query.filter_by(is_recurring=True, end_date=today).all()
-    for budget in recurring_budgets:
-        new_start_date = budget.end_date + timedelta(days=1)
-        new_end_date = new_start_date + (budget.end_date - budget.start_date)
-        new_budget = Budget(
-            user_id=budget.user_id,
-            budget_category=budget.budget_category,
-            budget_limit=budget.budget_limit,
-            start_date=new_start_date,
-            end_date=new_end_date,
-            is_recurring=True
+def shift_period(day, recurrence_period, count):
+    """Move a date forward by count periods.
+
+    Periods are 'weekly', 'monthly', 'yearly' or a fixed 'N days'. Month
+    arithmetic clamps to the end of shorter months.
+    """
+    if recurrence_period == 'weekly':
+        return day + timedelta(weeks=count)
+    if recurrence_period not in ('monthly', 'yearly'):
+        return day + timedelta(days=int(recurrence_period.split()[0]) * count)
+    months = count * (12 if recurrence_period == 'yearly' else 1)
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def resolve_recurrence_period(budget):
+    """The budget's recurrence period, guessed from its length when missing or unknown"""
+    if budget.recurrence_period in RECURRENCE_PERIODS or FIXED_PERIOD.match(budget.recurrence_period or ''):
+        return budget.recurrence_period
+    days = (budget.end_date - budget.start_date).days + 1
+    if days == 7:
+        return 'weekly'
+    if 28 <= days <= 31:
+        return 'monthly'
+    if 365 <= days <= 366:
+        return 'yearly'
+    return f'{days} days'
+
+
+def missing_periods(budget, today):
+    """(start_date, end_date) for every period after budget up to and including today's"""
+    recurrence_period = resolve_recurrence_period(budget)
+    anchor, offset = budget.end_date + timedelta(days=1), 0
+    if shift_period(budget.start_date, recurrence_period, 1) == anchor:
+        # Count from the budget's own start so a month-end day is kept
+        anchor, offset = budget.start_date, 1
+    periods = []
+    while True:
+        count = len(periods) + offset
+        start_date = shift_period(anchor, recurrence_period, count)
+        if start_date > today:
+            return recurrence_period, periods
+        periods.append((start_date, shift_period(anchor, recurrence_period, count + 1) - timedelta(days=1)))
+
+
+def create_next_recurring_budgets(today=None):
+    """Roll every lapsed recurring budget forward to the current period.
+
+    A recurring budget is the head of its chain when no later recurring
+    budget in the same category has the same recurrence period; one-off
+    budgets set in between are not part of the chain. Each head whose
+    period has ended gets every missing period up to today, for all users in
+    one pass. The newest period carries is_recurring forward and the heads
+    it supersedes are closed off.
+    Rows are inserted in batches with ON CONFLICT DO NOTHING against the
+    recurring period unique index, so a rerun or a racing worker cannot
+    create duplicates.
+    """
+    today = today or datetime.now().date()
+    later = aliased(Budget)
+    heads = Budget.query.filter(
+        Budget.is_recurring == true(),
+        Budget.end_date < today,
+        ~db.session.query(later.id).filter(
+            later.user_id == Budget.user_id,
+            later.budget_category == Budget.budget_category,
+            later.is_recurring == true(),
+            later.recurrence_period.is_not_distinct_from(Budget.recurrence_period),
+            later.start_date > Budget.start_date
+        ).exists()
+    ).all()
+
+    rows = []
+    superseded = []
+    for budget in heads:
+        recurrence_period, periods = missing_periods(budget, today)
+        if periods:
+            superseded.append(budget.id)
+        for index, (start_date, end_date) in enumerate(periods):
+            rows.append({
+                'user_id': budget.user_id,
+                'budget_category': budget.budget_category,
+                'budget_limit': budget.budget_limit,
+                'current_spending': 0.0,
+                'start_date': start_date,
+                'end_date': end_date,
+                'is_recurring': index == len(periods) - 1,
+                'recurrence_period': recurrence_period
+            })
+
+    if rows:
+        insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+        for start in range(0, len(rows), ROLLOVER_BATCH_SIZE):
+            db.session.execute(insert(Budget).values(rows[start:start + ROLLOVER_BATCH_SIZE]).on_conflict_do_nothing(
+                index_elements=['user_id', 'budget_category', 'recurrence_period', 'start_date'],
+                index_where=Budget.recurrence_period.isnot(None)
+            ))
+    # Close off the heads the new periods supersede; on a rerun or a lost
+    # race the periods already exist, so they are superseded all the same
+    for start in range(0, len(superseded), ROLLOVER_BATCH_SIZE):
+        Budget.query.filter(Budget.id.in_(superseded[start:start + ROLLOVER_BATCH_SIZE])).update(
+            {Budget.is_recurring: False}, synchronize_session=False
         )
-        db.session.add(new_budget)
     db.session.commit()
+    return len(rows)
+
+
+# generate_series steps for the named recurrence periods
+PERIOD_INTERVALS = {'weekly': '1 week', 'monthly': '1 month', 'yearly': '1 year'}
+
+BUDGET_HISTORY_SQL = db.text('''
+    WITH periods AS (
+        SELECT k,
+               CAST(CAST(:anchor AS date) + k * CAST(:step AS interval) AS date) AS start_date,
+               CASE WHEN k = 0 THEN CAST(:end_date AS date)
+                    ELSE CAST(CAST(:anchor AS date) + (k + 1) * CAST(:step AS interval) - interval '1 day' AS date)
+               END AS end_date
+        FROM generate_series(:first_period, 0) AS k
+    ),
+    spending AS (
+        SELECT p.k, p.start_date, p.end_date, COALESCE(SUM(t.amount), 0) AS spent
+        FROM periods p
+        LEFT JOIN (
+            SELECT date, amount FROM "transaction" WHERE user_id = :user_id AND category = :category
+            UNION ALL
+            -- Archived days, from their rollups
+            SELECT date, total FROM transaction_daily_rollup WHERE user_id = :user_id AND category = :category
+        ) t ON t.date BETWEEN p.start_date AND p.end_date
+        GROUP BY p.k, p.start_date, p.end_date
+    ),
+    limits AS (
+        SELECT s.*,
+               COALESCE((SELECT b.budget_limit FROM budget b
+                         WHERE b.user_id = :user_id
+                           AND b.budget_category = :category
+                           AND b.start_date = s.start_date
+                         ORDER BY b.id DESC LIMIT 1), :budget_limit) AS budget_limit
+        FROM spending s
+    )
+    SELECT start_date, end_date, budget_limit, spent,
+           SUM(budget_limit - spent) OVER (ORDER BY k) AS cumulative_remaining
+    FROM limits
+    ORDER BY k
+''')
+
+
+def _history_entry(start_date, end_date, limit, spent, cumulative_remaining):
+    remaining = limit - spent
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'limit': from_minor_units(limit),
+        'spent': from_minor_units(spent),
+        'remaining': from_minor_units(remaining),
+        'status': "On Track" if remaining > 0 else "Over Budget",
+        'cumulative_remaining': from_minor_units(cumulative_remaining)
+    }
+
+
+def budget_history(budget, periods):
+    """Limit, spent and remaining for the budget's period and the periods before it.
+
+    Period boundaries follow the budget's recurrence period, counted back
+    from its start date. Each period uses the limit of the chain's budget
+    row for that period where one exists, otherwise the budget's own.
+    PostgreSQL computes everything in one generate_series query with a
+    running total window; other databases read the matching transactions
+    once and bucket them in Python.
+    """
+    recurrence_period = resolve_recurrence_period(budget)
+    budget_limit = to_minor_units(budget.budget_limit)
+
+    if db.engine.dialect.name == 'postgresql':
+        rows = db.session.execute(BUDGET_HISTORY_SQL, {
+            'anchor': budget.start_date,
+            'end_date': budget.end_date,
+            'step': PERIOD_INTERVALS.get(recurrence_period, recurrence_period),
+            'first_period': 1 - periods,
+            'user_id': budget.user_id,
+            'category': budget.budget_category,
+            'budget_limit': budget_limit
+        }).all()
+        return [_history_entry(row.start_date, row.end_date, int(row.budget_limit), int(row.spent),
+                               int(row.cumulative_remaining)) for row in rows]
+
+    boundaries = [(shift_period(budget.start_date, recurrence_period, count),
+                   shift_period(budget.start_date, recurrence_period, count + 1) - timedelta(days=1))
+                  for count in range(1 - periods, 1)]
+    boundaries[-1] = (budget.start_date, budget.end_date)
+    starts = [start_date for start_date, _ in boundaries]
+
+    spent = [0] * periods
+    transactions = db.session.query(Transaction.date, minor_units(Transaction.amount)).filter(
+        Transaction.user_id == budget.user_id,
+        Transaction.category == budget.budget_category,
+        Transaction.date >= starts[0],
+        Transaction.date <= budget.end_date
+    )
+    # Archived days are summed from their rollups
+    archived = rollup_totals(budget.user_id, starts[0], budget.end_date, TransactionDailyRollup.total,
+                             filters=(TransactionDailyRollup.category == budget.budget_category,),
+                             group_by=(TransactionDailyRollup.date,))
+    for transaction_date, amount in [*transactions, *archived]:
+        index = bisect.bisect_right(starts, transaction_date) - 1
+        if transaction_date <= boundaries[index][1]:
+            spent[index] += amount
+
+    limits = dict(db.session.query(Budget.start_date, minor_units(Budget.budget_limit)).filter(
+        Budget.user_id == budget.user_id,
+        Budget.budget_category == budget.budget_category,
+        Budget.start_date.in_(starts)
+    ).order_by(Budget.id))
 
+    history, cumulative_remaining = [], 0
+    for (start_date, end_date), period_spent in zip(boundaries, spent):
+        limit = limits.get(start_date, budget_limit)
+        cumulative_remaining += limit - period_spent
+        history.append(_history_entry(start_date, end_date, limit, period_spent, cumulative_remaining))
+    return history
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db, cache, limiter
+from models import CustomCategory
+from category_service import get_category_map, invalidate_category_matcher, lookup_category_keywords
+from recategorize_service import create_recategorize_job, get_recategorize_job, recategorize_history
+from query_budget import query_budget
+from rate_limiting import rate_cost
+
+category_bp = Blueprint('category', __name__)
+
+# Recategorization runs off the request thread, whether or not the
+# scheduler is running in this process
+recategorize_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='recategorize')
+
+
+@category_bp.route('/get_categories', methods=['GET'])
+@jwt_required()
+@query_budget(1)
+def get_categories():
+    user_id = get_jwt_identity()
+    category_map = get_category_map(user_id)
+    categories = list(set(list(category_map.keys()) + ['Uncategorized']))
+    return jsonify(categories), 200
+
+
+@category_bp.route('/add_custom_category', methods=['POST'])
+@jwt_required()
+@rate_cost(10)
+def add_custom_category():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    category_name = data.get('name')
+    keywords = data.get('keywords')
+
+    if not category_name:
+        return jsonify({'error': 'Category name is required'}), 400
+
+    new_category = CustomCategory(user_id=user_id, name=category_name, keywords=keywords)
+    db.session.add(new_category)
+    db.session.commit()
+    invalidate_category_matcher(user_id)
+
+    # Apply the new keywords to existing transactions in the background
+    job_id = queue_recategorize_job(user_id, dry_run=False) if keywords else None
+
+    return jsonify({
+        'message': 'Custom category added successfully',
+        'category_id': new_category.id,
+        'recategorize_job_id': job_id
+    }), 201
+
+
+@category_bp.route('/category_keywords', methods=['GET'])
+@jwt_required()
+@query_budget(1)
+def get_category_keywords():
+    user_id = get_jwt_identity()
+    text = request.args.get('q', '')
+    mode = request.args.get('mode', 'prefix')
+    limit = min(request.args.get('limit', 20, type=int), 100)
+
+    if mode not in ('prefix', 'similar'):
+        return jsonify({'error': "mode must be 'prefix' or 'similar'"}), 400
+
+    return jsonify(lookup_category_keywords(user_id, text, mode, limit)), 200
+
+
+def queue_recategorize_job(user_id, dry_run):
+    job_id = create_recategorize_job(user_id, dry_run)
+    app = current_app._get_current_object()
+
+    def run_recategorize_job():
+        with app.app_context():
+            changed = recategorize_history(job_id, user_id, dry_run, app.logger)
+            if changed and not dry_run:
+                cache.delete(f'transactions_user_{user_id}')
+                cache.delete(f'budgets_user_{user_id}')
+
+    recategorize_executor.submit(run_recategorize_job)
+    return job_id
+
+
+@category_bp.route('/recategorize', methods=['POST'])
+@limiter.limit("5 per minute")
+@jwt_required()
+@rate_cost(10)
+def recategorize_transactions():
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    dry_run = bool(data.get('dry_run', False))
+
+    job_id = queue_recategorize_job(user_id, dry_run)
+    current_app.logger.info(f"Queued recategorization {job_id} for user {user_id} (dry_run={dry_run})")
+    return jsonify({
+        'message': 'Recategorization started',
+        'job_id': job_id,
+        'dry_run': dry_run
+    }), 202
+
+
+@category_bp.route('/recategorize/<job_id>', methods=['GET'])
+@jwt_required()
+def get_recategorize_status(job_id):
+    user_id = get_jwt_identity()
+    job = get_recategorize_job(job_id, user_id)
+    if not job:
+        return jsonify({'error': 'Recategorization job not found'}), 404
+    return jsonify(job), 200
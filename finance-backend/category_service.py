@@ -1,5 +1,28 @@
-from models import CustomCategory, db
-from fuzzywuzzy import process
+import re
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from models import CustomCategory, CategoryKeyword, split_keywords, db
+from merchant_memo_service import resolve_merchant_categories
+from metrics import record_cache_lookup
+
+# Compiled matchers are cached per user. The TTL bounds how stale another
+# worker's copy can be, since invalidation only reaches this process.
+MATCHER_CACHE_SIZE = 1024
+MATCHER_CACHE_TTL = 300
+
+# Minimum pg_trgm similarity for keyword lookups
+KEYWORD_SIMILARITY_THRESHOLD = 0.3
+
+# Fuzzy matches must score above this (0-100) to be used. numpy, rapidfuzz
+# and the classifier are imported on first use to keep app startup fast.
+FUZZY_THRESHOLD = 80
+# Names per task when a whole history is scored on a process pool
+FUZZY_CHUNK_SIZE = 20000
 
 default_category_map = {
     'Food': ['Restaurant', 'Cafe', 'Grocery', 'Bar', 'Fast Food'],
@@ -9,47 +32,274 @@ default_category_map = {
     'Utilities': ['Rent', 'Electricity', 'Water', 'Internet', 'Phone', 'Insurance'],
 }
 
+def get_custom_category_keywords(user_id):
+    """The user's custom categories and their keywords, loaded in one query"""
+    rows = db.session.query(CustomCategory.name, CategoryKeyword.keyword).outerjoin(
+        CategoryKeyword, CategoryKeyword.category_id == CustomCategory.id
+    ).filter(
+        CustomCategory.user_id == user_id
+    ).order_by(CustomCategory.id, CategoryKeyword.id).all()
+
+    category_keywords = {}
+    for name, keyword in rows:
+        keywords = category_keywords.setdefault(name, [])
+        if keyword:
+            keywords.append(keyword)
+    return category_keywords
+
 def get_category_map(user_id):
-    custom_categories = CustomCategory.query.filter_by(user_id=user_id).all()
     category_map = default_category_map.copy()
-    for custom_category in custom_categories:
-        category_map[custom_category.name] = custom_category.keywords.split(',') if custom_category.keywords else []
+    category_map.update(get_custom_category_keywords(user_id))
     return category_map
 
+class CategoryMatcher:
+    """All of a user's keywords compiled into one regex.
+
+    The alternation lists keywords in category order, and the pattern is a
+    lookahead so it is tried at every position of the name. At any position
+    the first alternative that matches belongs to the earliest category with
+    a keyword there, so the lowest category index across all positions is
+    the same answer as checking each category's keywords in turn.
+    """
+
+    def __init__(self, category_map):
+        self.categories = list(category_map.keys())
+        self.keyword_index = {}
+        for index, keywords in enumerate(category_map.values()):
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword and keyword not in self.keyword_index:
+                    self.keyword_index[keyword] = index
+
+        if self.keyword_index:
+            ordered = sorted(self.keyword_index, key=lambda keyword: self.keyword_index[keyword])
+            self.pattern = re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword in ordered) + '))')
+        else:
+            self.pattern = None
+
+    def match(self, transaction_name):
+        if self.pattern is None or not transaction_name:
+            return 'Uncategorized'
+        best = None
+        for found in self.pattern.finditer(transaction_name.lower()):
+            index = self.keyword_index[found.group(1)]
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return self.categories[best] if best is not None else 'Uncategorized'
+
+
+_matcher_cache = OrderedDict()
+_matcher_cache_lock = threading.Lock()
+
+
+def get_category_matcher(user_id):
+    now = time.monotonic()
+    with _matcher_cache_lock:
+        cached = _matcher_cache.get(user_id)
+        if cached and now - cached[1] < MATCHER_CACHE_TTL:
+            _matcher_cache.move_to_end(user_id)
+            record_cache_lookup('category_matcher', True)
+            return cached[0]
+
+    record_cache_lookup('category_matcher', False)
+    matcher = CategoryMatcher(get_category_map(user_id))
+    with _matcher_cache_lock:
+        _matcher_cache[user_id] = (matcher, now)
+        _matcher_cache.move_to_end(user_id)
+        while len(_matcher_cache) > MATCHER_CACHE_SIZE:
+            _matcher_cache.popitem(last=False)
+    return matcher
+
+
+def invalidate_category_matcher(user_id):
+    """Drop the cached matcher after the user's categories or keywords change"""
+    with _matcher_cache_lock:
+        _matcher_cache.pop(user_id, None)
+
+
 def categorize_transaction(transaction_name, user_id):
-    category_map = get_category_map(user_id)
-    transaction_name = transaction_name.lower()
-    for category, keywords in category_map.items():
-        if any(keyword.lower() in transaction_name for keyword in keywords):
-            return category
-    return 'Uncategorized'
-
-def auto_categorize_transaction(user_id, transaction_name):
-    # Get user's custom categories
-    custom_categories = CustomCategory.query.filter_by(user_id=user_id).all()
-    
-    # Create a dictionary of category names and their keywords
-    category_keywords = {cat.name: cat.keywords.split(',') if cat.keywords else [] for cat in custom_categories}
-    
-    # Check if transaction name matches any category keywords
+    return get_category_matcher(user_id).match(transaction_name)
+
+
+def categorize_transactions(transaction_names, user_id):
+    """Categorize a list of names with a single category lookup"""
+    matcher = get_category_matcher(user_id)
+    return [matcher.match(name) for name in transaction_names]
+
+def _fuzzy_choices(category_keywords):
+    """Every category name and keyword, with the category each one points to"""
+    import numpy as np
+
+    choices, owners = [], []
     for category, keywords in category_keywords.items():
-        if any(keyword.lower() in transaction_name.lower() for keyword in keywords):
-            return category
-    
-    # If no match found, use fuzzy matching to find the closest category
-    category_names = list(category_keywords.keys())
-    best_match, score = process.extractOne(transaction_name, category_names)
-    
-    # If the best match has a score above 80, use it; otherwise, return 'Uncategorized'
-    return best_match if score > 80 else 'Uncategorized'
+        for choice in [category] + keywords:
+            if choice:
+                choices.append(choice)
+                owners.append(category)
+    return choices, np.array(owners, dtype=object)
+
+
+def _best_fuzzy_scores(transaction_names, choices, workers):
+    import numpy as np
+    from rapidfuzz import fuzz, process, utils
+
+    scores = process.cdist(
+        transaction_names,
+        choices,
+        scorer=fuzz.WRatio,
+        processor=utils.default_process,
+        dtype=np.uint8,
+        workers=workers
+    )
+    best = scores.argmax(axis=1)
+    return best, scores[np.arange(len(transaction_names)), best]
+
+
+def fuzzy_categorize(transaction_names, category_keywords, workers=-1, processes=None):
+    """Fuzzy-match names against every category name and keyword at once.
+
+    The whole score matrix comes from one process.cdist call spread over
+    all cores (workers=-1). With processes set, the names are split into
+    chunks scored on a process pool instead, for whole-history runs.
+    """
+    import numpy as np
+
+    if not transaction_names:
+        return []
+    choices, owners = _fuzzy_choices(category_keywords)
+    if not choices:
+        return ['Uncategorized'] * len(transaction_names)
+
+    if processes:
+        chunks = [transaction_names[i:i + FUZZY_CHUNK_SIZE]
+                  for i in range(0, len(transaction_names), FUZZY_CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_best_fuzzy_scores, chunks,
+                                        [choices] * len(chunks), [1] * len(chunks)))
+        best = np.concatenate([result[0] for result in results])
+        best_scores = np.concatenate([result[1] for result in results])
+    else:
+        best, best_scores = _best_fuzzy_scores(transaction_names, choices, workers)
+
+    return np.where(best_scores > FUZZY_THRESHOLD, owners[best], 'Uncategorized').tolist()
+
+
+def auto_categorize_transactions(user_id, transaction_names, workers=-1, processes=None, merchant_names=None):
+    """Categorize many names against the user's custom categories.
+
+    Keyword matches win, then the shared merchant memo, then confident
+    predictions from the user's trained classifier, and the remaining names
+    are fuzzy-matched in one batch. merchant_names, when given, line up with
+    transaction_names (None where unknown); the memo is keyed by the merchant
+    name when there is one, like the observations recorded into it.
+    """
+    from classifier_service import classify_transactions
+
+    category_keywords = get_custom_category_keywords(user_id)
+
+    # Check if transaction names match any category keywords
+    matcher = CategoryMatcher(category_keywords)
+    categories = [matcher.match(name) for name in transaction_names]
+
+    merchant_names = merchant_names or [None] * len(transaction_names)
+    merchants = [merchant_name or name for name, merchant_name in zip(transaction_names, merchant_names)]
+
+    # Then look the rest up in the merchant memo
+    unmatched = [index for index, category in enumerate(categories) if category == 'Uncategorized']
+    if unmatched:
+        memo = resolve_merchant_categories([merchants[index] for index in unmatched])
+        for index in unmatched:
+            categories[index] = memo.get(merchants[index], 'Uncategorized')
+
+    # Then ask the trained classifier
+    unmatched = [index for index, category in enumerate(categories) if category == 'Uncategorized']
+    if unmatched:
+        predicted = classify_transactions(user_id, [(transaction_names[index], merchant_names[index])
+                                                   for index in unmatched])
+        for index, category in zip(unmatched, predicted):
+            if category:
+                categories[index] = category
+
+    # Fall back to fuzzy matching for the rest
+    unmatched = [index for index, category in enumerate(categories) if category == 'Uncategorized']
+    if unmatched and category_keywords:
+        fuzzy = fuzzy_categorize([transaction_names[index] for index in unmatched],
+                                 category_keywords, workers, processes)
+        for index, category in zip(unmatched, fuzzy):
+            categories[index] = category
+    return categories
+
+
+def auto_categorize_transaction(user_id, transaction_name, merchant_name=None):
+    return auto_categorize_transactions(user_id, [transaction_name], workers=1, merchant_names=[merchant_name])[0]
+
+def add_category_keywords(user_id, category_id, keywords):
+    """Upsert keywords for a category, bumping hit_count on ones it already has"""
+    keywords = list(dict.fromkeys(split_keywords(keywords)))
+    if not keywords:
+        return
+    now = datetime.utcnow()
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    statement = insert(CategoryKeyword).values([{
+        'user_id': user_id,
+        'category_id': category_id,
+        'keyword': keyword,
+        'hit_count': 1,
+        'last_used': now
+    } for keyword in keywords])
+    statement = statement.on_conflict_do_update(
+        index_elements=['category_id', 'keyword'],
+        set_={
+            'hit_count': CategoryKeyword.hit_count + 1,
+            'last_used': statement.excluded.last_used
+        }
+    )
+    db.session.execute(statement)
 
 def update_category_keywords(user_id, category_name, transaction_name):
     custom_category = CustomCategory.query.filter_by(user_id=user_id, name=category_name).first()
     if not custom_category:
         custom_category = CustomCategory(user_id=user_id, name=category_name)
         db.session.add(custom_category)
-    
-    keywords = set(custom_category.keywords.split(',') if custom_category.keywords else [])
-    keywords.add(transaction_name.lower())
-    custom_category.keywords = ','.join(keywords)
-    db.session.commit()
\ No newline at end of file
+        db.session.flush()
+
+    add_category_keywords(user_id, custom_category.id, [transaction_name])
+    db.session.commit()
+    invalidate_category_matcher(user_id)
+
+def lookup_category_keywords(user_id, text, mode='prefix', limit=20):
+    """Find the user's stored keywords by prefix or by trigram similarity.
+
+    Similarity uses the pg_trgm index on PostgreSQL; other databases fall
+    back to a substring match.
+    """
+    text = (text or '').strip().lower()
+    if not text:
+        return []
+
+    query = db.session.query(CategoryKeyword, CustomCategory.name).join(
+        CustomCategory, CustomCategory.id == CategoryKeyword.category_id
+    ).filter(CategoryKeyword.user_id == user_id)
+
+    if mode == 'similar' and db.engine.dialect.name == 'postgresql':
+        similarity = func.similarity(CategoryKeyword.keyword, text)
+        query = query.filter(
+            CategoryKeyword.keyword.op('%')(text),
+            similarity >= KEYWORD_SIMILARITY_THRESHOLD
+        ).order_by(similarity.desc())
+    elif mode == 'similar':
+        query = query.filter(CategoryKeyword.keyword.contains(text, autoescape=True)) \
+            .order_by(CategoryKeyword.hit_count.desc())
+    else:
+        query = query.filter(CategoryKeyword.keyword.startswith(text, autoescape=True)) \
+            .order_by(CategoryKeyword.keyword)
+
+    return [{
+        'keyword': keyword.keyword,
+        'category': category_name,
+        'category_id': keyword.category_id,
+        'hit_count': keyword.hit_count,
+        'last_used': keyword.last_used.isoformat() if keyword.last_used else None
+    } for keyword, category_name in query.limit(limit).all()]
\ No newline at end of file
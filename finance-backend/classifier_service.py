@@ -0,0 +1,416 @@
+import io
+import re
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import User, Transaction, CategoryModel
+from metrics import record_cache_lookup
+from merchant_memo_service import SHARED_CATEGORIES
+
+TOKEN_PATTERN = re.compile(r'[a-z]{2,}')
+UNCATEGORIZED = {None, '', 'Uncategorized', 'UNCATEGORIZED'}
+
+# Laplace smoothing for token likelihoods
+ALPHA = 1.0
+# Each class in the global model is rescaled to this many token counts
+# before it is added to a user's counts, so it acts as a weak prior
+PRIOR_TOKENS = 20.0
+# Predictions below this posterior probability are not used
+MIN_CONFIDENCE = 0.7
+
+TRAIN_BATCH_SIZE = 10000
+MODEL_CACHE_SIZE = 256
+# Cached classifiers are checked against the stored models' updated_at this
+# often, so retraining or a correction on another worker is picked up
+MODEL_CHECK_INTERVAL = 30
+
+
+def tokenize(name, merchant_name=None):
+    """Word tokens from the name, plus merchant tokens marked with 'm:'"""
+    tokens = TOKEN_PATTERN.findall((name or '').lower())
+    tokens += ['m:' + token for token in TOKEN_PATTERN.findall((merchant_name or '').lower())]
+    return tokens
+
+
+class CategoryCounts:
+    """Token counts per category for a multinomial naive Bayes model.
+
+    Counts grow in place as new categories and tokens are seen, so a single
+    correction is a cheap incremental update.
+    """
+
+    def __init__(self, classes=None, vocab=None, counts=None, doc_counts=None):
+        self.classes = list(classes or [])
+        self.vocab = list(vocab or [])
+        self.class_index = {name: index for index, name in enumerate(self.classes)}
+        self.vocab_index = {token: index for index, token in enumerate(self.vocab)}
+        self.counts = counts if counts is not None else np.zeros((len(self.classes), len(self.vocab)), dtype=np.float32)
+        self.doc_counts = doc_counts if doc_counts is not None else np.zeros(len(self.classes), dtype=np.float32)
+
+    @property
+    def n_examples(self):
+        return int(self.doc_counts.sum())
+
+    def _grow(self, n_classes, n_tokens):
+        rows, cols = self.counts.shape
+        if n_classes > rows or n_tokens > cols:
+            # Grow geometrically so repeated single updates stay cheap
+            new_rows = max(n_classes, rows)
+            new_cols = max(n_tokens, cols * 2 if n_tokens > cols else cols)
+            counts = np.zeros((new_rows, new_cols), dtype=np.float32)
+            counts[:rows, :cols] = self.counts
+            self.counts = counts
+        if n_classes > len(self.doc_counts):
+            self.doc_counts = np.concatenate([self.doc_counts, np.zeros(n_classes - len(self.doc_counts), dtype=np.float32)])
+
+    def add(self, tokens, category, weight=1.0):
+        if category in UNCATEGORIZED or not tokens:
+            return
+        if category not in self.class_index:
+            self.class_index[category] = len(self.classes)
+            self.classes.append(category)
+        for token in tokens:
+            if token not in self.vocab_index:
+                self.vocab_index[token] = len(self.vocab)
+                self.vocab.append(token)
+        self._grow(len(self.classes), len(self.vocab))
+
+        row = self.class_index[category]
+        self.doc_counts[row] += weight
+        for token in tokens:
+            self.counts[row, self.vocab_index[token]] += weight
+
+    def trimmed(self):
+        return self.counts[:len(self.classes), :len(self.vocab)]
+
+    def to_bytes(self):
+        # Stored as sparse (class, token, count) triplets, compressed
+        counts = self.trimmed()
+        rows, cols = np.nonzero(counts)
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            classes=np.array(self.classes, dtype=str),
+            vocab=np.array(self.vocab, dtype=str),
+            rows=rows.astype(np.int32),
+            cols=cols.astype(np.int32),
+            values=counts[rows, cols],
+            doc_counts=self.doc_counts[:len(self.classes)]
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        arrays = np.load(io.BytesIO(data), allow_pickle=False)
+        classes = arrays['classes'].tolist()
+        vocab = arrays['vocab'].tolist()
+        counts = np.zeros((len(classes), len(vocab)), dtype=np.float32)
+        counts[arrays['rows'], arrays['cols']] = arrays['values']
+        return cls(classes, vocab, counts, arrays['doc_counts'].astype(np.float32))
+
+
+class GlobalPrior:
+    """The global model's shared categories, each rescaled to PRIOR_TOKENS
+    token counts. Built once per process and shared by every user's
+    classifier, so the global vocabulary is held only once."""
+
+    def __init__(self, global_counts=None):
+        # Only Plaid's shared categories; a stored model may predate that rule
+        keep = [index for index, name in enumerate(global_counts.classes)
+                if name in SHARED_CATEGORIES] if global_counts else []
+        counts = global_counts.trimmed()[keep].astype(np.float32) if keep else np.zeros((0, 0), dtype=np.float32)
+        used = np.flatnonzero(counts.sum(axis=0)) if keep else []
+        counts = counts[:, used]
+        counts *= PRIOR_TOKENS / np.maximum(counts.sum(axis=1, keepdims=True), 1.0)
+
+        self.classes = [global_counts.classes[index] for index in keep]
+        self.vocab_index = {global_counts.vocab[index]: column for column, index in enumerate(used)}
+        self.counts = counts
+        self.class_totals = counts.sum(axis=1)
+        # log(prior count + ALPHA), token-major, with a last column for the
+        # classes a user has that the prior lacks
+        self.log_counts = np.log(np.vstack([counts, np.zeros((1, counts.shape[1]), dtype=np.float32)]) + ALPHA).T
+
+
+def _segment_sums(table, indices, indptr):
+    """Sum the rows of table picked by each document's segment of indices"""
+    sums = np.zeros((len(indptr) - 1, table.shape[1]), dtype=np.float32)
+    nonempty = np.diff(indptr) > 0
+    if nonempty.any():
+        sums[nonempty] = np.add.reduceat(table[indices], indptr[:-1][nonempty], axis=0)
+    return sums
+
+
+class CategoryClassifier:
+    """Log-probability tables compiled from user counts plus the global prior.
+
+    Only the user's own vocabulary gets a dense table. A token only the
+    prior knows has no user counts, so its likelihood is the shared prior
+    table's log(count + ALPHA) less the class's log total, which is worked
+    out at prediction time instead of being copied into every user's table.
+    """
+
+    def __init__(self, user_counts, prior=None):
+        classes = list(user_counts.classes)
+        vocab = list(user_counts.vocab)
+        if prior is not None:
+            classes += [name for name in prior.classes if name not in user_counts.class_index]
+        self.classes = classes
+        self.vocab_index = {token: index for index, token in enumerate(vocab)}
+        self.prior = prior if prior is not None and prior.classes else None
+
+        counts = np.zeros((len(classes), len(vocab)), dtype=np.float64)
+        doc_counts = np.zeros(len(classes), dtype=np.float64)
+        counts[:len(user_counts.classes), :len(user_counts.vocab)] = user_counts.trimmed()
+        doc_counts[:len(user_counts.classes)] = user_counts.doc_counts[:len(user_counts.classes)]
+        totals = counts.sum(axis=1)
+        n_vocab = len(vocab)
+
+        if self.prior is not None:
+            class_map = np.array([classes.index(name) for name in self.prior.classes])
+            shared = [(column, self.prior.vocab_index[token]) for column, token in enumerate(vocab)
+                      if token in self.prior.vocab_index]
+            if shared:
+                columns, prior_columns = (np.array(side) for side in zip(*shared))
+                counts[np.ix_(class_map, columns)] += self.prior.counts[:, prior_columns]
+            totals[class_map] += self.prior.class_totals
+            doc_counts[class_map] += 1.0
+            n_vocab += len(self.prior.vocab_index) - len(shared)
+            # The prior's row for each class, or its ALPHA-only last row
+            self.prior_rows = np.full(len(classes), len(self.prior.classes))
+            self.prior_rows[class_map] = np.arange(len(self.prior.classes))
+
+        totals += ALPHA * max(n_vocab, 1)
+        # Token log-likelihoods, stored token-major so rows can be gathered
+        self.log_likelihood = np.log((counts + ALPHA) / totals[:, None]).T.astype(np.float32)
+        self.log_totals = np.log(totals).astype(np.float32)
+        self.log_prior = np.log((doc_counts + 1.0) / (doc_counts.sum() + len(classes))).astype(np.float32)
+
+    def predict(self, token_lists):
+        """Classify many token lists with sparse-dense matrix products.
+
+        The documents are laid out as CSR matrices of token ids, one over
+        the user's vocabulary and one over tokens only the prior knows;
+        gathering the matching log-likelihood rows and summing each
+        document's segment with np.add.reduceat is that product without a
+        scipy dependency. Returns (category, probability) pairs, or
+        (None, 0.0) for documents with no known tokens.
+        """
+        n_docs = len(token_lists)
+        if not self.classes or not n_docs:
+            return [(None, 0.0)] * n_docs
+
+        prior_vocab = self.prior.vocab_index if self.prior is not None else {}
+        indices, indptr, prior_indices, prior_indptr = [], [0], [], [0]
+        for tokens in token_lists:
+            for token in tokens:
+                if token in self.vocab_index:
+                    indices.append(self.vocab_index[token])
+                elif token in prior_vocab:
+                    prior_indices.append(prior_vocab[token])
+            indptr.append(len(indices))
+            prior_indptr.append(len(prior_indices))
+        indptr = np.asarray(indptr, dtype=np.int64)
+        prior_indptr = np.asarray(prior_indptr, dtype=np.int64)
+
+        scores = np.tile(self.log_prior, (n_docs, 1))
+        scores += _segment_sums(self.log_likelihood, np.asarray(indices, dtype=np.int64), indptr)
+        prior_lengths = np.diff(prior_indptr)
+        if prior_indices:
+            prior_sums = _segment_sums(self.prior.log_counts, np.asarray(prior_indices, dtype=np.int64), prior_indptr)
+            scores += prior_sums[:, self.prior_rows] - prior_lengths[:, None] * self.log_totals
+        nonempty = (np.diff(indptr) + prior_lengths) > 0
+
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        best_probabilities = probabilities[np.arange(n_docs), best]
+
+        return [(self.classes[best[i]], float(best_probabilities[i])) if nonempty[i] else (None, 0.0)
+                for i in range(n_docs)]
+
+
+_classifier_cache = OrderedDict()
+_global_prior = {'prior': None, 'version': None}
+_cache_lock = threading.Lock()
+
+
+def _load_counts(user_id):
+    record = CategoryModel.query.filter_by(user_id=user_id).first()
+    return CategoryCounts.from_bytes(record.data) if record else None
+
+
+def _save_counts(user_id, counts):
+    """Store the counts and return their new version (updated_at)"""
+    now = datetime.utcnow()
+    if user_id is None:
+        # Only the scheduler leader trains the global prior
+        record = CategoryModel.query.filter_by(user_id=None).first()
+        if not record:
+            record = CategoryModel(user_id=None)
+            db.session.add(record)
+        record.data = counts.to_bytes()
+        record.n_examples = counts.n_examples
+        record.updated_at = now
+        return now
+
+    # An upsert, so two trainings of the same user cannot both insert
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    statement = insert(CategoryModel).values(
+        user_id=user_id, data=counts.to_bytes(), n_examples=counts.n_examples, updated_at=now
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'data': statement.excluded.data, 'n_examples': statement.excluded.n_examples, 'updated_at': now}
+    ))
+    return now
+
+
+def _training_rows(user_id=None):
+    query = db.session.query(Transaction.name, Transaction.merchant_name, Transaction.category).filter(
+        Transaction.category.isnot(None),
+        Transaction.category.notin_(['Uncategorized', 'UNCATEGORIZED', ''])
+    )
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    else:
+        # Users' own category names never reach other users through the prior
+        query = query.filter(Transaction.category.in_(SHARED_CATEGORIES))
+    return query.yield_per(TRAIN_BATCH_SIZE)
+
+
+def _train_counts(user_id):
+    counts = CategoryCounts()
+    for name, merchant_name, category in _training_rows(user_id):
+        counts.add(tokenize(name, merchant_name), category)
+    return counts
+
+
+def train_model(user_id=None):
+    """Train a user's model from their stored transactions, or the global
+    prior from everyone's shared categories when user_id is None. Commits
+    the result."""
+    counts = _train_counts(user_id)
+    _save_counts(user_id, counts)
+    db.session.commit()
+    invalidate_classifier(user_id)
+    return counts.n_examples
+
+
+def train_missing_models():
+    """Train a model for every user who has none yet, so no request or sync
+    has to train one on first use. Returns how many were trained."""
+    missing = db.session.query(User.id).filter(
+        ~db.session.query(CategoryModel.id).filter(CategoryModel.user_id == User.id).exists()
+    ).order_by(User.id).all()
+    for (user_id,) in missing:
+        train_model(user_id)
+    return len(missing)
+
+
+def _model_versions(user_id):
+    """updated_at of the user's stored model and of the global prior, in one query"""
+    rows = db.session.query(CategoryModel.user_id, CategoryModel.updated_at).filter(
+        or_(CategoryModel.user_id == user_id, CategoryModel.user_id.is_(None))
+    ).all()
+    user_version = next((updated_at for owner, updated_at in rows if owner is not None), None)
+    global_version = next((updated_at for owner, updated_at in rows if owner is None), None)
+    return user_version, global_version
+
+
+def _get_global_prior(version):
+    with _cache_lock:
+        if _global_prior['prior'] is not None and _global_prior['version'] == version:
+            return _global_prior['prior']
+    prior = GlobalPrior(_load_counts(None))
+    with _cache_lock:
+        _global_prior.update(prior=prior, version=version)
+    return prior
+
+
+def _get_user_counts(user_id, version):
+    counts = _load_counts(user_id) if version is not None else None
+    # Until the user's model is trained (on linking an account or by the
+    # nightly job) the global prior classifies alone
+    return counts if counts is not None else CategoryCounts(), version
+
+
+def get_classifier(user_id):
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _classifier_cache.get(user_id)
+        if cached:
+            _classifier_cache.move_to_end(user_id)
+    if cached and now - cached[2] < MODEL_CHECK_INTERVAL:
+        record_cache_lookup('classifier', True)
+        return cached[0]
+
+    versions = _model_versions(user_id)
+    if cached and cached[1] == versions:
+        record_cache_lookup('classifier', True)
+        with _cache_lock:
+            _classifier_cache[user_id] = (cached[0], versions, now)
+        return cached[0]
+
+    record_cache_lookup('classifier', False)
+    user_version, global_version = versions
+    user_counts, user_version = _get_user_counts(user_id, user_version)
+    classifier = CategoryClassifier(user_counts, _get_global_prior(global_version))
+    with _cache_lock:
+        _classifier_cache[user_id] = (classifier, (user_version, global_version), now)
+        while len(_classifier_cache) > MODEL_CACHE_SIZE:
+            _classifier_cache.popitem(last=False)
+    return classifier
+
+
+def invalidate_classifier(user_id):
+    """Drop this process's cached classifiers; other workers notice the
+    stored model's new updated_at within MODEL_CHECK_INTERVAL"""
+    with _cache_lock:
+        if user_id is None:
+            # A new global prior changes every user's classifier
+            _classifier_cache.clear()
+            _global_prior.update(prior=None, version=None)
+        else:
+            _classifier_cache.pop(user_id, None)
+
+
+def classify_transactions(user_id, records, min_confidence=MIN_CONFIDENCE):
+    """Predict categories for (name, merchant_name) pairs in one call.
+
+    Returns a category per record, or None where the model is not confident.
+    """
+    if not records:
+        return []
+    predictions = get_classifier(user_id).predict([tokenize(name, merchant_name) for name, merchant_name in records])
+    return [category if category and probability >= min_confidence else None
+            for category, probability in predictions]
+
+
+def learn_categories(user_id, records, category):
+    """Update the user's model with corrected (name, merchant_name) pairs.
+
+    The model row is locked until the caller commits, so concurrent
+    corrections are applied one after the other instead of overwriting
+    each other.
+    """
+    if category in UNCATEGORIZED or not records:
+        return
+    record = CategoryModel.query.filter_by(user_id=user_id).with_for_update().first()
+    if record is None:
+        # Not trained yet; the history it will be trained from already
+        # includes the corrected rows
+        return
+    counts = CategoryCounts.from_bytes(record.data)
+    for name, merchant_name in records:
+        counts.add(tokenize(name, merchant_name), category)
+    record.data = counts.to_bytes()
+    record.n_examples = counts.n_examples
+    record.updated_at = datetime.utcnow()
+    invalidate_classifier(user_id)
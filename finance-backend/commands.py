@@ -0,0 +1,130 @@
+import click
+from extensions import db
+from models import User
+from notification_service import drain_outbox
+from query_plans import check_query_plans
+from partitioning import ensure_transaction_partitions, partition_pruning_report
+from scheduler_service import run_scheduler, recent_job_runs
+from query_budget import record_queries, check_query_budget
+from synthetic_data import SCALES, SYNTHETIC_PASSWORD, seed_synthetic_data
+from archive_service import archive_transactions, restore_archives
+
+
+def register_commands(app):
+    @app.cli.command('check-query-plans')
+    @click.option('--user-id', default=1, help='User id to plug into the explained queries.')
+    def check_query_plans_command(user_id):
+        """Fail if any hot query falls back to a sequential scan"""
+        regressions = check_query_plans(user_id)
+        for name, tables, plan in regressions:
+            click.echo(f"Sequential scan on {', '.join(tables)} for {name}")
+            app.logger.debug(f"Plan for {name}: {plan}")
+        if regressions:
+            raise SystemExit(1)
+        click.echo("All hot queries use an index")
+
+    @app.cli.command('check-query-budgets')
+    @click.option('--user-id', default=1, help='User to make the requests as.')
+    def check_query_budgets_command(user_id):
+        """Fail if a GET endpoint with a @query_budget exceeds it or repeats a statement"""
+        from flask_jwt_extended import create_access_token
+
+        with app.app_context():
+            headers = {'Authorization': f"Bearer {create_access_token(identity=user_id)}"}
+        client = app.test_client()
+        failed = False
+        for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+            max_queries = getattr(app.view_functions[rule.endpoint], 'query_budget', None)
+            if max_queries is None or 'GET' not in rule.methods or rule.arguments:
+                continue
+            with record_queries(capture_call_sites=True) as recorder:
+                response = client.get(rule.rule, headers=headers)
+            problems = check_query_budget(recorder, max_queries)
+            if response.status_code >= 400:
+                problems.append(f"returned {response.status_code}")
+            click.echo(f"{rule.rule}: {recorder.count}/{max_queries} statements"
+                       + (f" - {'; '.join(problems)}" if problems else ""))
+            if problems:
+                failed = True
+                click.echo(recorder.report())
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command('create-transaction-partitions')
+    @click.option('--months-ahead', default=None, type=int, help='Months of partitions to create past the current one.')
+    def create_transaction_partitions_command(months_ahead):
+        """Create any missing monthly transaction partitions"""
+        if months_ahead is None:
+            months_ahead = app.config['TRANSACTION_PARTITION_MONTHS_AHEAD']
+        created = ensure_transaction_partitions(months_ahead, app.logger)
+        click.echo(f"Created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+
+    @app.cli.command('partition-report')
+    @click.option('--user-id', default=1, help='User whose transaction reads are explained.')
+    def partition_report_command(user_id):
+        """Show partition pruning and timings for the date-ranged transaction reads"""
+        for name, result in partition_pruning_report(user_id).items():
+            click.echo(f"{name}: scanned {len(result['partitions_scanned'])} of {result['partitions_total']} partitions "
+                       f"({', '.join(result['partitions_scanned'])}), planning {result['planning_ms']} ms, "
+                       f"execution {result['execution_ms']} ms")
+
+    @app.cli.command('drain-outbox')
+    def drain_outbox_command():
+        """Send every due outbox message now, ignoring the digest delay"""
+        app.config['OUTBOX_DIGEST_DELAY_SECONDS'] = 0
+        click.echo(f"Sent {drain_outbox(app.logger)} emails")
+
+    @app.cli.command('train-category-models')
+    @click.option('--user-id', default=None, type=int, help='Train only this user\'s model.')
+    def train_category_models_command(user_id):
+        """Retrain the global category prior and every user's classifier from stored transactions"""
+        from classifier_service import train_model
+
+        if user_id is not None:
+            click.echo(f"User {user_id}: trained on {train_model(user_id)} transactions")
+            return
+        click.echo(f"Global prior: trained on {train_model()} transactions")
+        for (uid,) in db.session.query(User.id).order_by(User.id).all():
+            click.echo(f"User {uid}: trained on {train_model(uid)} transactions")
+
+    @app.cli.command('run-scheduler')
+    def run_scheduler_command():
+        """Run the periodic jobs, standing by until this process is elected leader"""
+        try:
+            run_scheduler(app)
+        except KeyboardInterrupt:
+            click.echo("Scheduler stopped")
+
+    @app.cli.command('job-runs')
+    @click.option('--job-id', default=None, help='Only show runs of this job.')
+    @click.option('--limit', default=20, help='Most recent runs to show.')
+    def job_runs_command(job_id, limit):
+        """Show recent periodic job runs with their durations and row counts"""
+        for run in recent_job_runs(job_id, limit):
+            duration = f"{run.duration_ms} ms" if run.duration_ms is not None else "-"
+            click.echo(f"{run.started_at:%Y-%m-%d %H:%M:%S} {run.job_id:<30} {run.status:<10} "
+                       f"{duration:>10} {run.row_count if run.row_count is not None else '-':>8} rows  "
+                       f"{run.instance}" + (f"  {run.error}" if run.error else ""))
+
+    @app.cli.command('seed-synthetic-data')
+    @click.option('--scale', type=click.Choice(sorted(SCALES)), default='10k', help='Transactions to create.')
+    @click.option('--transactions', default=None, type=int, help='Exact number of transactions, overriding --scale.')
+    @click.option('--users', default=None, type=int, help='Users to spread them over (default: one per 5,000).')
+    @click.option('--seed', default=0, help='Random seed; the same seed gives the same data.')
+    def seed_synthetic_data_command(scale, transactions, users, seed):
+        """Create synthetic users, accounts, budgets, goals and transactions for load testing"""
+        user_ids = seed_synthetic_data(transactions or SCALES[scale], users, seed=seed, logger=app.logger)
+        click.echo(f"Created {len(user_ids)} synthetic users (ids {user_ids[0]}-{user_ids[-1]}), "
+                   f"password {SYNTHETIC_PASSWORD!r}")
+
+    @app.cli.command('archive-transactions')
+    def archive_transactions_command():
+        """Archive every transaction older than TRANSACTION_ARCHIVE_MONTHS now"""
+        click.echo(f"Archived {archive_transactions(app.logger)} transactions")
+
+    @app.cli.command('restore-transaction-archives')
+    @click.option('--since', required=True, type=click.DateTime(formats=['%Y-%m']), help='First month to restore (YYYY-MM).')
+    @click.option('--user-id', default=None, type=int, help='Only restore this user\'s archives.')
+    def restore_transaction_archives_command(since, user_id):
+        """Move archived transactions from a month onwards back into the transaction table"""
+        click.echo(f"Restored {restore_archives(since.date(), user_id, app.logger)} transactions")
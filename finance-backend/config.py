@@ -2,16 +2,16 @@ import os
 from dotenv import load_dotenv
 from cryptography.fernet import Fernet
 
-# Add debug print
-print("Current working directory:", os.getcwd())
-print("Loading .env file...")
-
 load_dotenv()
 
-# Add debug print
-print("Environment variables after load_dotenv:")
-print("JWT_SECRET_KEY:", os.getenv('JWT_SECRET_KEY'))
-print("DATABASE_URL:", os.getenv('DATABASE_URL'))
+def pool_options(prefix):
+    """Engine pool settings from <prefix>_POOL_SIZE, _MAX_OVERFLOW and _POOL_RECYCLE, where set"""
+    options = {}
+    for option in ('pool_size', 'max_overflow', 'pool_recycle'):
+        value = os.getenv(f'{prefix}_{option.upper()}')
+        if value is not None:
+            options[option] = int(value)
+    return options
 
 class Config:
     # Database settings
@@ -26,6 +26,19 @@ class Config:
     
     TESTING = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = pool_options('DB')
+
+    # Read replicas, as comma-separated URLs. Read-only views read from one
+    # of them, except for a user who wrote within REPLICA_STICKY_SECONDS.
+    # Each replica gets the REPLICA_POOL_SIZE/_MAX_OVERFLOW/_POOL_RECYCLE pool.
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {f'replica_{index}': {'url': url, **pool_options('REPLICA')}
+                        for index, url in enumerate(DATABASE_REPLICA_URLS)}
+    REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+    # Redis where the recent-write markers live, so every worker process
+    # sees them (defaults to EVENTS_REDIS_URL); when unset they are kept per
+    # process, which is only enough for a single worker
+    REPLICA_STICKY_REDIS_URL = os.getenv('REPLICA_STICKY_REDIS_URL', os.getenv('EVENTS_REDIS_URL'))
     SQLALCHEMY_ECHO = os.getenv('SQLALCHEMY_ECHO', 'False').lower() == 'true'
 
     #print(f"SQLALCHEMY_DATABASE_URI set to: {SQLALCHEMY_DATABASE_URI}")
@@ -43,6 +56,105 @@ class Config:
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'dev@financeapp.local')
 
+    # Outbox worker: how often it polls, how many messages it claims at
+    # once, how long a user's burst is held for a digest, and retry backoff
+    OUTBOX_POLL_SECONDS = int(os.getenv('OUTBOX_POLL_SECONDS', 30))
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 500))
+    OUTBOX_DIGEST_DELAY_SECONDS = int(os.getenv('OUTBOX_DIGEST_DELAY_SECONDS', 60))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+    OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 60))
+    OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('OUTBOX_RETRY_MAX_SECONDS', 3600))
+
+    # Rate limits live in RATELIMIT_STORAGE_URI (e.g. redis://host:6379/1) so
+    # every worker process shares them; memory:// keeps them per process.
+    # While the storage is unreachable each process falls back to its own.
+    # Callers are keyed by user id when they send an access token, else by IP.
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    RATELIMIT_KEY_PREFIX = 'finance'
+    # moving-window is a true sliding window; fixed-window is cheaper but
+    # allows bursts of twice the limit across a window boundary
+    RATELIMIT_STRATEGY = os.getenv('RATELIMIT_STRATEGY', 'moving-window')
+    # Each route's own limit per caller, and the budget shared by all routes,
+    # which expensive routes draw on faster (see @rate_cost)
+    RATELIMIT_DEFAULT = os.getenv('RATELIMIT_DEFAULT', '120 per minute')
+    RATELIMIT_APPLICATION = os.getenv('RATELIMIT_APPLICATION', '300 per minute;5000 per hour')
+    RATELIMIT_HEADERS_ENABLED = True
+
+    # Server-sent events: Redis pub/sub shares them between worker
+    # processes (in-process only when unset); heartbeats keep streams open
+    EVENTS_REDIS_URL = os.getenv('EVENTS_REDIS_URL')
+    EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+
+    # Response cache. In Redis (defaulting to EVENTS_REDIS_URL) it and its
+    # invalidations, including the scheduler's, are shared by every
+    # process; when unset each process keeps its own and entries written
+    # elsewhere only go stale until they time out
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', os.getenv('EVENTS_REDIS_URL'))
+    CACHE_TYPE = 'RedisCache' if CACHE_REDIS_URL else 'SimpleCache'
+    CACHE_KEY_PREFIX = 'finance:cache:'
+
+    # Also run a scheduler in a background thread of each app process (for
+    # single-process setups); `flask run-scheduler` is the dedicated entry
+    # point. Either way only the elected leader runs the jobs.
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'False').lower() == 'true'
+    # The leader renews its lease (SQLite) or checks its lock every third of
+    # this; a standby takes over within roughly this long of the leader dying
+    SCHEDULER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEASE_SECONDS', 30))
+    # How long job_run rows are kept
+    JOB_RUN_RETENTION_DAYS = int(os.getenv('JOB_RUN_RETENTION_DAYS', 30))
+    # Recategorize jobs that have not reported progress for this long were
+    # cut off by a restart and are marked failed; finished ones are kept
+    # for RECATEGORIZE_JOB_RETENTION_DAYS
+    RECATEGORIZE_STALE_SECONDS = int(os.getenv('RECATEGORIZE_STALE_SECONDS', 600))
+    RECATEGORIZE_JOB_RETENTION_DAYS = int(os.getenv('RECATEGORIZE_JOB_RETENTION_DAYS', 7))
+
+    # Bearer token Prometheus scrapes /metrics with; /metrics is off when unset
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # With several worker processes, each writes its counters and histograms
+    # here every METRICS_FLUSH_SECONDS and /metrics sums them, whichever
+    # worker is scraped. Empty it on deploy; unset, /metrics shows one process
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+    # Bearer token for the /admin endpoints; they are off when unset
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+    # Statements slower than this are logged and kept in a ring buffer of
+    # SLOW_QUERY_BUFFER_SIZE per process (0 turns this off). This share of
+    # slow SELECTs is run again under EXPLAIN ANALYZE for its plan.
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_BUFFER_SIZE = int(os.getenv('SLOW_QUERY_BUFFER_SIZE', 500))
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1))
+    # Also store them in the slow_query table, kept this many days
+    SLOW_QUERY_STORE = os.getenv('SLOW_QUERY_STORE', 'False').lower() == 'true'
+    SLOW_QUERY_RETENTION_DAYS = int(os.getenv('SLOW_QUERY_RETENTION_DAYS', 7))
+
+    # Requests carrying a profile token signed with ADMIN_TOKEN run under
+    # cProfile; the newest PROFILE_MAX_STORED profiles are kept in PROFILE_DIR
+    # (relative to the app)
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_STORED = int(os.getenv('PROFILE_MAX_STORED', 50))
+    PROFILE_TOKEN_MAX_TTL = int(os.getenv('PROFILE_TOKEN_MAX_TTL', 3600))
+
+    # Fail requests whose views exceed their @query_budget or repeat a
+    # statement (N+1); meant for tests, off in production
+    QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE', 'False').lower() == 'true'
+
+    # Batch endpoint settings
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))
+
+    # Monthly transaction partitions created ahead of time (PostgreSQL only)
+    TRANSACTION_PARTITION_MONTHS_AHEAD = int(os.getenv('TRANSACTION_PARTITION_MONTHS_AHEAD', 3))
+
+    # Most periods one budget history request may cover (five years of weeks)
+    BUDGET_HISTORY_MAX_PERIODS = int(os.getenv('BUDGET_HISTORY_MAX_PERIODS', 260))
+
+    # Transactions older than this many months (at least 13) are moved nightly
+    # into compressed per-user monthly archives plus daily rollups; 0 keeps
+    # them all live. Run `flask restore-transaction-archives` before raising it.
+    TRANSACTION_ARCHIVE_MONTHS = int(os.getenv('TRANSACTION_ARCHIVE_MONTHS', 24))
+
     # Encryption (from original)
     ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY')
     if not ENCRYPTION_KEY:
@@ -55,6 +167,7 @@ class TestConfig(Config):
         raise ValueError("No TEST_DATABASE_URL set for Flask application")
     
     JWT_SECRET_KEY = 'test-secret-key'
+    QUERY_BUDGET_ENFORCE = True
     SQLALCHEMY_ECHO = True
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
@@ -0,0 +1,62 @@
+"""Benchmark every endpoint and the budget and sync hot paths on synthetic data.
+
+A thin wrapper around the pytest-benchmark suite in tests/, which seeds
+the database once per session with synthetic_data.seed_synthetic_data and
+times each case as a synthetic user, with the app cache cleared before
+every round. Runs are saved to and compared from .benchmarks/:
+
+    python endpoint_benchmark.py --scale 100k --save 100k
+    python endpoint_benchmark.py --scale 100k --compare
+
+is the same as
+
+    pytest --scale 100k --benchmark-save=100k
+    pytest --scale 100k --benchmark-compare --benchmark-compare-fail=median:25%
+
+With --compare, a case fails if its median time grew by more than
+--max-regression percent or it ran more SQL statements than in the saved
+run. A route that is neither benchmarked nor listed in SKIPPED
+(tests/test_endpoint_benchmarks.py) also fails, so new endpoints get
+added. Other arguments are passed on to pytest.
+"""
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=['1k', '10k', '100k', '1m'], default='1k', help='Transactions to seed.')
+    parser.add_argument('--database-url', help='Database to seed and benchmark (default: a scratch SQLite file). '
+                                               'Run `flask db upgrade` on it first for PostgreSQL.')
+    parser.add_argument('--runs', type=int, default=5, help='Timed rounds of each case.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data.')
+    parser.add_argument('--save', metavar='NAME', help='Save the results under this name.')
+    parser.add_argument('--compare', nargs='?', const=True, metavar='NUM',
+                        help='Fail on regressions against saved run NUM (default: the latest).')
+    parser.add_argument('--max-regression', type=int, default=25, help='Allowed median slowdown, in percent (1-99).')
+    args, pytest_args = parser.parse_known_args()
+    if not 0 < args.max_regression < 100:
+        parser.error('--max-regression must be between 1 and 99')
+
+    if args.database_url:
+        os.environ['TEST_DATABASE_URL'] = args.database_url
+    pytest_args = [
+        '--scale', args.scale, '--seed', str(args.seed), f'--benchmark-min-rounds={args.runs}', *pytest_args
+    ]
+    if args.save:
+        pytest_args.append(f'--benchmark-save={args.save}')
+    if args.compare:
+        pytest_args += ['--benchmark-compare' if args.compare is True else f'--benchmark-compare={args.compare}',
+                        f'--benchmark-compare-fail=median:{args.max_regression}%']
+
+    import pytest
+    # pytest.ini and .benchmarks/ are relative to the backend
+    os.chdir(BACKEND_DIR)
+    sys.exit(pytest.main(pytest_args))
+
+
+if __name__ == '__main__':
+    main()
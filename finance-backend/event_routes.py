@@ -0,0 +1,34 @@
+import queue
+from flask import Blueprint, Response, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from events_service import subscribe as subscribe_events, unsubscribe as unsubscribe_events, format_sse
+
+event_bp = Blueprint('event', __name__)
+
+
+@event_bp.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    """Server-sent events for the user's new alerts, notifications and finished syncs.
+
+    EventSource cannot set headers, so the token may also be passed as ?jwt=.
+    Each open stream holds a worker thread.
+    """
+    user_id = get_jwt_identity()
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+    subscriber = subscribe_events(user_id)
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield format_sse(subscriber.get(timeout=heartbeat))
+                except queue.Empty:
+                    # Keeps proxies from closing the stream and notices closed clients
+                    yield ": keepalive\n\n"
+        finally:
+            unsubscribe_events(user_id, subscriber)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,157 @@
+import json
+import queue
+import threading
+from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import BudgetAlert, Notification
+
+# Events a slow client has not read yet; older ones are dropped beyond this
+SUBSCRIBER_QUEUE_SIZE = 100
+REDIS_CHANNEL_PREFIX = 'finance:events:'
+
+
+class LocalEventBus:
+    """Per-user pub/sub between threads of one process"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[str(user_id)].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(str(user_id))
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[str(user_id)]
+
+    def deliver(self, user_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(user_id), ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                # Drop the oldest event rather than block the publisher
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(payload)
+
+    def publish(self, user_id, payload):
+        self.deliver(user_id, payload)
+
+
+class RedisEventBus(LocalEventBus):
+    """Fans events out to every worker process through Redis pub/sub.
+
+    Publishing goes to Redis only; one listener thread per process receives
+    every user's channel and delivers to the local subscribers.
+    """
+
+    def __init__(self, redis_url, logger):
+        import redis
+        super().__init__()
+        self._redis = redis.Redis.from_url(redis_url)
+        self._logger = logger
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(**{REDIS_CHANNEL_PREFIX + '*': self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True,
+                                                  exception_handler=self._on_error)
+
+    def _on_message(self, message):
+        user_id = message['channel'].decode()[len(REDIS_CHANNEL_PREFIX):]
+        self.deliver(user_id, message['data'].decode())
+
+    def _on_error(self, error, pubsub, thread):
+        self._logger.error(f"Error in the Redis event listener: {str(error)}")
+
+    def publish(self, user_id, payload):
+        try:
+            self._redis.publish(f'{REDIS_CHANNEL_PREFIX}{user_id}', payload)
+        except Exception as e:
+            # Events are best effort; the data itself is already committed
+            self._logger.error(f"Error publishing event for user {user_id}: {str(e)}")
+
+
+_bus = LocalEventBus()
+
+
+def init_event_bus(app):
+    """Use Redis pub/sub when EVENTS_REDIS_URL is set, otherwise stay in-process"""
+    global _bus
+    redis_url = app.config.get('EVENTS_REDIS_URL')
+    if not redis_url:
+        return
+    try:
+        _bus = RedisEventBus(redis_url, app.logger)
+    except Exception as e:
+        app.logger.error(f"Could not connect to Redis for events, using in-process delivery: {str(e)}")
+
+
+def subscribe(user_id):
+    return _bus.subscribe(user_id)
+
+
+def unsubscribe(user_id, subscriber):
+    _bus.unsubscribe(user_id, subscriber)
+
+
+def publish_event(user_id, event_type, data):
+    """Push an event to every open stream of the user"""
+    _bus.publish(user_id, json.dumps({'type': event_type, 'data': data}))
+
+
+def format_sse(payload):
+    message = json.loads(payload)
+    return f"event: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+def alert_event(alert):
+    return {
+        'id': alert.id,
+        'budget_id': alert.budget_id,
+        'alert_type': alert.alert_type,
+        'message': alert.message,
+        'created_at': alert.created_at.isoformat() if alert.created_at else None
+    }
+
+
+def notification_event(notification):
+    return {
+        'id': notification.id,
+        'message': notification.message,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None
+    }
+
+
+# New alert and notification rows are pushed once their transaction commits,
+# whichever code path created them
+
+@event.listens_for(Session, 'after_flush')
+def _collect_new_rows(session, flush_context):
+    pending = session.info.setdefault('pending_events', [])
+    for instance in session.new:
+        if isinstance(instance, BudgetAlert):
+            pending.append((instance.user_id, 'budget_alert', alert_event(instance)))
+        elif isinstance(instance, Notification):
+            pending.append((instance.user_id, 'notification', notification_event(instance)))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed(session):
+    for user_id, event_type, data in session.info.pop('pending_events', []):
+        publish_event(user_id, event_type, data)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('pending_events', None)
@@ -1,3 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_caching import Cache
+from flask_limiter import Limiter
+from replica_routing import RoutingSession
+from rate_limiting import rate_limit_key, request_cost
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+# Backend from the CACHE_* settings in config.py
+cache = Cache()
+# Storage, strategy and limits come from the RATELIMIT_* settings in config.py.
+# Each route has its own RATELIMIT_DEFAULT limit per caller, and every
+# request also spends its @rate_cost from the caller's RATELIMIT_APPLICATION
+# budget, shared by all routes.
+limiter = Limiter(
+    key_func=rate_limit_key,
+    application_limits_cost=request_cost
+)
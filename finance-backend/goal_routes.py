@@ -0,0 +1,86 @@
+from datetime import datetime
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db
+from replica_routing import read_only
+from query_budget import query_budget
+from models import FinancialGoal
+
+goal_bp = Blueprint('goal', __name__)
+
+
+@goal_bp.route('/financial_goals', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(1)
+def get_financial_goals():
+    user_id = get_jwt_identity()
+    try:
+        goals = FinancialGoal.query.filter_by(user_id=user_id).all()
+        return jsonify([goal.to_dict() for goal in goals]), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching financial goals: {str(e)}")
+        return jsonify({"error": "An error occurred while fetching financial goals"}), 500
+
+
+@goal_bp.route('/financial_goals', methods=['POST'])
+@jwt_required()
+def create_financial_goal():
+    user_id = get_jwt_identity()
+    data = request.json
+    try:
+        new_goal = FinancialGoal(
+            user_id=user_id,
+            name=data['name'],
+            target_amount=data['target_amount'],
+            current_amount=data.get('current_amount', 0),
+            target_date=datetime.fromisoformat(data['target_date'])
+        )
+        db.session.add(new_goal)
+        db.session.commit()
+        return jsonify(new_goal.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error creating financial goal: {str(e)}")
+        return jsonify({"error": "An error occurred while creating the financial goal"}), 500
+
+
+@goal_bp.route('/financial_goals/<int:goal_id>', methods=['PUT'])
+@jwt_required()
+def update_financial_goal(goal_id):
+    user_id = get_jwt_identity()
+    data = request.json
+    try:
+        goal = FinancialGoal.query.filter_by(id=goal_id, user_id=user_id).first()
+        if not goal:
+            return jsonify({"error": "Goal not found"}), 404
+
+        goal.name = data.get('name', goal.name)
+        goal.target_amount = data.get('target_amount', goal.target_amount)
+        goal.current_amount = data.get('current_amount', goal.current_amount)
+        goal.target_date = datetime.fromisoformat(data.get('target_date', goal.target_date.isoformat()))
+
+        db.session.commit()
+        return jsonify(goal.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error updating financial goal: {str(e)}")
+        return jsonify({"error": "An error occurred while updating the financial goal"}), 500
+
+
+@goal_bp.route('/financial_goals/<int:goal_id>', methods=['DELETE'])
+@jwt_required()
+def delete_financial_goal(goal_id):
+    user_id = get_jwt_identity()
+    try:
+        goal = FinancialGoal.query.filter_by(id=goal_id, user_id=user_id).first()
+        if not goal:
+            return jsonify({"error": "Goal not found"}), 404
+
+        db.session.delete(goal)
+        db.session.commit()
+        return jsonify({"message": "Goal deleted successfully"}), 200
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deleting financial goal: {str(e)}")
+        return jsonify({"error": "An error occurred while deleting the financial goal"}), 500
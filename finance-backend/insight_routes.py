@@ -0,0 +1,215 @@
+from datetime import date, datetime, timedelta
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, case
+from extensions import db
+from replica_routing import read_only
+from query_budget import query_budget
+from rate_limiting import rate_cost
+from models import Account, Budget, FinancialGoal, Transaction, TransactionDailyRollup
+from money import minor_units, to_minor_units, from_minor_units
+from archive_service import rollup_totals
+
+insight_bp = Blueprint('insight', __name__)
+
+
+@insight_bp.route('/spending_trends', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(2)
+@rate_cost(3)
+def get_spending_trends():
+    try:
+        user_id = get_jwt_identity()
+        start_date_str = request.args.get('start_date', (datetime.now() - timedelta(days=30)).date().isoformat())
+        end_date_str = request.args.get('end_date', datetime.now().date().isoformat())
+
+        # Convert string dates to datetime objects
+        start_date = datetime.fromisoformat(start_date_str).date()
+        end_date = datetime.fromisoformat(end_date_str).date()
+
+        current_app.logger.info(f"Fetching spending trends for user {user_id} from {start_date} to {end_date}")
+
+        rows = db.session.query(
+            Transaction.category,
+            func.sum(minor_units(Transaction.amount))
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.date.isnot(None),
+            Transaction.date >= start_date,
+            Transaction.date <= end_date,
+            Transaction.category.isnot(None),
+            Transaction.category != '',
+            Transaction.amount != 0
+        ).group_by(Transaction.category).all()
+        # Archived days are summed from their rollups
+        rows += rollup_totals(
+            user_id, start_date, end_date, TransactionDailyRollup.total,
+            filters=(TransactionDailyRollup.category.isnot(None), TransactionDailyRollup.category != ''),
+            group_by=(TransactionDailyRollup.category,)
+        )
+
+        totals = {}
+        for category, total in rows:
+            totals[category] = totals.get(category, 0) + int(total)
+        # Invert all transaction amounts
+        category_totals = {category: -from_minor_units(total) for category, total in totals.items()}
+
+        current_app.logger.info(f"Spending trends for user {user_id}: {category_totals}")
+        return jsonify(category_totals)
+    except ValueError as ve:
+        current_app.logger.error(f"Value Error in get_spending_trends: {str(ve)}")
+        return jsonify({"error": "Invalid date format provided"}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error in get_spending_trends: {str(e)}")
+        return jsonify({"error": "An error occurred while fetching spending trends"}), 500
+
+
+@insight_bp.route('/weekly_activity', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(1)
+@rate_cost(3)
+def get_weekly_activity():
+    user_id = get_jwt_identity()
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=7)
+
+    try:
+        amount = minor_units(Transaction.amount)
+        rows = db.session.query(
+            Transaction.date,
+            func.sum(case((amount > 0, amount), else_=0)),
+            func.sum(case((amount < 0, -amount), else_=0))
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= start_date,
+            Transaction.date <= end_date
+        ).group_by(Transaction.date).all()
+
+        daily_totals = {day: {"deposit": 0, "withdraw": 0} for day in ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']}
+
+        for transaction_date, deposit, withdraw in rows:
+            day = transaction_date.strftime('%a')  # Get the abbreviated day name
+            daily_totals[day]["deposit"] += int(deposit)
+            daily_totals[day]["withdraw"] += int(withdraw)
+
+        weekly_activity = [
+            {"day": day, "deposit": from_minor_units(totals["deposit"]), "withdraw": from_minor_units(totals["withdraw"])}
+            for day, totals in daily_totals.items()
+        ]
+
+        return jsonify(weekly_activity), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in get_weekly_activity: {str(e)}")
+        return jsonify({"error": "An error occurred while processing your request"}), 500
+
+
+@insight_bp.route('/balance_history', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(2)
+@rate_cost(3)
+def get_balance_history():
+    user_id = get_jwt_identity()
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=30)
+
+    try:
+        final_balance = db.session.query(
+            func.coalesce(func.sum(minor_units(Account.balance)), 0)
+        ).filter(Account.user_id == user_id).scalar()
+
+        # Net change per day, in minor units
+        daily_changes = dict(db.session.query(
+            Transaction.date,
+            func.sum(minor_units(Transaction.amount))
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= start_date,
+            Transaction.date <= end_date
+        ).group_by(Transaction.date).all())
+
+        # Work backwards from current balance
+        balance_history = []
+        current_balance = int(final_balance)
+
+        for day in reversed([(start_date + timedelta(n)) for n in range((end_date - start_date).days + 1)]):
+            balance_history.append({
+                "date": day.strftime('%Y-%m-%d'),
+                "balance": from_minor_units(current_balance)
+            })
+            # Subtract the day's transactions (reverse the changes)
+            current_balance -= int(daily_changes.get(day, 0))
+        balance_history.reverse()
+
+        return jsonify(balance_history), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in get_balance_history: {str(e)}")
+        return jsonify({"error": "An error occurred while processing your request"}), 500
+
+
+@insight_bp.route('/financial_health_score', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(5)
+@rate_cost(5)
+def get_financial_health_score():
+    user_id = get_jwt_identity()
+    try:
+        # Fetch necessary data for score calculation
+        accounts = Account.query.filter_by(user_id=user_id).all()
+        budgets = Budget.query.filter_by(user_id=user_id).all()
+        goals = FinancialGoal.query.filter_by(user_id=user_id).all()
+
+        # Income and expenses are summed in SQL instead of loading every transaction
+        amount = minor_units(Transaction.amount)
+        total_income, total_expenses = db.session.query(
+            func.coalesce(func.sum(case((amount > 0, amount), else_=0)), 0),
+            func.coalesce(func.sum(case((amount < 0, -amount), else_=0)), 0)
+        ).filter(Transaction.user_id == user_id).one()
+        for archived_income, archived_expenses in rollup_totals(
+            user_id, date.min, None, TransactionDailyRollup.deposits, TransactionDailyRollup.withdrawals
+        ):
+            total_income += int(archived_income)
+            total_expenses += int(archived_expenses)
+
+        # Calculate financial health score
+        score, breakdown = calculate_financial_health_score(
+            accounts, from_minor_units(total_income), from_minor_units(total_expenses), budgets, goals
+        )
+
+        return jsonify({'score': score, 'breakdown': breakdown}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error calculating financial health score: {str(e)}")
+        return jsonify({"error": "An error occurred while calculating the financial health score"}), 500
+
+
+def calculate_financial_health_score(accounts, total_income, total_expenses, budgets, goals):
+    total_balance = from_minor_units(sum(to_minor_units(account.balance) for account in accounts))
+    total_budget = from_minor_units(sum(to_minor_units(budget.budget_limit) for budget in budgets))
+
+    # Calculate sub-scores
+    savings_ratio = min(total_balance / (total_income or 1), 1) * 20
+    income_expense_ratio = min(total_income / (total_expenses or 1), 2) * 20
+    budget_adherence = min(total_budget / (total_expenses or 1), 1) * 20
+
+    # Calculate debt-to-income ratio
+    debt = sum(account.balance for account in accounts if account.type == 'loan' or account.type == 'credit')
+    debt_to_income_ratio = 20 * (1 - min(debt / (total_income or 1), 1))
+
+    # Calculate goal progress
+    goal_progress = sum(goal.current_amount / goal.target_amount for goal in goals) / (len(goals) or 1) * 20
+
+    # Calculate overall score (out of 100)
+    score = savings_ratio + income_expense_ratio + budget_adherence + debt_to_income_ratio + goal_progress
+
+    breakdown = {
+        'savings_ratio': round(savings_ratio, 2),
+        'income_expense_ratio': round(income_expense_ratio, 2),
+        'budget_adherence': round(budget_adherence, 2),
+        'debt_to_income_ratio': round(debt_to_income_ratio, 2),
+        'goal_progress': round(goal_progress, 2)
+    }
+
+    return round(score, 2), breakdown
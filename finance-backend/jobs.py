@@ -0,0 +1,103 @@
+from extensions import db, cache
+from models import PlaidItem
+from plaid_service import fetch_and_store_transactions
+from budget_service import evaluate_budget_alerts, create_next_recurring_budgets
+from notification_service import drain_outbox
+from partitioning import ensure_transaction_partitions
+from scheduler_service import run_job, prune_job_runs
+from slow_query import prune_slow_queries
+from archive_service import archive_transactions
+from recategorize_service import prune_recategorize_jobs
+
+
+def update_transactions(logger):
+    """Sync transactions for every linked item; returns how many were stored"""
+    logger.info("Starting scheduled transaction update")
+
+    synced = 0
+    plaid_items = PlaidItem.query.all()
+    for plaid_item in plaid_items:
+        try:
+            logger.info(f"Updating transactions for PlaidItem {plaid_item.id}")
+            synced += fetch_and_store_transactions(
+                access_token=plaid_item.access_token,
+                user_id=plaid_item.user_id,
+                logger=logger
+            ) or 0
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error updating transactions for PlaidItem {plaid_item.id}: {str(e)}")
+            continue
+
+    logger.info("Completed scheduled transaction update")
+    return synced
+
+
+def init_scheduler(app, instance):
+    """Register the periodic jobs and start APScheduler.
+
+    Only the elected scheduler process calls this (see scheduler_service),
+    so each job runs once however many web workers there are. Every run is
+    recorded in job_run under this process's instance id.
+    """
+    from flask_apscheduler import APScheduler
+
+    scheduler = APScheduler()
+    scheduler.init_app(app)
+
+    @scheduler.task('cron', id='sync_transactions', hour='*/6')
+    def sync_transactions_job():
+        run_job(app, instance, 'sync_transactions', lambda: update_transactions(app.logger))
+        # Then evaluate every user's budgets in one pass
+        run_job(app, instance, 'evaluate_budget_alerts', lambda: len(evaluate_budget_alerts()))
+        with app.app_context():
+            # Spending changed for everyone. This reaches the web workers
+            # only through a shared cache (CACHE_REDIS_URL)
+            cache.clear()
+
+    @scheduler.task('cron', id='create_transaction_partitions', hour=1)
+    def create_transaction_partitions_job():
+        run_job(app, instance, 'create_transaction_partitions', lambda: len(
+            ensure_transaction_partitions(app.config['TRANSACTION_PARTITION_MONTHS_AHEAD'], app.logger)
+        ))
+
+    @scheduler.task('interval', id='drain_outbox', seconds=app.config['OUTBOX_POLL_SECONDS'])
+    def drain_outbox_job():
+        run_job(app, instance, 'drain_outbox', lambda: drain_outbox(app.logger))
+
+    @scheduler.task('cron', id='train_global_category_model', hour=2)
+    def train_global_category_model_job():
+        from classifier_service import train_model, train_missing_models
+
+        run_job(app, instance, 'train_global_category_model', train_model)
+        run_job(app, instance, 'train_missing_category_models', train_missing_models)
+
+    # Roll recurring budgets forward every day at midnight, catching up any missed periods
+    @scheduler.task('cron', id='create_recurring_budgets', hour=0)
+    def create_recurring_budgets_job():
+        run_job(app, instance, 'create_recurring_budgets', create_next_recurring_budgets)
+
+    @scheduler.task('cron', id='prune_job_runs', hour=3)
+    def prune_job_runs_job():
+        run_job(app, instance, 'prune_job_runs', lambda: prune_job_runs(app.config['JOB_RUN_RETENTION_DAYS']))
+
+    @scheduler.task('cron', id='prune_recategorize_jobs', hour=3, minute=15)
+    def prune_recategorize_jobs_job():
+        run_job(app, instance, 'prune_recategorize_jobs',
+                lambda: prune_recategorize_jobs(app.config['RECATEGORIZE_JOB_RETENTION_DAYS']))
+
+    @scheduler.task('cron', id='prune_slow_queries', hour=3, minute=30)
+    def prune_slow_queries_job():
+        run_job(app, instance, 'prune_slow_queries',
+                lambda: prune_slow_queries(app.config['SLOW_QUERY_RETENTION_DAYS']))
+
+    @scheduler.task('cron', id='archive_transactions', hour=4)
+    def archive_transactions_job():
+        run_job(app, instance, 'archive_transactions', lambda: archive_transactions(app.logger))
+        with app.app_context():
+            # Cached transaction lists may still hold archived rows' ids;
+            # as above, only a shared cache carries this to the web workers
+            cache.clear()
+
+    scheduler.start()
+    return scheduler
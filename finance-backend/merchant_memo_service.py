@@ -0,0 +1,201 @@
+import re
+import time
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import MerchantCategoryMemo, MerchantCategoryCorrection
+from metrics import record_cache_lookup
+
+# A correcting user counts for this many Plaid observations, but only once
+# this many distinct users agree, so one user's choice is never shared
+USER_WEIGHT = 5
+MIN_CORRECTING_USERS = 3
+# The winning category needs this much weight and this share of the total
+MIN_CONFIDENCE = 3
+MIN_SHARE = 0.6
+
+# Rows per upsert statement
+UPSERT_BATCH_SIZE = 1000
+
+# Plaid's personal_finance_category primaries: the only categories every user
+# shares. Corrections to anything else are the user's own and stay private.
+SHARED_CATEGORIES = frozenset({
+    'INCOME', 'TRANSFER_IN', 'TRANSFER_OUT', 'LOAN_PAYMENTS', 'BANK_FEES', 'ENTERTAINMENT',
+    'FOOD_AND_DRINK', 'GENERAL_MERCHANDISE', 'HOME_IMPROVEMENT', 'MEDICAL', 'PERSONAL_CARE',
+    'GENERAL_SERVICES', 'GOVERNMENT_AND_NON_PROFIT', 'TRANSPORTATION', 'TRAVEL', 'RENT_AND_UTILITIES'
+})
+
+MEMO_CACHE_SIZE = 50000
+MEMO_CACHE_TTL = 600
+
+# Keys keep letters in any script and digits ("7 eleven", "shell 76"); only
+# punctuation and a trailing run of 3+ digit store numbers are dropped
+_PUNCTUATION = re.compile(r'[^\w&]+|_+', re.UNICODE)
+_STORE_NUMBERS = re.compile(r'(?: \d{3,})+$', re.UNICODE)
+
+_memo_cache = OrderedDict()
+_memo_cache_lock = threading.Lock()
+
+
+def normalize_merchant(merchant):
+    """Lower-case a merchant string and drop punctuation and trailing store numbers"""
+    if not merchant:
+        return None
+    key = _PUNCTUATION.sub(' ', merchant.lower()).strip()
+    key = _STORE_NUMBERS.sub('', key)
+    return key[:255] or None
+
+
+def _cache_get(key, now):
+    cached = _memo_cache.get(key)
+    if cached and now - cached[1] < MEMO_CACHE_TTL:
+        _memo_cache.move_to_end(key)
+        return True, cached[0]
+    return False, None
+
+
+def _cache_put(key, category, now):
+    _memo_cache[key] = (category, now)
+    _memo_cache.move_to_end(key)
+    while len(_memo_cache) > MEMO_CACHE_SIZE:
+        _memo_cache.popitem(last=False)
+
+
+def _pick_category(rows):
+    weights = {
+        row.category: row.plaid_count + (USER_WEIGHT * row.user_count if row.user_count >= MIN_CORRECTING_USERS else 0)
+        for row in rows if row.category in SHARED_CATEGORIES
+    }
+    if not weights:
+        return None
+    category, weight = max(weights.items(), key=lambda item: item[1])
+    total = sum(weights.values())
+    if weight >= MIN_CONFIDENCE and weight >= MIN_SHARE * total:
+        return category
+    return None
+
+
+def resolve_merchant_categories(merchants):
+    """Look up the memo for a batch of merchant strings.
+
+    Returns a dict of merchant string -> category for the confident matches.
+    Keys already in the in-process LRU (hits and misses alike) skip the
+    database; the rest are fetched with one query.
+    """
+    keys = {merchant: normalize_merchant(merchant) for merchant in merchants if merchant}
+    now = time.monotonic()
+    resolved_keys = {}
+    missing = set()
+    with _memo_cache_lock:
+        for key in set(keys.values()):
+            if key is None:
+                continue
+            hit, category = _cache_get(key, now)
+            record_cache_lookup('merchant_memo', hit)
+            if hit:
+                resolved_keys[key] = category
+            else:
+                missing.add(key)
+
+    if missing:
+        rows_by_key = defaultdict(list)
+        for row in MerchantCategoryMemo.query.filter(MerchantCategoryMemo.merchant_key.in_(missing)).all():
+            rows_by_key[row.merchant_key].append(row)
+        with _memo_cache_lock:
+            for key in missing:
+                category = _pick_category(rows_by_key[key]) if key in rows_by_key else None
+                _cache_put(key, category, now)
+                resolved_keys[key] = category
+
+    return {merchant: resolved_keys[key] for merchant, key in keys.items()
+            if key is not None and resolved_keys.get(key)}
+
+
+def _upsert(rows, set_columns):
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        statement = insert(MerchantCategoryMemo).values(rows[start:start + UPSERT_BATCH_SIZE])
+        if set_columns:
+            statement = statement.on_conflict_do_update(
+                index_elements=['merchant_key', 'category'],
+                set_=dict({
+                    column: getattr(MerchantCategoryMemo, column) + getattr(statement.excluded, column)
+                    for column in set_columns
+                }, updated_at=statement.excluded.updated_at)
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=['merchant_key', 'category'])
+        db.session.execute(statement)
+
+
+def _record_corrections(user_id, corrections):
+    """Replace the user's corrections for these merchants and recount the
+    distinct users behind each of their categories"""
+    keys = list(corrections)
+    for start in range(0, len(keys), UPSERT_BATCH_SIZE):
+        batch = keys[start:start + UPSERT_BATCH_SIZE]
+        # A user who changes their mind moves their vote rather than adding one
+        MerchantCategoryCorrection.query.filter(
+            MerchantCategoryCorrection.user_id == user_id,
+            MerchantCategoryCorrection.merchant_key.in_(batch)
+        ).delete(synchronize_session=False)
+        db.session.add_all([
+            MerchantCategoryCorrection(merchant_key=key, category=corrections[key], user_id=user_id)
+            for key in batch
+        ])
+        db.session.flush()
+
+        distinct_users = select(func.count(MerchantCategoryCorrection.id)).where(
+            MerchantCategoryCorrection.merchant_key == MerchantCategoryMemo.merchant_key,
+            MerchantCategoryCorrection.category == MerchantCategoryMemo.category
+        ).scalar_subquery()
+        MerchantCategoryMemo.query.filter(MerchantCategoryMemo.merchant_key.in_(batch)).update(
+            {MerchantCategoryMemo.user_count: distinct_users, MerchantCategoryMemo.updated_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+
+
+def record_merchant_categories(observations, source, user_id=None):
+    """Add (merchant string, category) observations to the memo.
+
+    source is 'plaid' for categories from ingestion or 'user' for
+    corrections by user_id. Only Plaid's shared categories reach the memo.
+    Plaid counts are aggregated and upserted in batches; a user counts once
+    per merchant, for the category they last chose. A user's corrections
+    to their own categories are kept as well, so recategorization leaves
+    those merchants alone. The caller commits.
+    """
+    counts = Counter()
+    corrections = {}
+    for merchant, category in observations:
+        key = normalize_merchant(merchant)
+        if key and category:
+            corrections[key] = category
+            if category in SHARED_CATEGORIES:
+                counts[(key, category)] += 1
+
+    now = datetime.utcnow()
+    if source == 'user':
+        if not corrections:
+            return 0
+        # Make sure every chosen shared category has a row to count users into
+        shared = [{'merchant_key': key, 'category': category, 'plaid_count': 0, 'user_count': 0,
+                   'updated_at': now} for key, category in corrections.items() if category in SHARED_CATEGORIES]
+        if shared:
+            _upsert(shared, ())
+        _record_corrections(user_id, corrections)
+        touched = corrections
+    else:
+        if not counts:
+            return 0
+        _upsert([{'merchant_key': key, 'category': category, 'plaid_count': count, 'user_count': 0,
+                  'updated_at': now} for (key, category), count in counts.items()], ('plaid_count',))
+        touched = {key for key, _ in counts}
+
+    with _memo_cache_lock:
+        for key in touched:
+            _memo_cache.pop(key, None)
+    return len(touched)
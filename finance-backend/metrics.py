@@ -0,0 +1,294 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timezone
+from flask import g, has_app_context, request
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+
+# Latency buckets in seconds, and count buckets for statements per request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def state(self):
+        """This process's values, JSON-serializable"""
+        with self._lock:
+            return [[list(labelvalues), value] for labelvalues, value in self._values.items()]
+
+    def render(self, other_states=()):
+        """The values summed with other processes' states"""
+        values = {}
+        for state in (self.state(), *other_states):
+            for labelvalues, value in state:
+                labelvalues = tuple(labelvalues)
+                values[labelvalues] = values.get(labelvalues, 0) + value
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labelvalues)} {_format(value)}')
+        return lines
+
+
+class Histogram:
+    """Bucketed observations per label set, rendered as cumulative buckets"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), sum and count
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def state(self):
+        """This process's buckets, sums and counts, JSON-serializable"""
+        with self._lock:
+            return [[list(labelvalues), list(counts), total, count]
+                    for labelvalues, (counts, total, count) in self._values.items()]
+
+    def render(self, other_states=()):
+        """The observations merged with other processes' states"""
+        values = {}
+        for state in (self.state(), *other_states):
+            for labelvalues, counts, total, count in state:
+                merged = values.setdefault(tuple(labelvalues), [[0] * (len(self.buckets) + 1), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labelvalues, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labelvalues)} {_format(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labelvalues)} {count}')
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    'finance_http_request_duration_seconds', 'Time spent handling a request.',
+    ('method', 'route', 'status'))
+REQUEST_SQL_STATEMENTS = Histogram(
+    'finance_http_request_sql_statements', 'SQL statements executed per request.',
+    ('route',), COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram(
+    'finance_http_request_sql_duration_seconds', 'Time spent in the database per request.',
+    ('route',))
+SQL_STATEMENTS = Counter(
+    'finance_sql_statements_total', 'SQL statements executed, in and out of requests.')
+PLAID_CALLS = Counter(
+    'finance_plaid_calls_total', 'Plaid API calls.', ('operation', 'outcome'))
+PLAID_LATENCY = Histogram(
+    'finance_plaid_call_duration_seconds', 'Plaid API call latency.', ('operation',))
+CACHE_LOOKUPS = Counter(
+    'finance_cache_lookups_total', 'In-process cache lookups.', ('cache', 'result'))
+
+REGISTRY = [REQUEST_LATENCY, REQUEST_SQL_STATEMENTS, REQUEST_SQL_SECONDS, SQL_STATEMENTS,
+            PLAID_CALLS, PLAID_LATENCY, CACHE_LOOKUPS]
+
+
+# Directory each process writes its metrics to (METRICS_MULTIPROC_DIR), so
+# any worker can render the totals of all of them
+_multiprocess_dir = None
+_flush_seconds = 5.0
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def _state_path(pid):
+    return os.path.join(_multiprocess_dir, f'metrics_{pid}.json')
+
+
+def flush_metrics(force=False):
+    """Write this process's metrics to the shared directory, at most every
+    METRICS_FLUSH_SECONDS unless forced"""
+    global _last_flush
+    if _multiprocess_dir is None:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < _flush_seconds:
+        return
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        _last_flush = now
+        path = _state_path(os.getpid())
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump({metric.name: metric.state() for metric in REGISTRY}, file)
+        # Readers never see a half-written file
+        os.replace(f'{path}.tmp', path)
+    finally:
+        _flush_lock.release()
+
+
+def _other_process_states():
+    """Each metric's states as last written by the other processes,
+    including ones that have exited, so counters never go backwards"""
+    states = {metric.name: [] for metric in REGISTRY}
+    if _multiprocess_dir is None:
+        return states
+    own = _state_path(os.getpid())
+    for path in glob.glob(os.path.join(_multiprocess_dir, 'metrics_*.json')):
+        if path == own:
+            continue
+        try:
+            with open(path) as file:
+                process_states = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for name, state in process_states.items():
+            if name in states:
+                states[name].append(state)
+    return states
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache, 'hit' if hit else 'miss')
+
+
+@contextmanager
+def observe_plaid_call(operation):
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        PLAID_LATENCY.observe(time.perf_counter() - started, operation)
+        PLAID_CALLS.inc(operation, outcome)
+
+
+# Statement counts and database time, attributed to the current request
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['statement_started'].pop()
+    SQL_STATEMENTS.inc()
+    if has_app_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += elapsed
+    # Also covers processes that serve no requests, such as the scheduler
+    flush_metrics()
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def init_metrics(app):
+    global _multiprocess_dir, _flush_seconds
+    if app.config.get('METRICS_MULTIPROC_DIR'):
+        _multiprocess_dir = app.config['METRICS_MULTIPROC_DIR']
+        _flush_seconds = app.config['METRICS_FLUSH_SECONDS']
+        os.makedirs(_multiprocess_dir, exist_ok=True)
+        atexit.register(flush_metrics, force=True)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_started' in g:
+            route = _route()
+            REQUEST_LATENCY.observe(time.perf_counter() - g.request_started,
+                                    request.method, route, response.status_code)
+            REQUEST_SQL_STATEMENTS.observe(g.sql_statements, route)
+            REQUEST_SQL_SECONDS.observe(g.sql_seconds, route)
+            flush_metrics()
+        return response
+
+
+def _job_run_lines():
+    """The latest run of each scheduler job, from job_run, so runs in the
+    dedicated scheduler process show up whichever worker is scraped"""
+    from extensions import db
+    from models import JobRun
+
+    latest = db.session.query(func.max(JobRun.id)).filter(JobRun.status != 'running').group_by(JobRun.job_id)
+    runs = JobRun.query.filter(JobRun.id.in_(latest)).order_by(JobRun.job_id).all()
+    gauges = [
+        ('finance_job_last_duration_seconds', 'Duration of the latest finished run of each job.',
+         lambda run: run.duration_ms / 1000 if run.duration_ms is not None else None),
+        ('finance_job_last_rows', 'Rows touched by the latest finished run of each job.',
+         lambda run: run.row_count),
+        ('finance_job_last_success', 'Whether the latest finished run of each job succeeded.',
+         lambda run: 1 if run.status == 'succeeded' else 0),
+        ('finance_job_last_finished_timestamp_seconds', 'When the latest run of each job finished.',
+         # finished_at is naive UTC
+         lambda run: run.finished_at.replace(tzinfo=timezone.utc).timestamp() if run.finished_at else None),
+    ]
+    lines = []
+    for name, documentation, value_of in gauges:
+        lines += [f'# HELP {name} {documentation}', f'# TYPE {name} gauge']
+        for run in runs:
+            value = value_of(run)
+            if value is not None:
+                lines.append(f'{name}{_labels(("job",), (run.job_id,))} {_format(value)}')
+    return lines
+
+
+def render_metrics():
+    """Everything in the Prometheus text exposition format. With
+    METRICS_MULTIPROC_DIR set, counters and histograms are summed over
+    every process that has written there"""
+    other_states = _other_process_states()
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render(other_states[metric.name])
+    lines += _job_run_lines()
+    return '\n'.join(lines) + '\n'
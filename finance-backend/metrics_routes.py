@@ -0,0 +1,19 @@
+from flask import Blueprint, Response
+from extensions import limiter
+from admin_auth import token_required
+from metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+@limiter.exempt
+@token_required('METRICS_TOKEN')
+def get_metrics():
+    """Prometheus scrape endpoint, behind the METRICS_TOKEN bearer token.
+
+    Counters and histograms cover every process sharing
+    METRICS_MULTIPROC_DIR (only this one when unset); scheduler job gauges
+    come from job_run.
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
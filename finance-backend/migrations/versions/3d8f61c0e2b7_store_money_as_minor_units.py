@@ -0,0 +1,66 @@
+"""store money as minor units
+
+Revision ID: 3d8f61c0e2b7
+Revises: 7c2e4b9d1a35
+Create Date: 2026-10-19 09:47:31.402877
+
+Converts every monetary column from a float to a BIGINT count of minor
+units (amount * 100, rounded to the nearest minor unit).
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8f61c0e2b7'
+down_revision = '7c2e4b9d1a35'
+branch_labels = None
+depends_on = None
+
+MONEY_COLUMNS = [
+    ('account', 'balance', False),
+    ('transaction', 'amount', False),
+    ('budget', 'budget_limit', False),
+    ('budget', 'current_spending', False),
+    ('financial_goal', 'target_amount', False),
+    ('financial_goal', 'current_amount', True),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, column, nullable in MONEY_COLUMNS:
+            op.alter_column(table, column,
+                            existing_type=sa.Float(),
+                            type_=sa.BigInteger(),
+                            existing_nullable=nullable,
+                            postgresql_using=f'round({column}::numeric * 100)::bigint')
+        return
+
+    for table, column, nullable in MONEY_COLUMNS:
+        op.execute(f'UPDATE "{table}" SET {column} = CAST(ROUND({column} * 100) AS INTEGER)')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                                  existing_type=sa.Float(),
+                                  type_=sa.BigInteger(),
+                                  existing_nullable=nullable)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, column, nullable in MONEY_COLUMNS:
+            op.alter_column(table, column,
+                            existing_type=sa.BigInteger(),
+                            type_=sa.Float(),
+                            existing_nullable=nullable,
+                            postgresql_using=f'{column} / 100.0')
+        return
+
+    for table, column, nullable in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                                  existing_type=sa.BigInteger(),
+                                  type_=sa.Float(),
+                                  existing_nullable=nullable)
+        op.execute(f'UPDATE "{table}" SET {column} = {column} / 100.0')
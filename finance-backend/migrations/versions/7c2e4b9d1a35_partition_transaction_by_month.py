@@ -0,0 +1,117 @@
+"""partition transaction by month
+
+Revision ID: 7c2e4b9d1a35
+Revises: 1afb08775740
+Create Date: 2026-10-19 09:12:04.118520
+
+Converts the transaction table into a table range-partitioned on date with
+one partition per month and a default partition. PostgreSQL requires the
+partition key in every unique constraint, so the primary key becomes
+(id, date) and transaction_id is unique per date. Other databases keep
+the plain table.
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e4b9d1a35'
+down_revision = '1afb08775740'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+INDEXES = {
+    'ix_transaction_user_id_date': 'user_id, date',
+    'ix_transaction_user_id_category_date': 'user_id, category, date',
+    'ix_transaction_account_id': 'account_id',
+}
+
+
+def _add_months(day, months):
+    month_index = day.month - 1 + months
+    return date(day.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _drop_legacy_indexes():
+    for name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def _create_indexes():
+    for name, columns in INDEXES.items():
+        op.execute(f'CREATE INDEX {name} ON "transaction" ({columns})')
+
+
+def upgrade():
+    if not _is_postgresql():
+        return
+
+    bind = op.get_bind()
+
+    op.execute('ALTER TABLE "transaction" RENAME TO transaction_legacy')
+    op.execute('ALTER TABLE transaction_legacy RENAME CONSTRAINT transaction_pkey TO transaction_legacy_pkey')
+    op.execute('ALTER TABLE transaction_legacy RENAME CONSTRAINT transaction_transaction_id_key '
+               'TO transaction_legacy_transaction_id_key')
+    _drop_legacy_indexes()
+
+    op.execute('CREATE TABLE "transaction" (LIKE transaction_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (date)')
+    op.execute('ALTER TABLE "transaction" ADD CONSTRAINT transaction_pkey PRIMARY KEY (id, date)')
+    op.execute('ALTER TABLE "transaction" ADD CONSTRAINT transaction_transaction_id_key UNIQUE (transaction_id, date)')
+    op.execute('ALTER TABLE "transaction" ADD CONSTRAINT transaction_user_id_fkey '
+               'FOREIGN KEY (user_id) REFERENCES "user" (id)')
+    op.execute('ALTER TABLE "transaction" ADD CONSTRAINT transaction_account_id_fkey '
+               'FOREIGN KEY (account_id) REFERENCES account (id)')
+    _create_indexes()
+    # Keep the id sequence alive once the legacy table is dropped
+    op.execute('ALTER SEQUENCE transaction_id_seq OWNED BY "transaction".id')
+
+    # One partition per month from the oldest transaction up to a few months
+    # ahead; the scheduler keeps extending the range after that
+    oldest = bind.execute(sa.text('SELECT min(date) FROM transaction_legacy')).scalar() or date.today()
+    month = oldest.replace(day=1)
+    last_month = _add_months(date.today().replace(day=1), MONTHS_AHEAD)
+    while month <= last_month:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f'CREATE TABLE transaction_y{month.year}m{month.month:02d} PARTITION OF "transaction" '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+        month = next_month
+    op.execute('CREATE TABLE transaction_default PARTITION OF "transaction" DEFAULT')
+
+    op.execute('INSERT INTO "transaction" SELECT * FROM transaction_legacy')
+    op.execute('DROP TABLE transaction_legacy')
+    op.execute('ANALYZE "transaction"')
+
+
+def downgrade():
+    if not _is_postgresql():
+        return
+
+    op.execute('ALTER TABLE "transaction" RENAME TO transaction_partitioned')
+    op.execute('ALTER TABLE transaction_partitioned RENAME CONSTRAINT transaction_pkey TO transaction_partitioned_pkey')
+    op.execute('ALTER TABLE transaction_partitioned RENAME CONSTRAINT transaction_transaction_id_key '
+               'TO transaction_partitioned_transaction_id_key')
+    _drop_legacy_indexes()
+
+    op.execute('CREATE TABLE "transaction" (LIKE transaction_partitioned INCLUDING DEFAULTS)')
+    op.execute('ALTER TABLE "transaction" ADD CONSTRAINT transaction_pkey PRIMARY KEY (id)')
+    op.execute('ALTER TABLE "transaction" ADD CONSTRAINT transaction_transaction_id_key UNIQUE (transaction_id)')
+    op.execute('ALTER TABLE "transaction" ADD CONSTRAINT transaction_user_id_fkey '
+               'FOREIGN KEY (user_id) REFERENCES "user" (id)')
+    op.execute('ALTER TABLE "transaction" ADD CONSTRAINT transaction_account_id_fkey '
+               'FOREIGN KEY (account_id) REFERENCES account (id)')
+    _create_indexes()
+    op.execute('ALTER SEQUENCE transaction_id_seq OWNED BY "transaction".id')
+
+    op.execute('INSERT INTO "transaction" SELECT * FROM transaction_partitioned')
+    # Dropping the parent drops every partition with it
+    op.execute('DROP TABLE transaction_partitioned')
@@ -1,4 +1,5 @@
 from extensions import db
+from money import Money
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, date
 import uuid
@@ -23,12 +24,16 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
 
 class Account(db.Model):
+    __table_args__ = (
+        db.Index('ix_account_user_id', 'user_id'),
+    )
+
     id = db.Column(db.String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     plaid_item_id = db.Column(db.Integer, db.ForeignKey('plaid_item.id'), nullable=False)
     plaid_account_id = db.Column(db.String(255), nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    balance = db.Column(db.Float, nullable=False)
+    balance = db.Column(Money, nullable=False)
     type = db.Column(db.String(50), nullable=False)
     subtype = db.Column(db.String(50))
     iso_currency_code = db.Column(db.String(3), nullable=True)
@@ -46,11 +51,22 @@ class Account(db.Model):
         }
 
 class Transaction(db.Model):
+    # On PostgreSQL the table is range-partitioned by month on date (see the
+    # partition_transaction_by_month migration), which widens the primary key
+    # and the transaction_id unique constraint to include date.
+    __table_args__ = (
+        # Every date-ranged read filters by user first
+        db.Index('ix_transaction_user_id_date', 'user_id', 'date'),
+        # Budget spending sums filter by user, category and a date range
+        db.Index('ix_transaction_user_id_category_date', 'user_id', 'category', 'date'),
+        db.Index('ix_transaction_account_id', 'account_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     account_id = db.Column(db.String, db.ForeignKey('account.id'), nullable=False)
     transaction_id = db.Column(db.String(255), unique=True, nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     date = db.Column(db.Date, nullable=False)
     name = db.Column(db.String(255), nullable=False)
     category = db.Column(db.String(100))
@@ -100,12 +116,71 @@ class Transaction(db.Model):
             'account_id': self.account_id
         }
 
+
+class TransactionArchive(db.Model):
+    """One user's transactions for one month, moved out of the transaction
+    table once older than TRANSACTION_ARCHIVE_MONTHS (see archive_service).
+
+    payload is the rows' column values as zlib-compressed JSON.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', name='uq_transaction_archive_user_id_month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # First day of the month
+    row_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TransactionArchive user {self.user_id} {self.month:%Y-%m} ({self.row_count} rows)>'
+
+
+class TransactionDailyRollup(db.Model):
+    """Totals per account, day and category of archived transactions, so
+    spending analytics over archived months never read the archive.
+
+    Only archived days have rows; queries add them to the live table's.
+    """
+    __table_args__ = (
+        db.Index('ix_transaction_daily_rollup_user_id_category_date', 'user_id', 'category', 'date'),
+        db.Index('ix_transaction_daily_rollup_account_id', 'account_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    account_id = db.Column(db.String, nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    category = db.Column(db.String(100))
+    transaction_count = db.Column(db.Integer, nullable=False)
+    total = db.Column(Money, nullable=False)
+    deposits = db.Column(Money, nullable=False)  # Sum of the positive amounts
+    withdrawals = db.Column(Money, nullable=False)  # Sum of the negative amounts, as a positive number
+
+    def __repr__(self):
+        return f'<TransactionDailyRollup user {self.user_id} {self.date} {self.category}>'
+
 class Budget(db.Model):
+    __table_args__ = (
+        db.Index('ix_budget_user_id', 'user_id'),
+        # Only recurring budgets are scanned by the rollover job
+        db.Index('ix_budget_recurring_end_date', 'end_date',
+                 postgresql_where=db.text('is_recurring = true'),
+                 sqlite_where=db.text('is_recurring = 1')),
+        # One row per period of a recurring chain, so rollovers are idempotent
+        db.Index('uq_budget_recurring_period', 'user_id', 'budget_category', 'recurrence_period', 'start_date',
+                 unique=True,
+                 postgresql_where=db.text('recurrence_period IS NOT NULL'),
+                 sqlite_where=db.text('recurrence_period IS NOT NULL')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     budget_category = db.Column(db.String(100), nullable=False)
-    budget_limit = db.Column(db.Float, nullable=False)
-    current_spending = db.Column(db.Float, nullable=False, default=0.0)
+    budget_limit = db.Column(Money, nullable=False)
+    current_spending = db.Column(Money, nullable=False, default=0.0)
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=False)
     is_recurring = db.Column(db.Boolean, default=False)
@@ -118,6 +193,10 @@ class Budget(db.Model):
         return f'<Budget {self.budget_category}: {self.budget_limit}>'
 
 class PlaidItem(db.Model):
+    __table_args__ = (
+        db.Index('ix_plaid_item_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     _access_token = db.Column('access_token', db.String(255), nullable=False)
@@ -166,18 +245,71 @@ class PlaidItem(db.Model):
             raise
 
 class CustomCategory(db.Model):
+    __table_args__ = (
+        db.Index('ix_custom_category_user_id_name', 'user_id', 'name'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    keywords = db.Column(db.String(255))
     user = db.relationship('User', back_populates='custom_categories')
+    keyword_entries = db.relationship('CategoryKeyword', back_populates='category',
+                                      cascade='all, delete-orphan', order_by='CategoryKeyword.id')
 
     def __init__(self, user_id, name, keywords=None):
         self.user_id = user_id
         self.name = name
-        self.keywords = keywords
+        # keywords may still be passed as a comma-separated string
+        for keyword in dict.fromkeys(split_keywords(keywords)):
+            self.keyword_entries.append(CategoryKeyword(user_id=user_id, keyword=keyword))
+
+    @property
+    def keywords(self):
+        return [entry.keyword for entry in self.keyword_entries]
+
+
+def split_keywords(keywords):
+    """Normalize a comma-separated string or list of keywords"""
+    if not keywords:
+        return []
+    if isinstance(keywords, str):
+        keywords = keywords.split(',')
+    return [keyword.strip().lower()[:255] for keyword in keywords if keyword and keyword.strip()]
+
+
+class CategoryKeyword(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('category_id', 'keyword', name='uq_category_keyword_category_id_keyword'),
+        # varchar_pattern_ops lets LIKE 'prefix%' use the index on PostgreSQL.
+        # The migration also adds a pg_trgm GIN index for similarity lookups.
+        db.Index('ix_category_keyword_user_id_keyword', 'user_id', 'keyword',
+                 postgresql_ops={'keyword': 'varchar_pattern_ops'}),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('custom_category.id', ondelete='CASCADE'), nullable=False)
+    keyword = db.Column(db.String(255), nullable=False)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    last_used = db.Column(db.DateTime, default=datetime.utcnow)
+
+    category = db.relationship('CustomCategory', back_populates='keyword_entries')
+
+    def __repr__(self):
+        return f'<CategoryKeyword {self.keyword} for CustomCategory {self.category_id}>'
 
 class BudgetAlert(db.Model):
+    __table_args__ = (
+        db.Index('ix_budget_alert_budget_id', 'budget_id'),
+        # Unread alerts are the only ones the UI lists or checks for duplicates
+        db.Index('ix_budget_alert_user_id_unread', 'user_id', 'created_at',
+                 postgresql_where=db.text('is_read = false'),
+                 sqlite_where=db.text('is_read = 0')),
+        db.Index('ix_budget_alert_budget_id_type_unread', 'budget_id', 'alert_type',
+                 postgresql_where=db.text('is_read = false'),
+                 sqlite_where=db.text('is_read = 0')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     budget_id = db.Column(db.Integer, db.ForeignKey('budget.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -192,11 +324,15 @@ class BudgetAlert(db.Model):
         return f'<BudgetAlert {self.alert_type} for Budget {self.budget_id}>'
     
 class FinancialGoal(db.Model):
+    __table_args__ = (
+        db.Index('ix_financial_goal_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    target_amount = db.Column(db.Float, nullable=False)
-    current_amount = db.Column(db.Float, default=0)
+    target_amount = db.Column(Money, nullable=False)
+    current_amount = db.Column(Money, default=0)
     target_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -213,10 +349,211 @@ class FinancialGoal(db.Model):
         }
 
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index('ix_notification_user_id_unread', 'user_id', 'created_at',
+                 postgresql_where=db.text('is_read = false'),
+                 sqlite_where=db.text('is_read = 0')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     message = db.Column(db.String(255), nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    user = db.relationship('User', backref=db.backref('notifications', lazy=True))
\ No newline at end of file
+    user = db.relationship('User', backref=db.backref('notifications', lazy=True))
+
+class MerchantCategoryMemo(db.Model):
+    """How often each category was seen for a normalized merchant, across all users"""
+    __table_args__ = (
+        db.UniqueConstraint('merchant_key', 'category', name='uq_merchant_category_memo_key_category'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    merchant_key = db.Column(db.String(255), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    plaid_count = db.Column(db.Integer, nullable=False, default=0)
+    user_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MerchantCategoryMemo {self.merchant_key}: {self.category}>'
+
+
+class MerchantCategoryCorrection(db.Model):
+    """The category one user last corrected a merchant to, so the memo counts
+    distinct users rather than corrections and recategorization keeps the
+    user's choice. Only shared categories are counted into the memo."""
+    __table_args__ = (
+        db.UniqueConstraint('merchant_key', 'user_id', name='uq_merchant_category_correction_key_user'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    merchant_key = db.Column(db.String(255), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MerchantCategoryCorrection {self.merchant_key}: {self.category} by {self.user_id}>'
+
+
+class CategoryModel(db.Model):
+    """Trained classifier counts for one user, or the global prior when user_id is NULL"""
+    __table_args__ = (
+        db.Index('ix_category_model_user_id', 'user_id', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    n_examples = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CategoryModel user={self.user_id} examples={self.n_examples}>'
+
+
+class OutboxMessage(db.Model):
+    """A notification waiting to be sent, written in the same transaction as its alert"""
+    __table_args__ = (
+        # The worker only ever polls pending messages that are due
+        db.Index('ix_outbox_message_pending', 'next_attempt_at',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    channel = db.Column(db.String(20), nullable=False, default='email')
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sent' or 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.status} for User {self.user_id}>'
+
+class SchedulerLease(db.Model):
+    """Which scheduler process runs the periodic jobs, on databases without advisory locks"""
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(255))
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SchedulerLease {self.name} held by {self.holder} until {self.expires_at}>'
+
+class JobRun(db.Model):
+    """One run of a periodic job, with how long it took and how many rows it touched"""
+    __table_args__ = (
+        db.Index('ix_job_run_job_id_started_at', 'job_id', 'started_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), nullable=False)
+    instance = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # 'running', 'succeeded' or 'failed'
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Integer)
+    row_count = db.Column(db.Integer)
+    error = db.Column(db.String(255))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'instance': self.instance,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms,
+            'row_count': self.row_count,
+            'error': self.error
+        }
+
+    def __repr__(self):
+        return f'<JobRun {self.job_id} {self.status}>'
+
+
+class RecategorizeJob(db.Model):
+    """A background re-run of a user's category keywords over their transactions.
+
+    Kept in the database so any worker can report its progress and it
+    outlives the process that ran it.
+    """
+    __table_args__ = (
+        db.Index('ix_recategorize_job_user_id', 'user_id'),
+        db.Index('ix_recategorize_job_finished_at', 'finished_at'),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    dry_run = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'completed' or 'failed'
+    total = db.Column(db.Integer)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    changed = db.Column(db.Integer, nullable=False, default=0)
+    changes_by_category = db.Column(db.JSON, nullable=False, default=dict)
+    diff = db.Column(db.JSON, nullable=False, default=list)
+    error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Touched after every batch; a job that stops moving was interrupted
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'dry_run': self.dry_run,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'changed': self.changed,
+            'changes_by_category': self.changes_by_category,
+            'diff': self.diff,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<RecategorizeJob {self.id} {self.status} for User {self.user_id}>'
+
+
+class SlowQuery(db.Model):
+    """A SQL statement that took longer than SLOW_QUERY_MS, with a sampled plan"""
+    __table_args__ = (
+        db.Index('ix_slow_query_statement_hash', 'statement_hash'),
+        db.Index('ix_slow_query_created_at', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    statement_hash = db.Column(db.String(40), nullable=False)
+    statement = db.Column(db.Text, nullable=False)
+    parameters = db.Column(db.JSON)  # Redacted
+    duration_ms = db.Column(db.Float, nullable=False)
+    endpoint = db.Column(db.String(255))
+    plan = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'statement': self.statement,
+            'parameters': self.parameters,
+            'duration_ms': self.duration_ms,
+            'endpoint': self.endpoint,
+            'plan': self.plan,
+            'created_at': self.created_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<SlowQuery {self.duration_ms:.0f} ms {self.endpoint}>'
@@ -0,0 +1,46 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+from sqlalchemy import BigInteger, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+# Amounts are stored as integer minor units (pence/cents)
+MINOR_UNITS = 100
+
+
+def to_minor_units(amount):
+    """Convert a float, Decimal, int or numeric string to integer minor units"""
+    if amount is None:
+        return None
+    # Go through str so a float like 0.1 is taken at face value
+    minor = Decimal(str(amount)) * MINOR_UNITS
+    return int(minor.quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+
+def from_minor_units(minor):
+    """Convert integer minor units back to a float amount for the JSON surface"""
+    if minor is None:
+        return None
+    # PostgreSQL returns SUM(bigint) as a Decimal
+    return int(minor) / MINOR_UNITS
+
+
+class Money(TypeDecorator):
+    """A monetary amount stored as a BIGINT count of minor units.
+
+    Model attributes still read and write plain floats, so existing code and
+    the JSON responses are unchanged, while the database holds exact values.
+    SQL aggregates over a Money column are summed as integers and converted
+    once on the way out.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_minor_units(value)
+
+    def process_result_value(self, value, dialect):
+        return from_minor_units(value)
+
+
+def minor_units(column):
+    """Treat a Money column as its raw integer minor units in a SQL expression"""
+    return type_coerce(column, BigInteger)
@@ -1,11 +1,113 @@
-from flask_mail import Mail, Message
+from datetime import datetime, timedelta
+from itertools import groupby
+from flask import current_app
+from extensions import db
+from models import Notification, OutboxMessage, User
 
-mail = Mail()
+_mail = None
+
+def get_mail():
+    """Flask-Mail, imported and set up on the current app the first time mail is sent"""
+    global _mail
+    if _mail is None:
+        from flask_mail import Mail
+        _mail = Mail()
+    if 'mail' not in current_app.extensions:
+        _mail.init_app(current_app)
+    return _mail
 
 def send_email(user_email, subject, body):
+    from flask_mail import Message
+    mail = get_mail()
     msg = Message(subject, recipients=[user_email], body=body)
     mail.send(msg)
 
+def queue_notification(user_id, subject, body, channel='email'):
+    """Add a message to the outbox; it is sent once the caller commits"""
+    message = OutboxMessage(user_id=user_id, channel=channel, subject=subject, body=body)
+    db.session.add(message)
+    return message
+
 def notify_user(user, message):
-    # This will be expanded in the future to handle different types of notifications
-    send_email_notification(user.email, "Budget Alert", message)
+    # Shown in the app straight away, emailed by the outbox worker
+    db.session.add(Notification(user_id=user.id, message=message))
+    queue_notification(user.id, "Budget Alert", message)
+
+def _retry_delay(attempts):
+    base = current_app.config['OUTBOX_RETRY_BASE_SECONDS']
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), current_app.config['OUTBOX_RETRY_MAX_SECONDS']))
+
+def _mark_failed(messages, error, now):
+    max_attempts = current_app.config['OUTBOX_MAX_ATTEMPTS']
+    for message in messages:
+        message.attempts += 1
+        message.last_error = error[:255]
+        if message.attempts >= max_attempts:
+            message.status = 'failed'
+        else:
+            message.next_attempt_at = now + _retry_delay(message.attempts)
+
+def _build_email(user, messages):
+    """One email per user, merging a burst of messages into a digest"""
+    from flask_mail import Message
+    if len(messages) == 1:
+        return Message(messages[0].subject, recipients=[user.email], body=messages[0].body)
+    subject = f"{len(messages)} new notifications"
+    body = "\n\n".join(f"{message.subject}\n{message.body}" for message in messages)
+    return Message(subject, recipients=[user.email], body=body)
+
+def drain_outbox(logger, now=None):
+    """Send due outbox messages over a single SMTP connection.
+
+    Messages are claimed with FOR UPDATE SKIP LOCKED so several workers can
+    drain at once. A user's messages are held back until the oldest is
+    OUTBOX_DIGEST_DELAY_SECONDS old, then all of them go out as one digest.
+    Failed sends are retried with exponential backoff until
+    OUTBOX_MAX_ATTEMPTS, after which they are marked failed.
+    Returns the number of emails sent.
+    """
+    now = now or datetime.utcnow()
+    config = current_app.config
+    messages = OutboxMessage.query.filter(
+        OutboxMessage.status == 'pending',
+        OutboxMessage.next_attempt_at <= now
+    ).order_by(OutboxMessage.user_id, OutboxMessage.id).limit(
+        config['OUTBOX_BATCH_SIZE']
+    ).with_for_update(skip_locked=True).all()
+
+    digest_cutoff = now - timedelta(seconds=config['OUTBOX_DIGEST_DELAY_SECONDS'])
+    batches = []
+    for user_id, user_messages in groupby(messages, key=lambda message: message.user_id):
+        user_messages = list(user_messages)
+        if min(message.created_at for message in user_messages) <= digest_cutoff:
+            batches.append(user_messages)
+    if not batches:
+        db.session.commit()
+        return 0
+
+    mail = get_mail()
+    users = {user.id: user for user in User.query.filter(User.id.in_([batch[0].user_id for batch in batches]))}
+    sent = 0
+    remaining = list(batches)
+    try:
+        with mail.connect() as connection:
+            while remaining:
+                batch = remaining[0]
+                try:
+                    connection.send(_build_email(users[batch[0].user_id], batch))
+                except Exception as e:
+                    logger.warning(f"Error sending outbox email to user {batch[0].user_id}: {str(e)}")
+                    _mark_failed(batch, str(e), now)
+                else:
+                    for message in batch:
+                        message.status = 'sent'
+                        message.sent_at = now
+                    sent += 1
+                remaining.pop(0)
+    except Exception as e:
+        # Could not connect, or the connection dropped: retry what is left
+        logger.error(f"Error connecting to the mail server: {str(e)}")
+        _mark_failed([message for batch in remaining for message in batch], str(e), now)
+    db.session.commit()
+    logger.info(f"Sent {sent} outbox emails covering {sum(len(batch) for batch in batches)} messages")
+    return sent
@@ -0,0 +1,145 @@
+import json
+from datetime import date
+from sqlalchemy import text
+from extensions import db
+from query_plans import hot_queries, compile_query
+
+PARENT_TABLE = 'transaction'
+DEFAULT_PARTITION = 'transaction_default'
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    month_index = day.month - 1 + months
+    return date(day.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'transaction_y{month.year}m{month.month:02d}'
+
+
+def is_partitioned():
+    """True when the transaction table is a PostgreSQL partitioned table.
+
+    SQLite (and PostgreSQL databases that have not run the partitioning
+    migration) keep the plain table, so callers can skip partition upkeep.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :name)"
+    ), {'name': PARENT_TABLE}).scalar()
+
+
+def existing_partitions():
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name"
+    ), {'name': PARENT_TABLE}).scalars()
+    return set(rows)
+
+
+def _create_partition(month):
+    db.session.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{PARENT_TABLE}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+
+def create_month_partition(month):
+    """Create one month's partition if the table is partitioned and it is
+    missing, in the caller's transaction"""
+    if is_partitioned() and partition_name(month) not in existing_partitions():
+        _create_partition(month)
+
+
+def drop_empty_partitions(before):
+    """Drop the monthly partitions before `before` that hold no rows, as
+    they are once archive_service has archived their month.
+
+    Dropping a partition frees its space at once, where deleting its rows
+    would leave them for vacuum. Returns the names of the partitions dropped.
+    """
+    if not is_partitioned():
+        return []
+
+    dropped = []
+    for name in sorted(existing_partitions()):
+        if name == DEFAULT_PARTITION or name >= partition_name(month_start(before)):
+            continue
+        if db.session.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{name}")')).scalar():
+            continue
+        db.session.execute(text(f'DROP TABLE "{name}"'))
+        dropped.append(name)
+
+    db.session.commit()
+    return dropped
+
+
+def ensure_transaction_partitions(months_ahead=3, logger=None):
+    """Create the monthly partitions from this month up to months_ahead.
+
+    Partitions have to exist before rows for that month arrive; otherwise
+    they land in the default partition, which then blocks creating the
+    month's partition. Returns the names of the partitions created.
+    """
+    if not is_partitioned():
+        return []
+
+    existing = existing_partitions()
+    created = []
+    first_month = month_start(date.today())
+    for offset in range(months_ahead + 1):
+        month = add_months(first_month, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        _create_partition(month)
+        created.append(name)
+
+    db.session.commit()
+    if logger and created:
+        logger.info(f"Created transaction partitions: {', '.join(created)}")
+    return created
+
+
+def partition_pruning_report(user_id):
+    """Explain and time the date-ranged transaction reads.
+
+    For each query, returns the partitions the executor actually touched
+    out of the total, along with planning and execution time in ms.
+    """
+    if not is_partitioned():
+        raise ValueError("The transaction table is not partitioned")
+
+    def scanned_relations(node):
+        if 'Relation Name' in node:
+            yield node['Relation Name']
+        for child in node.get('Plans', []):
+            yield from scanned_relations(child)
+
+    total = len(existing_partitions())
+    queries = hot_queries(user_id)
+    report = {}
+    for name in ('GET /stored_transactions', 'GET /spending_trends'):
+        plan = db.session.execute(text(
+            f'EXPLAIN (ANALYZE, FORMAT JSON) {compile_query(queries[name])}'
+        )).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plan = plan[0]
+        scanned = sorted(set(scanned_relations(plan['Plan'])))
+        report[name] = {
+            'partitions_scanned': scanned,
+            'partitions_total': total,
+            'planning_ms': plan.get('Planning Time'),
+            'execution_ms': plan.get('Execution Time')
+        }
+    db.session.rollback()
+    return report
@@ -0,0 +1,235 @@
+import traceback
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db, cache, limiter
+from rate_limiting import rate_cost
+from models import Account, PlaidItem
+from budget_service import evaluate_budget_alerts
+from plaid_service import (
+    create_link_token as plaid_create_link_token,
+    exchange_public_token,
+    sync_accounts,
+    create_plaid_client,
+    fetch_and_store_transactions
+)
+
+plaid_bp = Blueprint('plaid', __name__)
+
+
+@plaid_bp.route('/create_link_token', methods=['POST'])
+@limiter.limit("10 per minute")
+@jwt_required()
+@rate_cost(5)
+def create_link_token():
+    import plaid
+
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"Attempting to create link token for user {user_id}")
+    try:
+        link_token = plaid_create_link_token(user_id, current_app.logger)
+        current_app.logger.info(f"Link token created successfully for user {user_id}")
+        return jsonify({"link_token": link_token}), 200
+    except plaid.ApiException as e:
+        current_app.logger.error(f"Plaid API error creating link token: {str(e)}")
+        return jsonify({"error": str(e), "type": "plaid_api_error"}), 400
+    except Exception as e:
+        current_app.logger.error(f"Unexpected error creating link token: {str(e)}")
+        return jsonify({"error": str(e), "type": "unexpected_error"}), 500
+
+
+@plaid_bp.route('/set_access_token', methods=['POST'])
+@limiter.limit("10 per minute")
+@jwt_required()
+@rate_cost(10)
+def set_access_token():
+    # The classifier pulls in numpy, so it is loaded when an account is linked
+    from classifier_service import train_model
+
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"Received set_access_token request for user {user_id}")
+
+    try:
+        public_token = request.json.get('public_token')
+        if not public_token:
+            return jsonify({"error": "No public token provided"}), 400
+
+        # Exchange public token for access token
+        access_token, item_id = exchange_public_token(public_token, current_app.logger)
+        current_app.logger.info(f"Successfully exchanged public token for user {user_id}")
+
+        # Create or update PlaidItem
+        plaid_item = PlaidItem.query.filter_by(user_id=user_id, item_id=item_id).first()
+
+        if not plaid_item:
+            current_app.logger.debug("Creating new PlaidItem")
+            plaid_item = PlaidItem(
+                user_id=user_id,
+                item_id=item_id,
+                last_successful_update=datetime.now(timezone.utc)
+            )
+            plaid_item.access_token = access_token  # This will trigger encryption
+            db.session.add(plaid_item)
+        else:
+            current_app.logger.debug("Updating existing PlaidItem")
+            plaid_item.access_token = access_token  # This will trigger encryption
+            plaid_item.last_successful_update = datetime.now(timezone.utc)
+
+        db.session.commit()
+        current_app.logger.debug(f"Saved PlaidItem with ID: {plaid_item.id}")
+
+        # Verify the token was stored correctly
+        stored_item = PlaidItem.query.get(plaid_item.id)
+        if not stored_item or not stored_item.access_token:
+            raise Exception("Failed to store access token")
+
+        # Use the original access_token for immediate operations
+        sync_accounts(user_id, access_token, current_app.logger)
+        if fetch_and_store_transactions(access_token, user_id, current_app.logger):
+            evaluate_budget_alerts(user_id=user_id)
+            # Seed the user's category model from the new history here, so
+            # later syncs and corrections never have to train it
+            train_model(user_id)
+
+        return jsonify({
+            "message": "Access token set, accounts and transactions synced",
+            "item_id": item_id
+        }), 201
+
+    except Exception as e:
+        current_app.logger.error(f"Error in set_access_token: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@plaid_bp.route('/fetch_account_info', methods=['GET', 'POST', 'OPTIONS'])
+@limiter.limit("20 per minute")
+@jwt_required()
+@rate_cost(10)
+def fetch_account_info():
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"Fetching account info for user {user_id}")
+    try:
+        plaid_item = PlaidItem.query.filter_by(user_id=user_id).order_by(PlaidItem.id.desc()).first()
+        if not plaid_item:
+            current_app.logger.warning(f"No PlaidItem found for user {user_id}")
+            return jsonify({
+                "error": "No linked bank account found",
+                "code": "NO_LINKED_ACCOUNT"
+            }), 400
+
+        current_app.logger.info(f"PlaidItem ID: {plaid_item.id}")
+
+        # Add debug logging for access token
+        current_app.logger.debug(f"Raw access token value: {plaid_item._access_token}")
+        decrypted_token = plaid_item.access_token
+        current_app.logger.debug(f"Decrypted access token exists: {decrypted_token is not None}")
+
+        if not decrypted_token:
+            current_app.logger.error("Access token is None after decryption")
+            return jsonify({
+                "error": "Invalid access token",
+                "code": "INVALID_ACCESS_TOKEN"
+            }), 500
+
+        try:
+            sync_accounts(user_id, decrypted_token, current_app.logger)
+
+            # Fetch the updated accounts
+            accounts = Account.query.filter_by(user_id=user_id).all()
+            accounts_data = [account.to_dict() for account in accounts]
+
+            return jsonify({
+                "message": "Account info fetched successfully",
+                "accounts": accounts_data
+            }), 200
+
+        except Exception as sync_error:
+            current_app.logger.error(f"Error syncing accounts: {str(sync_error)}")
+            current_app.logger.error(f"Error type: {type(sync_error)}")
+            current_app.logger.error(traceback.format_exc())
+            return jsonify({
+                "error": "Failed to sync accounts",
+                "details": str(sync_error)
+            }), 500
+
+    except Exception as e:
+        current_app.logger.error(f"Error in fetch_account_info: {str(e)}")
+        current_app.logger.error(f"Error type: {type(e)}")
+        current_app.logger.error(traceback.format_exc())
+        db.session.rollback()
+        return jsonify({
+            "error": "An unexpected error occurred",
+            "details": str(e)
+        }), 500
+
+
+@plaid_bp.route('/sync_transactions', methods=['POST'])
+@limiter.limit("5 per minute")
+@jwt_required()
+@rate_cost(20)
+def sync_transactions():
+    user_id = get_jwt_identity()
+    try:
+        plaid_item = PlaidItem.query.filter_by(user_id=user_id).order_by(PlaidItem.id.desc()).first()
+        if not plaid_item:
+            return jsonify({"error": "No linked bank account found"}), 400
+
+        # Sync transactions
+        count = fetch_and_store_transactions(plaid_item.access_token, user_id, current_app.logger)
+        if count:
+            # New alerts reach the client over server-sent events
+            evaluate_budget_alerts(user_id=user_id)
+
+        # Clear cache
+        cache.delete(f'transactions_user_{user_id}')
+
+        return jsonify({
+            "message": f"Successfully synced {count} new transactions",
+            "count": count
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error syncing transactions: {str(e)}")
+        return jsonify({"error": "Failed to sync transactions"}), 500
+
+
+@plaid_bp.route('/recurring_transactions', methods=['GET'])
+@limiter.limit("10 per minute")
+@jwt_required()
+@rate_cost(10)
+def get_recurring_transactions():
+    import plaid
+
+    user_id = get_jwt_identity()
+    plaid_item = PlaidItem.query.filter_by(user_id=user_id).first()
+
+    try:
+        client = create_plaid_client()
+        response = client.transactions_recurring_get(
+            access_token=plaid_item.access_token
+        )
+        return jsonify(response.to_dict()), 200
+    except plaid.ApiException as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@plaid_bp.route('/plaid_webhook', methods=['POST'])
+# Plaid sends every item's webhooks from a few addresses
+@limiter.exempt
+def plaid_webhook():
+    webhook_type = request.json['webhook_type']
+    webhook_code = request.json['webhook_code']
+
+    if webhook_type == 'TRANSACTIONS' and webhook_code == 'SYNC_UPDATES_AVAILABLE':
+        item_id = request.json['item_id']
+        plaid_item = PlaidItem.query.filter_by(item_id=item_id).first()
+        if plaid_item and fetch_and_store_transactions(plaid_item.access_token, plaid_item.user_id,
+                                                       current_app.logger):
+            evaluate_budget_alerts(user_id=plaid_item.user_id)
+
+    return '', 200
@@ -1,27 +1,19 @@
-import plaid
-from plaid.exceptions import ApiException
-from plaid.api import plaid_api
-from plaid.api_client import ApiClient, ApiException
-from plaid.model.products import Products
-from plaid.model.country_code import CountryCode
-from plaid.model.account_subtype import AccountSubtype
-from plaid.model.account_type import AccountType
-from plaid.model.accounts_get_request import AccountsGetRequest
-from plaid.model.transactions_get_request import TransactionsGetRequest
-from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
-from plaid.model.link_token_create_request import LinkTokenCreateRequest
-from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
-from plaid.model.country_code import CountryCode
-from plaid.model.sandbox_public_token_create_request import SandboxPublicTokenCreateRequest
-from plaid.model.sandbox_public_token_create_request_options import SandboxPublicTokenCreateRequestOptions
-from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
 import os
 import time
 from datetime import datetime, timedelta
 from models import db, Transaction, Account, PlaidItem
+from merchant_memo_service import resolve_merchant_categories, record_merchant_categories
+from events_service import publish_event
+from metrics import observe_plaid_call
 import traceback
 
+# The Plaid SDK takes a few hundred milliseconds to import, so each function
+# imports what it needs on first use rather than when the app boots
+
 def create_plaid_client():
+    import plaid
+    from plaid.api import plaid_api
+
     configuration = plaid.Configuration(
         host=plaid.Environment.Sandbox,  # Change this to Development or Production when ready
         api_key={
@@ -30,9 +22,32 @@ def create_plaid_client():
         }
     )
     api_client = plaid.ApiClient(configuration)
-    return plaid_api.PlaidApi(api_client)
+    return TimedPlaidClient(plaid_api.PlaidApi(api_client))
+
+
+class TimedPlaidClient:
+    """Records the count and latency of every Plaid API call for /metrics"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def timed(*args, **kwargs):
+            with observe_plaid_call(name):
+                return attribute(*args, **kwargs)
+        return timed
 
 def create_link_token(user_id, logger):
+    import plaid
+    from plaid.model.products import Products
+    from plaid.model.country_code import CountryCode
+    from plaid.model.link_token_create_request import LinkTokenCreateRequest
+    from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
+
     client = create_plaid_client()
     logger.info(f"Creating link token for user {user_id}")
     try:
@@ -57,6 +72,10 @@ def create_link_token(user_id, logger):
         raise
 
 def create_sandbox_public_token():
+    from plaid.model.products import Products
+    from plaid.model.sandbox_public_token_create_request import SandboxPublicTokenCreateRequest
+    from plaid.model.sandbox_public_token_create_request_options import SandboxPublicTokenCreateRequestOptions
+
     client = create_plaid_client()
     request = SandboxPublicTokenCreateRequest(
         institution_id='ins_109508',
@@ -69,6 +88,9 @@ def create_sandbox_public_token():
     return response['public_token']
 
 def exchange_public_token(public_token, logger):
+    import plaid
+    from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
+
     try:
         client = create_plaid_client()
         # Create the proper request object
@@ -96,72 +118,7 @@ def fetch_and_store_transactions(access_token, user_id, logger, start_date=None,
         
         # Get transactions from Plaid
         transactions = get_transactions_from_plaid(access_token, start_date, end_date, logger)
-        
-        # Get all accounts for this user
-        accounts = {account.plaid_account_id: account.id for account in 
-                   Account.query.filter_by(user_id=user_id).all()}
-        
-        stored_count = 0
-        for plaid_transaction in transactions:
-            # Skip if transaction already exists
-            existing = Transaction.query.filter_by(
-                transaction_id=plaid_transaction['transaction_id']
-            ).first()
-            
-            if existing:
-                continue
-                
-            # Get the internal account ID
-            account_id = accounts.get(plaid_transaction['account_id'])
-            if not account_id:
-                logger.warning(f"Account not found for transaction {plaid_transaction['transaction_id']}")
-                continue
-            
-            # Handle date fields properly
-            transaction_date = plaid_transaction['date']
-            if isinstance(transaction_date, str):
-                transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d').date()
-            elif isinstance(transaction_date, datetime):
-                transaction_date = transaction_date.date()
-                
-            # Handle authorized_date
-            authorized_date = plaid_transaction.get('authorized_date')
-            if authorized_date:
-                if isinstance(authorized_date, str):
-                    authorized_date = datetime.strptime(authorized_date, '%Y-%m-%d').date()
-                elif isinstance(authorized_date, datetime):
-                    authorized_date = authorized_date.date()
-
-            # Invert the amount
-            amount = -float(plaid_transaction['amount'])
-            
-            new_transaction = Transaction(
-                user_id=user_id,
-                account_id=account_id,
-                transaction_id=plaid_transaction['transaction_id'],
-                amount=amount,
-                date=transaction_date,
-                name=plaid_transaction['name'],
-                category=plaid_transaction.get('personal_finance_category', {}).get('primary', 'UNCATEGORIZED'),
-                subcategory=plaid_transaction.get('personal_finance_category', {}).get('detailed', None),
-                pending=plaid_transaction.get('pending', False),
-                merchant_name=plaid_transaction.get('merchant_name'),
-                payment_channel=plaid_transaction.get('payment_channel', 'OTHER'),
-                location_city=plaid_transaction.get('location', {}).get('city'),
-                location_region=plaid_transaction.get('location', {}).get('region'),
-                location_country=plaid_transaction.get('location', {}).get('country'),
-                authorized_date=authorized_date,
-                logo_url=plaid_transaction.get('logo_url'),
-                website=plaid_transaction.get('website'),
-                iso_currency_code=plaid_transaction.get('iso_currency_code')
-            )
-            
-            db.session.add(new_transaction)
-            stored_count += 1
-            
-        db.session.commit()
-        logger.info(f"Successfully stored {stored_count} new transactions for user {user_id}")
-        return stored_count
+        return store_plaid_transactions(user_id, transactions, logger)
         
     except Exception as e:
         logger.error(f"Error in fetch_and_store_transactions: {str(e)}")
@@ -169,6 +126,112 @@ def fetch_and_store_transactions(access_token, user_id, logger, start_date=None,
         db.session.rollback()
         raise
 
+def store_plaid_transactions(user_id, transactions, logger):
+    """Categorize and store transactions as returned by Plaid, skipping ones
+    already stored; returns how many were new"""
+    from classifier_service import classify_transactions
+
+    # Get all accounts for this user
+    accounts = {account.plaid_account_id: account.id for account in 
+               Account.query.filter_by(user_id=user_id).all()}
+
+    # Look up everything Plaid left uncategorized in the merchant memo at once
+    uncategorized = [
+        plaid_transaction.get('merchant_name') or plaid_transaction['name']
+        for plaid_transaction in transactions
+        if not (plaid_transaction.get('personal_finance_category') or {}).get('primary')
+    ]
+    memo_categories = resolve_merchant_categories(uncategorized) if uncategorized else {}
+    memo_observations = []
+
+    # Classify whatever the memo does not know in one batch
+    unresolved = [
+        plaid_transaction for plaid_transaction in transactions
+        if not (plaid_transaction.get('personal_finance_category') or {}).get('primary')
+        and (plaid_transaction.get('merchant_name') or plaid_transaction['name']) not in memo_categories
+    ]
+    predicted_categories = dict(zip(
+        [plaid_transaction['transaction_id'] for plaid_transaction in unresolved],
+        classify_transactions(user_id, [(plaid_transaction['name'], plaid_transaction.get('merchant_name'))
+                                        for plaid_transaction in unresolved])
+    ))
+
+    # Which of these are already stored, in one query
+    plaid_ids = [plaid_transaction['transaction_id'] for plaid_transaction in transactions]
+    existing_ids = {transaction_id for (transaction_id,) in db.session.query(Transaction.transaction_id).filter(
+        Transaction.transaction_id.in_(plaid_ids)
+    ).all()} if plaid_ids else set()
+
+    stored_count = 0
+    for plaid_transaction in transactions:
+        # Skip if transaction already exists
+        if plaid_transaction['transaction_id'] in existing_ids:
+            continue
+        existing_ids.add(plaid_transaction['transaction_id'])
+            
+        # Get the internal account ID
+        account_id = accounts.get(plaid_transaction['account_id'])
+        if not account_id:
+            logger.warning(f"Account not found for transaction {plaid_transaction['transaction_id']}")
+            continue
+        
+        # Handle date fields properly
+        transaction_date = plaid_transaction['date']
+        if isinstance(transaction_date, str):
+            transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d').date()
+        elif isinstance(transaction_date, datetime):
+            transaction_date = transaction_date.date()
+            
+        # Handle authorized_date
+        authorized_date = plaid_transaction.get('authorized_date')
+        if authorized_date:
+            if isinstance(authorized_date, str):
+                authorized_date = datetime.strptime(authorized_date, '%Y-%m-%d').date()
+            elif isinstance(authorized_date, datetime):
+                authorized_date = authorized_date.date()
+
+        # Invert the amount
+        amount = -float(plaid_transaction['amount'])
+
+        merchant = plaid_transaction.get('merchant_name') or plaid_transaction['name']
+        category = (plaid_transaction.get('personal_finance_category') or {}).get('primary')
+        if category:
+            memo_observations.append((merchant, category))
+        else:
+            category = (memo_categories.get(merchant)
+                        or predicted_categories.get(plaid_transaction['transaction_id'])
+                        or 'UNCATEGORIZED')
+        
+        new_transaction = Transaction(
+            user_id=user_id,
+            account_id=account_id,
+            transaction_id=plaid_transaction['transaction_id'],
+            amount=amount,
+            date=transaction_date,
+            name=plaid_transaction['name'],
+            category=category,
+            subcategory=plaid_transaction.get('personal_finance_category', {}).get('detailed', None),
+            pending=plaid_transaction.get('pending', False),
+            merchant_name=plaid_transaction.get('merchant_name'),
+            payment_channel=plaid_transaction.get('payment_channel', 'OTHER'),
+            location_city=plaid_transaction.get('location', {}).get('city'),
+            location_region=plaid_transaction.get('location', {}).get('region'),
+            location_country=plaid_transaction.get('location', {}).get('country'),
+            authorized_date=authorized_date,
+            logo_url=plaid_transaction.get('logo_url'),
+            website=plaid_transaction.get('website'),
+            iso_currency_code=plaid_transaction.get('iso_currency_code')
+        )
+        
+        db.session.add(new_transaction)
+        stored_count += 1
+
+    record_merchant_categories(memo_observations, 'plaid')
+    db.session.commit()
+    publish_event(user_id, 'sync_finished', {'count': stored_count})
+    logger.info(f"Successfully stored {stored_count} new transactions for user {user_id}")
+    return stored_count
+
 def handle_plaid_error(e, logger):
     error_type = getattr(e, 'type', 'UNKNOWN')
     error_code = getattr(e, 'code', 'UNKNOWN')
@@ -199,6 +262,10 @@ def get_account_info_from_plaid(access_token, logger):
         raise
 
 def get_transactions_from_plaid(access_token, start_date, end_date, logger):
+    import plaid
+    from plaid.model.transactions_get_request import TransactionsGetRequest
+    from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
+
     try:
         client = create_plaid_client()
         
@@ -277,6 +344,9 @@ def update_transactions():
                 continue
 
 def sync_accounts(user_id, access_token, logger):
+    import plaid
+    from plaid.model.accounts_get_request import AccountsGetRequest
+
     try:
         client = create_plaid_client()
         request = AccountsGetRequest(access_token=access_token)
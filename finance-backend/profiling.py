@@ -0,0 +1,175 @@
+import cProfile
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode
+from flask import current_app, g, jsonify, request
+from query_budget import QueryRecorder, record_request_queries
+
+# A request carrying a valid token in this header (or query parameter) runs
+# under cProfile; tokens come from POST /admin/profile_tokens
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_ARG = '_profile'
+
+PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# Functions listed in a profile's summary, by cumulative time
+TOP_FUNCTIONS = 40
+# Slowest statements listed in a profile's summary
+TOP_STATEMENTS = 50
+
+
+def _signature(key, method, path, expires):
+    message = f"{method.upper()} {path} {expires}".encode()
+    return hmac.new(key.encode(), message, hashlib.sha256).hexdigest()
+
+
+def create_profile_token(method, path, ttl_seconds):
+    """A token that profiles method + path until it expires, signed with ADMIN_TOKEN"""
+    expires = int(time.time()) + ttl_seconds
+    return f"{expires}.{_signature(current_app.config['ADMIN_TOKEN'], method, path, expires)}", expires
+
+
+def _valid_token(token):
+    key = current_app.config['ADMIN_TOKEN']
+    expires, _, signature = token.partition('.')
+    if not key or not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(key, request.method, request.path, int(expires)))
+
+
+def profile_dir():
+    return os.path.join(current_app.root_path, current_app.config['PROFILE_DIR'])
+
+
+def _function_name(function):
+    filename, line, name = function
+    return f"{os.path.basename(filename)}:{line}({name})" if line else name
+
+
+def _summarize(profiler, recorder, wall_seconds, response):
+    stats = pstats.Stats(profiler)
+    functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    # JSON encoding of the response body; jsonify calls this provider method
+    serialization = sum(cumulative for (filename, _, name), (_, _, _, cumulative, _) in stats.stats.items()
+                        if filename.endswith(os.path.join('flask', 'json', 'provider.py')) and name == 'dumps')
+    # Without the token, which stays valid until it expires
+    query = urlencode([(key, value) for key, value in request.args.items(multi=True) if key != PROFILE_ARG])
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_callees(TOP_FUNCTIONS // 2)
+    return {
+        'method': request.method,
+        'path': request.path + (f'?{query}' if query else ''),
+        'endpoint': request.url_rule.rule if request.url_rule else None,
+        'status': response.status_code,
+        'wall_ms': round(wall_seconds * 1000, 3),
+        'serialization_ms': round(serialization * 1000, 3),
+        'sql': {
+            'count': recorder.count,
+            'total_ms': round(recorder.total_seconds * 1000, 3),
+            'statements': [
+                {'statement': ' '.join(statement.split()), 'ms': round(seconds * 1000, 3), 'call_site': call_site}
+                for statement, call_site, seconds in sorted(recorder.statements, key=lambda row: row[2],
+                                                            reverse=True)[:TOP_STATEMENTS]
+            ]
+        },
+        'functions': [
+            {'function': _function_name(function), 'calls': calls, 'total_ms': round(total * 1000, 3),
+             'cumulative_ms': round(cumulative * 1000, 3)}
+            for function, (_, calls, total, cumulative, _) in functions[:TOP_FUNCTIONS]
+        ],
+        'call_tree': report.getvalue(),
+        'created_at': datetime.utcnow().isoformat()
+    }
+
+
+def _save_profile(profile_id, profiler, summary):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as f:
+        json.dump(summary | {'id': profile_id}, f)
+
+    # Keep only the newest PROFILE_MAX_STORED
+    summaries = sorted((name for name in os.listdir(directory) if name.endswith('.json')),
+                       key=lambda name: os.path.getmtime(os.path.join(directory, name)))
+    for name in summaries[:-current_app.config['PROFILE_MAX_STORED']]:
+        for extension in ('.json', '.prof'):
+            path = os.path.join(directory, name[:-len('.json')] + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles():
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as f:
+                summary = json.load(f)
+            profiles.append({key: summary[key] for key in
+                             ('id', 'method', 'path', 'status', 'wall_ms', 'created_at')}
+                            | {'sql_count': summary['sql']['count']})
+    return sorted(profiles, key=lambda profile: profile['created_at'], reverse=True)
+
+
+def get_profile(profile_id):
+    """A stored profile's summary, or None"""
+    path = os.path.join(profile_dir(), f'{profile_id}.json')
+    if not PROFILE_ID.match(profile_id) or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def profile_stats_path(profile_id):
+    """Where a stored profile's raw cProfile stats are, or None"""
+    path = os.path.join(profile_dir(), f'{profile_id}.prof')
+    return path if PROFILE_ID.match(profile_id) and os.path.exists(path) else None
+
+
+def init_profiling(app):
+    """Profile single requests that carry an admin-signed token.
+
+    Requests without one only pay for a header and query string lookup.
+    """
+    @app.before_request
+    def start_profile():
+        token = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+        if token is None:
+            return None
+        if not _valid_token(token):
+            return jsonify({"error": "Invalid or expired profile token"}), 403
+
+        recorder = QueryRecorder(capture_call_sites=True)
+        record_request_queries(recorder)
+        profiler = cProfile.Profile()
+        g.profile = (profiler, recorder, time.perf_counter())
+        profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        if 'profile' not in g:
+            return response
+        profiler, recorder, started = g.pop('profile')
+        profiler.disable()
+        wall_seconds = time.perf_counter() - started
+
+        profile_id = uuid.uuid4().hex
+        try:
+            _save_profile(profile_id, profiler, _summarize(profiler, recorder, wall_seconds, response))
+        except Exception as e:
+            app.logger.error(f"Error saving profile for {request.method} {request.path}: {str(e)}")
+            return response
+        app.logger.info(f"Profiled {request.method} {request.path} as {profile_id}")
+        response.headers['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,178 @@
+import os
+import time
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# A statement run this many times in one request (with different
+# parameters) is reported as an N+1
+REPEATED_STATEMENT_THRESHOLD = 3
+
+# Frames from these files are skipped when looking for a statement's call site
+_SKIPPED_FILES = (os.path.abspath(__file__), os.path.join(os.path.dirname(__file__), 'replica_routing.py'))
+
+_recorders = ContextVar('query_recorders', default=())
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """The SQL statements run while it is active, with their durations in
+    seconds and, when asked, their call sites and parameters"""
+
+    def __init__(self, capture_call_sites=False, capture_parameters=False):
+        self.capture_call_sites = capture_call_sites
+        self.capture_parameters = capture_parameters
+        self.statements = []
+        # Each statement's parameters, in the same order, when captured
+        self.parameters = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def total_seconds(self):
+        return sum(seconds for _, _, seconds in self.statements)
+
+    def record(self, statement, call_site, seconds, parameters=None):
+        self.statements.append((statement, call_site, seconds))
+        if self.capture_parameters:
+            self.parameters.append(parameters)
+
+    def repeated(self, threshold=REPEATED_STATEMENT_THRESHOLD):
+        """Statements run at least threshold times, as (statement, times, call sites).
+
+        SQLAlchemy binds every value as a parameter, so identical statement
+        text means the same query with different parameters.
+        """
+        sites = defaultdict(list)
+        for statement, call_site, _ in self.statements:
+            sites[statement].append(call_site)
+        return [(statement, len(calls), sorted({site for site in calls if site}))
+                for statement, calls in sites.items() if len(calls) >= threshold]
+
+    def report(self):
+        lines = [f"{self.count} SQL statements"]
+        for statement, times, call_sites in self.repeated():
+            lines.append(f"  {times}x {' '.join(statement.split())[:200]}")
+            lines += [f"     at {site}" for site in call_sites]
+        return '\n'.join(lines)
+
+
+def _app_root():
+    return current_app.root_path if has_app_context() else os.getcwd()
+
+
+def _call_site():
+    """The innermost frame of the app's own code that ran the statement"""
+    root = _app_root()
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(root) and 'site-packages' not in filename and filename not in _SKIPPED_FILES:
+            return f"{os.path.relpath(filename, root)}:{frame.lineno} in {frame.name}"
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_recorder_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_recorder_started'].pop()
+    recorders = _recorders.get()
+    if has_app_context():
+        recorders += g.get('request_query_recorders', ())
+    if not recorders:
+        return
+    call_site = _call_site() if any(recorder.capture_call_sites for recorder in recorders) else None
+    for recorder in recorders:
+        recorder.record(statement, call_site, seconds, parameters)
+
+
+def record_request_queries(recorder):
+    """Record the rest of the current request's statements into recorder"""
+    g.request_query_recorders = g.get('request_query_recorders', ()) + (recorder,)
+
+
+@contextmanager
+def record_queries(capture_call_sites=False, capture_parameters=False):
+    """Record every SQL statement run in the block on this thread.
+
+        with record_queries() as recorder:
+            client.get('/budget_status', headers=headers)
+        assert recorder.count <= 3, recorder.report()
+    """
+    recorder = QueryRecorder(capture_call_sites, capture_parameters)
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+def query_budget(max_queries):
+    """Declare the most SQL statements a view may run.
+
+    Goes directly above the view function. Going over the budget, or
+    repeating a statement REPEATED_STATEMENT_THRESHOLD times, raises
+    QueryBudgetExceeded when QUERY_BUDGET_ENFORCE is set (and so fails the
+    request in tests) and is logged with call sites in debug mode.
+    `flask check-query-budgets` checks every budgeted GET endpoint.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            enforce = current_app.config['QUERY_BUDGET_ENFORCE']
+            if not enforce and not current_app.debug:
+                return view(*args, **kwargs)
+            with record_queries(capture_call_sites=current_app.debug) as recorder:
+                response = view(*args, **kwargs)
+            # The request-wide guard need not report this view again
+            g.query_budget_checked = True
+            problems = check_query_budget(recorder, max_queries)
+            if problems:
+                message = f"{request.method} {request.path}: {'; '.join(problems)}"
+                current_app.logger.warning(f"{message}\n{recorder.report()}")
+                if enforce:
+                    raise QueryBudgetExceeded(message)
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def check_query_budget(recorder, max_queries):
+    """What is wrong with the recorded statements, as a list of messages"""
+    problems = []
+    if recorder.count > max_queries:
+        problems.append(f"ran {recorder.count} SQL statements, over its budget of {max_queries}")
+    for statement, times, _ in recorder.repeated():
+        problems.append(f"repeated a statement {times} times (N+1?): {' '.join(statement.split())[:80]}")
+    return problems
+
+
+def init_query_guard(app):
+    """In debug mode, log every request that looks like an N+1, including
+    ones without a declared budget"""
+    @app.before_request
+    def start_query_guard():
+        if app.debug:
+            g.query_guard_recorder = QueryRecorder(capture_call_sites=True)
+            record_request_queries(g.query_guard_recorder)
+
+    @app.after_request
+    def log_repeated_queries(response):
+        recorder = g.get('query_guard_recorder')
+        if recorder is not None and not g.get('query_budget_checked') and recorder.repeated():
+            app.logger.warning(f"Possible N+1 in {request.method} {request.path}: {recorder.report()}")
+        return response
@@ -0,0 +1,140 @@
+import re
+from datetime import date, timedelta
+from extensions import db
+from models import (
+    Account, Transaction, Budget, BudgetAlert, PlaidItem, CustomCategory, FinancialGoal, Notification,
+    MerchantCategoryMemo, CategoryKeyword
+)
+
+# Tables large enough that a sequential scan on a hot path is a regression
+WATCHED_TABLES = {
+    'account', 'transaction', 'budget', 'budget_alert', 'plaid_item',
+    'custom_category', 'financial_goal', 'notification', 'merchant_category_memo', 'category_keyword'
+}
+
+# Monthly partitions of the transaction table count as the table itself
+PARTITION_PATTERN = re.compile(r'^transaction_(y\d{4}m\d{2}|default)$')
+
+
+def base_table(relation):
+    return 'transaction' if PARTITION_PATTERN.match(relation) else relation
+
+
+def hot_queries(user_id=1):
+    """The queries behind each endpoint, keyed by a short description.
+
+    Keep these in step with the filters used in app.py and the services so
+    a missing or unusable index shows up when the plans are checked.
+    """
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    return {
+        'GET /accounts': Account.query.filter_by(user_id=user_id),
+        'GET /stored_transactions': Transaction.query.filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= month_ago
+        ).order_by(Transaction.date.desc()),
+        'GET /recent_transactions': Transaction.query.filter_by(user_id=user_id)
+            .order_by(Transaction.date.desc()).limit(5),
+        'GET /spending_trends': Transaction.query.filter(
+            Transaction.user_id == user_id,
+            Transaction.date.isnot(None),
+            Transaction.date >= month_ago,
+            Transaction.date <= today
+        ),
+        'GET /budget_status (spent per budget)': Transaction.query.filter(
+            Transaction.user_id == user_id,
+            Transaction.category == 'Food',
+            Transaction.date >= month_ago,
+            Transaction.date <= today
+        ),
+        'DELETE /accounts/<id> (transactions)': Transaction.query.filter_by(account_id='account-id'),
+        'GET /budget_status': Budget.query.filter_by(user_id=user_id),
+        'create_next_recurring_budgets': Budget.query.filter_by(is_recurring=True, end_date=today),
+        'GET /budget_alerts': BudgetAlert.query.filter_by(user_id=user_id, is_read=False)
+            .order_by(BudgetAlert.created_at.desc()),
+        'check_budget_alerts (existing alert)': BudgetAlert.query.filter_by(
+            budget_id=1, alert_type='80%', is_read=False
+        ),
+        'DELETE /delete_budget/<id> (alerts)': BudgetAlert.query.filter_by(budget_id=1),
+        'POST /sync_transactions (plaid item)': PlaidItem.query.filter_by(user_id=user_id)
+            .order_by(PlaidItem.id.desc()),
+        'GET /get_categories': CustomCategory.query.filter_by(user_id=user_id),
+        'update_category_keywords': CustomCategory.query.filter_by(user_id=user_id, name='Food'),
+        'GET /category_keywords': CategoryKeyword.query.filter(
+            CategoryKeyword.user_id == user_id,
+            CategoryKeyword.keyword.startswith('tes')
+        ),
+        'get_custom_category_keywords': CategoryKeyword.query.filter_by(category_id=1),
+        'GET /financial_goals': FinancialGoal.query.filter_by(user_id=user_id),
+        'resolve_merchant_categories': MerchantCategoryMemo.query.filter(
+            MerchantCategoryMemo.merchant_key.in_(['tesco stores', 'starbucks'])
+        ),
+        'unread notifications': Notification.query.filter_by(user_id=user_id, is_read=False)
+            .order_by(Notification.created_at.desc()),
+    }
+
+
+def compile_query(query):
+    # Literal values let the planner match partial indexes such as is_read = false
+    return str(query.statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={'literal_binds': True}
+    ))
+
+
+def _sequential_scans_postgresql(sql, parameters):
+    def walk(node):
+        if node.get('Node Type') == 'Seq Scan':
+            table = base_table(node['Relation Name'])
+            if table in WATCHED_TABLES:
+                yield table
+        for child in node.get('Plans', []):
+            yield from walk(child)
+
+    with db.engine.connect() as connection:
+        with connection.begin():
+            # Make the planner prefer any usable index so the check does not
+            # depend on how much data the database happens to hold
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}', parameters).scalar()
+    return list(walk(plan[0]['Plan'])), plan
+
+
+def _sequential_scans_sqlite(sql, parameters):
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    details = [row[3] for row in rows]
+    scans = []
+    for detail in details:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == 'SCAN' and words[1].strip('"') in WATCHED_TABLES:
+            scans.append(words[1].strip('"'))
+    return scans, details
+
+
+def sequential_scans(sql, parameters=None):
+    """Explain a statement, with the DBAPI parameters it ran with, and
+    return (watched tables it scans in full, plan)"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return _sequential_scans_postgresql(sql, parameters)
+    if dialect == 'sqlite':
+        return _sequential_scans_sqlite(sql, parameters)
+    raise ValueError(f"Query plan checks are not supported on {dialect}")
+
+
+def check_query_plans(user_id=1):
+    """Explain every hot query and report the ones that scan a whole table.
+
+    Returns a list of (name, tables, plan) tuples for the regressions; an
+    empty list means every query is served by an index. The benchmark
+    suite (tests/test_endpoint_benchmarks.py) does the same for the
+    statements each endpoint actually runs.
+    """
+    regressions = []
+    for name, query in hot_queries(user_id).items():
+        tables, plan = sequential_scans(compile_query(query))
+        if tables:
+            regressions.append((name, tables, plan))
+    return regressions
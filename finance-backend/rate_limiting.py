@@ -0,0 +1,58 @@
+from flask import current_app, request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_limiter.util import get_remote_address
+
+# What a request to a view without @rate_cost costs against the caller's
+# shared budget (RATELIMIT_APPLICATION)
+DEFAULT_COST = 1
+
+
+def rate_limit_key():
+    """The caller's user id when they send a valid access token, otherwise
+    their IP address, so users behind one NAT get separate limits"""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        # Expired, malformed or refresh tokens are limited like anonymous callers
+        identity = None
+    return f"user:{identity}" if identity is not None else f"ip:{get_remote_address()}"
+
+
+def rate_cost(cost):
+    """Declare what a request to a view costs against the caller's shared
+    budget, for views much more expensive than a plain read (analytics,
+    Plaid calls, jobs over every transaction).
+
+    Goes directly above the view function. cost is a number, or a function
+    that works it out from the request.
+    """
+    def decorator(view):
+        view.rate_cost = cost
+        return view
+    return decorator
+
+
+def request_cost():
+    view = current_app.view_functions.get(request.endpoint)
+    cost = getattr(view, 'rate_cost', DEFAULT_COST)
+    return cost() if callable(cost) else cost
+
+
+def sub_requests_cost(sub_requests):
+    """What a list of batch sub-requests would cost sent separately"""
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return DEFAULT_COST
+    adapter = current_app.url_map.bind('')
+    total = 0
+    for sub in sub_requests:
+        try:
+            endpoint, _ = adapter.match(sub['path'].split('?')[0], method=str(sub.get('method', 'GET')).upper())
+        except Exception:
+            # Unroutable sub-requests still cost the lookup
+            total += DEFAULT_COST
+            continue
+        cost = getattr(current_app.view_functions.get(endpoint), 'rate_cost', DEFAULT_COST)
+        # Costs worked out from the request would read the batch's own body
+        total += cost if not callable(cost) else DEFAULT_COST
+    return total
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+from collections import Counter
+from flask import current_app
+from sqlalchemy import update, values, column, Integer, String
+from extensions import db
+from models import Transaction, RecategorizeJob, MerchantCategoryCorrection
+from category_service import CategoryMatcher, get_custom_category_keywords
+from budget_service import update_budget_spending
+from merchant_memo_service import normalize_merchant
+
+BATCH_SIZE = 5000
+# Number of individual changes kept for a dry-run diff
+DIFF_LIMIT = 500
+
+
+def create_recategorize_job(user_id, dry_run):
+    job = RecategorizeJob(user_id=user_id, dry_run=dry_run)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def get_recategorize_job(job_id, user_id):
+    job = RecategorizeJob.query.filter_by(id=job_id, user_id=user_id).first()
+    if not job:
+        return None
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['RECATEGORIZE_STALE_SECONDS'])
+    if job.status in ('queued', 'running') and job.updated_at < stale_before:
+        # The process running it went away; the user can start it again
+        _update_job(job.id, status='failed', error='Interrupted before it finished',
+                    finished_at=datetime.utcnow())
+    return job.to_dict()
+
+
+def _update_job(job_id, *conditions, **fields):
+    """Update the job and commit; returns whether it matched the conditions"""
+    updated = RecategorizeJob.query.filter(RecategorizeJob.id == job_id, *conditions).update(
+        dict(fields, updated_at=datetime.utcnow()), synchronize_session=False
+    )
+    db.session.commit()
+    return updated > 0
+
+
+def prune_recategorize_jobs(retention_days):
+    """Delete jobs that finished before the retention period"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = RecategorizeJob.query.filter(RecategorizeJob.finished_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def _write_categories(user_id, changes):
+    """Apply (id, category) pairs for one batch in a single statement"""
+    if db.engine.dialect.name == 'postgresql':
+        new_values = values(
+            column('id', Integer), column('category', String), name='new_categories'
+        ).data(changes)
+        db.session.execute(
+            update(Transaction)
+            .where(Transaction.id == new_values.c.id, Transaction.user_id == user_id)
+            .values(category=new_values.c.category)
+        )
+    else:
+        # UPDATE ... FROM (VALUES ...) needs column aliases SQLite lacks;
+        # fall back to one executemany keyed on the primary key
+        db.session.execute(
+            update(Transaction),
+            [{'id': transaction_id, 'category': category} for transaction_id, category in changes]
+        )
+
+
+def recategorize_history(job_id, user_id, dry_run, logger):
+    """Re-run the user's custom category keywords over all of their transactions.
+
+    Transactions are read in id order in batches and categorized in memory.
+    Merchants the user has corrected by hand keep their categories, and
+    only rows whose category actually changes are written, one set-based
+    UPDATE per batch, committed together with the job's progress. Budget
+    spending is refreshed once at the end.
+    """
+    if not _update_job(job_id, RecategorizeJob.status == 'queued', status='running'):
+        # Already reported as interrupted while it waited
+        logger.info(f"Skipping recategorization {job_id} for user {user_id}: no longer queued")
+        return 0
+    try:
+        matcher = CategoryMatcher(get_custom_category_keywords(user_id))
+        corrected = {key for (key,) in db.session.query(MerchantCategoryCorrection.merchant_key).filter(
+            MerchantCategoryCorrection.user_id == user_id
+        )}
+
+        total = Transaction.query.filter_by(user_id=user_id).count()
+        _update_job(job_id, total=total)
+
+        processed, changed = 0, 0
+        changes_by_category = Counter()
+        diff = []
+        last_id = 0
+        while True:
+            rows = db.session.query(
+                Transaction.id, Transaction.name, Transaction.merchant_name, Transaction.category
+            ).filter(
+                Transaction.user_id == user_id,
+                Transaction.id > last_id
+            ).order_by(Transaction.id).limit(BATCH_SIZE).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            changes = []
+            for row in rows:
+                if normalize_merchant(row.merchant_name or row.name) in corrected:
+                    continue
+                new_category = matcher.match(row.name)
+                # Names no rule matches keep whatever category they have
+                if new_category != 'Uncategorized' and new_category != row.category:
+                    changes.append((row.id, new_category))
+                    changes_by_category[f"{row.category} -> {new_category}"] += 1
+                    if len(diff) < DIFF_LIMIT:
+                        diff.append({
+                            'id': row.id,
+                            'name': row.name,
+                            'old_category': row.category,
+                            'new_category': new_category
+                        })
+
+            if changes and not dry_run:
+                _write_categories(user_id, changes)
+
+            processed += len(rows)
+            changed += len(changes)
+            # Commits the batch's writes along with its progress
+            _update_job(job_id, processed=processed, changed=changed,
+                        changes_by_category=dict(changes_by_category), diff=diff)
+
+        if changed and not dry_run:
+            update_budget_spending(user_id)
+
+        _update_job(job_id, status='completed', finished_at=datetime.utcnow())
+        logger.info(f"Recategorization {job_id} for user {user_id} {'found' if dry_run else 'updated'} "
+                    f"{changed} of {processed} transactions")
+        return changed
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error in recategorization {job_id} for user {user_id}: {str(e)}")
+        _update_job(job_id, status='failed', error=str(e)[:255], finished_at=datetime.utcnow())
+        raise
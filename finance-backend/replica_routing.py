@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from functools import wraps
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Binds named like this in SQLALCHEMY_BINDS are replicas (see config.py)
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+def _is_write(clause):
+    if isinstance(clause, sa.UpdateBase):
+        return True
+    # SELECT ... FOR UPDATE must lock rows on the primary
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    """Sends the reads of read-only views to a replica.
+
+    Everything else, including flushes and any write or locking statement
+    issued from a read-only view, goes to the primary. One replica is
+    chosen per request so its reads see a single snapshot.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and g.get('use_replica') and not _is_write(clause):
+            engines = self._db.engines
+            if 'replica_key' not in g:
+                keys = [key for key in engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+                g.replica_key = random.choice(keys) if keys else None
+            if g.replica_key is not None:
+                return engines[g.replica_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _current_user_id():
+    if not has_request_context():
+        return None
+    try:
+        from flask_jwt_extended import get_jwt_identity
+        return get_jwt_identity()
+    except RuntimeError:
+        # Not a JWT-protected request
+        return None
+
+
+def _last_write_key(user_id):
+    return f'finance:last_write_user_{user_id}'
+
+
+class LocalStickyStore:
+    """Recent-write markers in this process only, with the two Redis calls
+    the routing uses"""
+
+    def __init__(self):
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def exists(self, key):
+        with self._lock:
+            expires = self._expires.get(key)
+            return int(expires is not None and expires > time.monotonic())
+
+    def set(self, key, value, ex):
+        now = time.monotonic()
+        with self._lock:
+            self._expires[key] = now + ex
+            if len(self._expires) > 10000:
+                self._expires = {key: expires for key, expires in self._expires.items() if expires > now}
+
+
+# Where the recent-write markers live: Redis, shared by every worker
+# process, or this process alone when no Redis is configured. Only set up
+# when there are replicas to route to
+_sticky_store = None
+
+
+def init_replica_routing(app):
+    """Connect to REPLICA_STICKY_REDIS_URL when read replicas are configured"""
+    global _sticky_store
+    if not app.config['DATABASE_REPLICA_URLS']:
+        return
+    if not app.config['REPLICA_STICKY_REDIS_URL']:
+        app.logger.warning("REPLICA_STICKY_REDIS_URL is not set: read-your-writes stickiness is per process, "
+                           "so with several workers a user's read may miss their own recent write")
+        _sticky_store = LocalStickyStore()
+        return
+    import redis
+    _sticky_store = redis.Redis.from_url(app.config['REPLICA_STICKY_REDIS_URL'])
+
+
+def recently_wrote(user_id):
+    if user_id is None or _sticky_store is None:
+        return False
+    try:
+        return _sticky_store.exists(_last_write_key(user_id)) > 0
+    except Exception as e:
+        current_app.logger.error(f"Error checking recent writes of user {user_id}: {str(e)}")
+        # Without the marker only the primary is sure to have the user's writes
+        return True
+
+
+def read_only(view):
+    """Serve the view from a replica, unless the user wrote within the last
+    REPLICA_STICKY_SECONDS, so they always read their own writes.
+
+    Goes under @jwt_required() so the user is known.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = not recently_wrote(_current_user_id())
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# A committed write makes the user's reads sticky to the primary for a while.
+# With Redis the marker is seen by whichever worker serves the next read.
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _note_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _note_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _mark_user_write(session):
+    if not session.info.pop('wrote', False):
+        return
+    user_id = _current_user_id()
+    sticky_seconds = current_app.config['REPLICA_STICKY_SECONDS']
+    if user_id is None or sticky_seconds <= 0 or _sticky_store is None:
+        return
+    try:
+        _sticky_store.set(_last_write_key(user_id), 1, ex=sticky_seconds)
+    except Exception as e:
+        current_app.logger.error(f"Error marking recent write of user {user_id}: {str(e)}")
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('wrote', None)
@@ -0,0 +1,215 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import text, update, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import JobRun, SchedulerLease
+
+# Key of the PostgreSQL session-level advisory lock held by the leader
+SCHEDULER_LOCK_KEY = 724913058
+SCHEDULER_LEASE_NAME = 'scheduler'
+
+
+def instance_id():
+    """Identifies this scheduler loop in leases and job runs"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class AdvisoryLockElection:
+    """Leader election on a PostgreSQL advisory lock.
+
+    The lock is held on a dedicated connection, so it is released by the
+    server as soon as the leader's process or connection dies, and the next
+    standby to poll takes over.
+    """
+
+    def __init__(self, engine, instance):
+        self.engine = engine
+        self.instance = instance
+        self._connection = None
+        self._held = False
+
+    def acquire(self):
+        if self._connection is None:
+            self._connection = self.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        if self._held:
+            # Any error here means the connection, and with it the lock, is gone
+            self._connection.execute(text('SELECT 1'))
+        else:
+            self._held = bool(self._connection.execute(
+                text('SELECT pg_try_advisory_lock(:key)'), {'key': SCHEDULER_LOCK_KEY}
+            ).scalar())
+        return self._held
+
+    def reset(self):
+        if self._connection is not None:
+            try:
+                self._connection.invalidate()
+            except Exception:
+                pass
+        self._connection = None
+        self._held = False
+
+    def release(self):
+        if self._connection is not None and self._held:
+            try:
+                self._connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': SCHEDULER_LOCK_KEY})
+                self._connection.close()
+            except Exception:
+                pass
+        self._connection = None
+        self._held = False
+
+
+class LeaseElection:
+    """Leader election on a lease row, for databases without advisory locks.
+
+    The leader renews the lease well before it expires; if it stops
+    renewing, any standby may claim the expired lease.
+    """
+
+    def __init__(self, instance, lease_seconds):
+        self.instance = instance
+        self.lease_seconds = lease_seconds
+
+    def acquire(self):
+        now = datetime.utcnow()
+        dialect_insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+        db.session.execute(
+            dialect_insert(SchedulerLease).values(name=SCHEDULER_LEASE_NAME, holder=None, expires_at=now)
+            .on_conflict_do_nothing(index_elements=['name'])
+        )
+        claimed = db.session.execute(
+            update(SchedulerLease).where(
+                SchedulerLease.name == SCHEDULER_LEASE_NAME,
+                or_(SchedulerLease.holder == self.instance, SchedulerLease.expires_at <= now)
+            ).values(holder=self.instance, expires_at=now + timedelta(seconds=self.lease_seconds))
+        ).rowcount
+        db.session.commit()
+        return claimed == 1
+
+    def reset(self):
+        db.session.rollback()
+
+    def release(self):
+        # Let a standby take over straight away instead of waiting for expiry
+        db.session.execute(
+            update(SchedulerLease).where(
+                SchedulerLease.name == SCHEDULER_LEASE_NAME,
+                SchedulerLease.holder == self.instance
+            ).values(holder=None, expires_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+
+def make_election(app, instance):
+    if db.engine.dialect.name == 'postgresql':
+        return AdvisoryLockElection(db.engine, instance)
+    return LeaseElection(instance, app.config['SCHEDULER_LEASE_SECONDS'])
+
+
+def run_job(app, instance, job_id, func):
+    """Run a job in an app context and record it in job_run.
+
+    func returns the number of rows it touched. The run is committed as
+    'running' first, so a run that dies with its process is still visible.
+    """
+    with app.app_context():
+        run = JobRun(job_id=job_id, instance=instance, status='running', started_at=datetime.utcnow())
+        db.session.add(run)
+        db.session.commit()
+        run_id = run.id
+        started = time.monotonic()
+        try:
+            rows = func()
+            status, error = 'succeeded', None
+            app.logger.info(f"Job {job_id} finished in {time.monotonic() - started:.1f}s ({rows} rows)")
+        except Exception as e:
+            db.session.rollback()
+            rows, status, error = None, 'failed', str(e)[:255]
+            app.logger.error(f"Error in job {job_id}: {str(e)}")
+
+        db.session.execute(update(JobRun).where(JobRun.id == run_id).values(
+            status=status,
+            finished_at=datetime.utcnow(),
+            duration_ms=int((time.monotonic() - started) * 1000),
+            row_count=rows,
+            error=error
+        ))
+        db.session.commit()
+
+
+def prune_job_runs(retention_days):
+    """Delete job runs older than the retention period"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = JobRun.query.filter(JobRun.started_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def recent_job_runs(job_id=None, limit=20):
+    query = JobRun.query
+    if job_id:
+        query = query.filter(JobRun.job_id == job_id)
+    return query.order_by(JobRun.started_at.desc(), JobRun.id.desc()).limit(limit).all()
+
+
+def run_scheduler(app, stop_event=None):
+    """Run the periodic jobs in this process while it is the elected leader.
+
+    Every scheduler process polls the election; the one that wins starts
+    APScheduler, and pauses it again if it ever loses leadership. Blocks
+    until stop_event is set.
+    """
+    from jobs import init_scheduler
+
+    stop_event = stop_event or threading.Event()
+    instance = instance_id()
+    # Renew well inside the lease so a slow poll doesn't hand leadership over
+    interval = app.config['SCHEDULER_LEASE_SECONDS'] / 3
+
+    with app.app_context():
+        election = make_election(app, instance)
+    scheduler = None
+    leading = False
+    app.logger.info(f"Scheduler {instance} waiting for leadership")
+    try:
+        while not stop_event.is_set():
+            with app.app_context():
+                try:
+                    is_leader = election.acquire()
+                except Exception as e:
+                    app.logger.error(f"Error in scheduler election: {str(e)}")
+                    election.reset()
+                    is_leader = False
+
+            if is_leader and not leading:
+                app.logger.info(f"Scheduler {instance} is now the leader")
+                if scheduler is None:
+                    scheduler = init_scheduler(app, instance)
+                else:
+                    scheduler.resume()
+            elif leading and not is_leader:
+                app.logger.warning(f"Scheduler {instance} lost leadership, pausing jobs")
+                scheduler.pause()
+            leading = is_leader
+            stop_event.wait(interval)
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+        with app.app_context():
+            try:
+                election.release()
+            except Exception as e:
+                app.logger.error(f"Error releasing scheduler leadership: {str(e)}")
+
+
+def start_scheduler_thread(app):
+    """Run the elected scheduler in a background thread of this process"""
+    thread = threading.Thread(target=run_scheduler, args=(app,), name='scheduler', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from extensions import db
+from models import SlowQuery
+
+# The most recent slow statements of this process, newest last
+_buffer = deque(maxlen=500)
+_buffer_lock = threading.Lock()
+
+# EXPLAIN ANALYZE runs the statement again, so it and the table insert happen
+# off the request thread; one worker keeps the extra load on the database low
+explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query')
+
+# Values of these types are kept; anything else (names, tokens, emails) is not
+_SAFE_TYPES = (bool, int, float, Decimal, date, datetime)
+
+
+def statement_hash(statement):
+    return hashlib.sha1(' '.join(statement.split()).encode()).hexdigest()
+
+
+def _redact(value):
+    if value is None or isinstance(value, _SAFE_TYPES):
+        return value if not isinstance(value, (Decimal, date)) else str(value)
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters, executemany=False):
+    """Bound parameters with every string-like value replaced by its type"""
+    if executemany:
+        return {'rows': len(parameters), 'first': redact_parameters(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(value) for value in parameters]
+    return None
+
+
+def _endpoint():
+    if not has_request_context():
+        return None
+    return f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+
+
+def _explain(connection, statement, parameters):
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        # Closing the connection rolls back whatever the plan touched
+        plan = connection.exec_driver_sql(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}', parameters).scalar()
+        return plan if not isinstance(plan, str) else json.loads(plan)
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        return [row[3] for row in rows]
+    return None
+
+
+def _explainable(statement):
+    # Only plain reads are run again for their plan
+    words = statement.lstrip().upper()
+    return words.startswith('SELECT') and 'FOR UPDATE' not in words and 'FOR SHARE' not in words
+
+
+def _finish_record(app, engine, record, parameters):
+    """Attach a plan when sampled and store the record when SLOW_QUERY_STORE is on"""
+    try:
+        if parameters is not None:
+            with engine.connect() as connection:
+                record['plan'] = _explain(connection, record['statement'], parameters)
+        if app.config['SLOW_QUERY_STORE']:
+            with app.app_context():
+                db.session.add(SlowQuery(
+                    statement_hash=record['statement_hash'],
+                    statement=record['statement'],
+                    parameters=record['parameters'],
+                    duration_ms=record['duration_ms'],
+                    endpoint=record['endpoint'],
+                    plan=record['plan'],
+                    created_at=record['created_at']
+                ))
+                db.session.commit()
+    except Exception as e:
+        app.logger.warning(f"Could not record slow query: {str(e)}")
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('slow_query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _check_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['slow_query_started'].pop()) * 1000
+    # Plans and inserts made by the worker are not recorded themselves
+    if not has_app_context() or threading.current_thread().name.startswith('slow-query'):
+        return
+    config = current_app.config
+    threshold = config['SLOW_QUERY_MS']
+    if not threshold or elapsed_ms < threshold:
+        return
+
+    record = {
+        'statement_hash': statement_hash(statement),
+        'statement': statement,
+        'parameters': redact_parameters(parameters, executemany),
+        'duration_ms': round(elapsed_ms, 3),
+        'endpoint': _endpoint(),
+        'plan': None,
+        'created_at': datetime.utcnow()
+    }
+    with _buffer_lock:
+        _buffer.append(record)
+    current_app.logger.warning(f"Slow query ({elapsed_ms:.0f} ms) in {record['endpoint'] or 'background work'}: "
+                               f"{' '.join(statement.split())[:200]}")
+
+    sampled = (not executemany and _explainable(statement)
+               and random.random() < config['SLOW_QUERY_EXPLAIN_SAMPLE_RATE'])
+    if sampled or config['SLOW_QUERY_STORE']:
+        explain_executor.submit(_finish_record, current_app._get_current_object(), conn.engine, record,
+                                parameters if sampled else None)
+
+
+def init_slow_query_log(app):
+    global _buffer
+    with _buffer_lock:
+        if _buffer.maxlen != app.config['SLOW_QUERY_BUFFER_SIZE']:
+            _buffer = deque(_buffer, maxlen=app.config['SLOW_QUERY_BUFFER_SIZE'])
+
+
+def _summaries(rows):
+    by_hash = {}
+    for record in rows:
+        summary = by_hash.setdefault(record['statement_hash'], {
+            'statement': record['statement'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'endpoints': set(), 'last_seen': None, 'latest': None
+        })
+        summary['count'] += 1
+        summary['total_ms'] += record['duration_ms']
+        summary['max_ms'] = max(summary['max_ms'], record['duration_ms'])
+        if record['endpoint']:
+            summary['endpoints'].add(record['endpoint'])
+        if summary['last_seen'] is None or record['created_at'] >= summary['last_seen']:
+            summary['last_seen'] = record['created_at']
+            summary['latest'] = record
+        # The most recent sampled plan is the most useful one
+        if record['plan'] is not None:
+            summary['plan'] = record['plan']
+    return by_hash
+
+
+def top_slow_queries(limit=20, source='buffer', since=None):
+    """Slow statements grouped by text, worst total time first.
+
+    source is 'buffer' (this process's recent records) or 'table' (every
+    process, when SLOW_QUERY_STORE is on).
+    """
+    if source == 'table':
+        recent = [SlowQuery.created_at >= since] if since is not None else []
+        top = db.session.query(SlowQuery.statement_hash).filter(*recent).group_by(
+            SlowQuery.statement_hash
+        ).order_by(func.sum(SlowQuery.duration_ms).desc()).limit(limit)
+        rows = [row.to_dict() | {'statement_hash': row.statement_hash}
+                for row in SlowQuery.query.filter(*recent, SlowQuery.statement_hash.in_(top))
+                .order_by(SlowQuery.created_at).all()]
+        for row in rows:
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+    else:
+        with _buffer_lock:
+            rows = [record for record in _buffer if since is None or record['created_at'] >= since]
+
+    summaries = sorted(_summaries(rows).values(), key=lambda summary: summary['total_ms'], reverse=True)[:limit]
+    return [{
+        'statement': summary['statement'],
+        'count': summary['count'],
+        'total_ms': round(summary['total_ms'], 3),
+        'mean_ms': round(summary['total_ms'] / summary['count'], 3),
+        'max_ms': round(summary['max_ms'], 3),
+        'endpoints': sorted(summary['endpoints']),
+        'last_seen': summary['last_seen'].isoformat(),
+        'latest_parameters': summary['latest']['parameters'],
+        'plan': summary.get('plan')
+    } for summary in summaries]
+
+
+def prune_slow_queries(retention_days):
+    """Delete stored slow queries older than retention_days; returns how many"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = SlowQuery.query.filter(SlowQuery.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,114 @@
+"""Measure how long the backend takes to import and build the app.
+
+Each run starts a fresh interpreter with ``python -X importtime``, imports
+``app`` and calls ``create_app()``, so nothing is shared between runs. The
+median import and boot times are compared against a budget, and the run
+fails if a module that should only load on first use was imported at boot.
+
+    python startup_benchmark.py --runs 5 --max-boot-ms 900
+
+Exits non-zero on a regression so it can gate CI.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Loaded on first use only; importing any of them at boot is a regression
+LAZY_MODULES = ['plaid', 'numpy', 'rapidfuzz', 'flask_mail', 'flask_apscheduler', 'flask_migrate', 'alembic']
+
+BOOT_SCRIPT = """
+import sys, time
+sys.path.insert(0, {backend_dir!r})
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+booted = time.perf_counter()
+print('import_ms', (imported - start) * 1000)
+print('boot_ms', (booted - start) * 1000)
+print('lazy', ','.join(name for name in {lazy_modules!r} if name in sys.modules))
+"""
+
+
+def parse_importtime(stderr):
+    """Cumulative milliseconds per package imported by app.py or create_app()"""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two spaces per level under their importer
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if level > 1 or name == 'app':
+            continue
+        top = name.split('.')[0]
+        totals[top] = totals.get(top, 0) + int(cumulative) / 1000
+    return totals
+
+
+def run_once(env, cwd):
+    script = BOOT_SCRIPT.format(backend_dir=BACKEND_DIR, lazy_modules=LAZY_MODULES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+                            env=env, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Boot failed:\n{result.stderr[-2000:]}")
+    values = dict(line.split(' ', 1) for line in result.stdout.splitlines()
+                  if line.split(' ', 1)[0] in ('import_ms', 'boot_ms', 'lazy'))
+    return {
+        'import_ms': float(values['import_ms']),
+        'boot_ms': float(values['boot_ms']),
+        'lazy': [name for name in values.get('lazy', '').strip().split(',') if name],
+        'packages': parse_importtime(result.stderr)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time.')
+    parser.add_argument('--max-boot-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', 900)),
+                        help='Fail if the median import plus create_app() time exceeds this.')
+    parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list.')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Booting never connects to the database, so placeholders are enough
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    env.setdefault('TEST_DATABASE_URL', 'sqlite://')
+    env.setdefault('JWT_SECRET_KEY', 'startup-benchmark-placeholder-secret')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    env.pop('SCHEDULER_ENABLED', None)
+
+    # Run from a scratch directory so the app's log folder lands there
+    with tempfile.TemporaryDirectory() as cwd:
+        runs = [run_once(env, cwd) for _ in range(args.runs)]
+
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    boot_ms = statistics.median(run['boot_ms'] for run in runs)
+    packages = {name: statistics.median(run['packages'].get(name, 0) for run in runs)
+                for name in runs[0]['packages']}
+
+    print(f"import app: {import_ms:.0f} ms, import + create_app(): {boot_ms:.0f} ms "
+          f"(median of {args.runs}, budget {args.max_boot_ms:.0f} ms)")
+    print("Slowest imports:")
+    for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failed = False
+    eager = sorted({name for run in runs for name in run['lazy']})
+    if eager:
+        print(f"Imported at boot but should load on first use: {', '.join(eager)}")
+        failed = True
+    if boot_ms > args.max_boot_ms:
+        print(f"Boot took {boot_ms:.0f} ms, over the {args.max_boot_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
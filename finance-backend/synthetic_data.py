@@ -0,0 +1,162 @@
+import random
+import uuid
+from datetime import date, timedelta
+from sqlalchemy import insert
+from extensions import db
+from models import User, PlaidItem, Account, Transaction, Budget, FinancialGoal, CustomCategory
+
+# Total transactions at each named scale, spread over users of about
+# TRANSACTIONS_PER_USER each
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+TRANSACTIONS_PER_USER = 5_000
+# Rows per bulk insert statement
+BATCH_SIZE = 5_000
+
+SYNTHETIC_PREFIX = 'synthetic_'
+SYNTHETIC_PASSWORD = 'synthetic-password'
+
+# Merchant, category and typical spend; amounts follow a lognormal around it
+MERCHANTS = [
+    ('Tesco', 'FOOD_AND_DRINK', 35.0), ('Sainsbury\'s', 'FOOD_AND_DRINK', 40.0),
+    ('Pret A Manger', 'FOOD_AND_DRINK', 7.5), ('Starbucks', 'FOOD_AND_DRINK', 4.8),
+    ('Deliveroo', 'FOOD_AND_DRINK', 24.0), ('Uber', 'TRANSPORTATION', 14.0),
+    ('Trainline', 'TRANSPORTATION', 38.0), ('Shell', 'TRANSPORTATION', 55.0),
+    ('Amazon', 'GENERAL_MERCHANDISE', 29.0), ('Argos', 'GENERAL_MERCHANDISE', 45.0),
+    ('Netflix', 'ENTERTAINMENT', 10.99), ('Spotify', 'ENTERTAINMENT', 11.99),
+    ('Odeon', 'ENTERTAINMENT', 13.5), ('British Gas', 'RENT_AND_UTILITIES', 95.0),
+    ('Thames Water', 'RENT_AND_UTILITIES', 38.0), ('Boots', 'MEDICAL', 12.0),
+    ('PureGym', 'PERSONAL_CARE', 24.99), ('Ryanair', 'TRAVEL', 120.0),
+]
+BUDGET_CATEGORIES = ['FOOD_AND_DRINK', 'TRANSPORTATION', 'ENTERTAINMENT', 'GENERAL_MERCHANDISE']
+CITIES = [('London', 'ENG'), ('Cardiff', 'WLS'), ('Manchester', 'ENG'), ('Edinburgh', 'SCT')]
+
+
+def _transaction_rows(rng, user_id, accounts, count, days, today):
+    """count transactions over the last `days` days: mostly card spend, plus a
+    monthly salary and rent so balances and trends look real"""
+    rows = []
+    months = max(1, days // 30)
+    for month in range(months):
+        payday = today - timedelta(days=month * 30 + 2)
+        rows.append(('Salary', 'INCOME', -2800.0, payday))
+        rows.append(('Rent', 'RENT_AND_UTILITIES', 1100.0, payday + timedelta(days=1)))
+    while len(rows) < count:
+        merchant, category, typical = rng.choice(MERCHANTS)
+        amount = round(rng.lognormvariate(0, 0.5) * typical, 2)
+        rows.append((merchant, category, amount, today - timedelta(days=rng.randrange(days))))
+
+    for merchant, category, amount, day in rows[:count]:
+        city, region = rng.choice(CITIES)
+        yield {
+            'user_id': user_id,
+            'account_id': rng.choice(accounts),
+            'transaction_id': f'{SYNTHETIC_PREFIX}{uuid.UUID(int=rng.getrandbits(128)).hex}',
+            # Stored like Plaid's, inverted: spending is negative
+            'amount': -amount,
+            'date': day,
+            'authorized_date': day,
+            'name': f'{merchant} {city}',
+            'merchant_name': merchant,
+            'category': category,
+            'payment_channel': 'online' if rng.random() < 0.3 else 'in store',
+            'pending': False,
+            'location_city': city,
+            'location_region': region,
+            'location_country': 'GB',
+            'iso_currency_code': 'GBP'
+        }
+
+
+def seed_synthetic_data(transactions, users=None, days=730, seed=0, logger=None):
+    """Create users with linked items, accounts, budgets, goals and about
+    `transactions` transactions in total.
+
+    Users are named synthetic_<n> (password SYNTHETIC_PASSWORD) and are
+    added after any existing ones. The same seed gives the same data.
+    Returns the new user ids.
+    """
+    users = users or max(1, -(-transactions // TRANSACTIONS_PER_USER))
+    today = date.today()
+    start = User.query.filter(User.username.startswith(SYNTHETIC_PREFIX)).count()
+    # Seeding again adds new users, so their ids must not repeat earlier ones
+    rng = random.Random(f'{seed}:{start}')
+
+    # Hashing is deliberately slow, so every synthetic user shares one hash
+    template = User(username='', email='')
+    template.set_password(SYNTHETIC_PASSWORD)
+    user_ids = []
+    for index in range(start, start + users):
+        user = User(username=f'{SYNTHETIC_PREFIX}{index}', email=f'{SYNTHETIC_PREFIX}{index}@example.com',
+                    password_hash=template.password_hash)
+        db.session.add(user)
+        db.session.flush()
+        item = PlaidItem(user_id=user.id, item_id=f'{SYNTHETIC_PREFIX}item_{index}',
+                         institution_name='Synthetic Bank')
+        item.access_token = f'access-sandbox-{SYNTHETIC_PREFIX}{index}'
+        db.session.add(item)
+        db.session.flush()
+
+        accounts = []
+        for name, account_type, balance in (('Current Account', 'depository', 2500.0),
+                                            ('Savings', 'depository', 8000.0),
+                                            ('Credit Card', 'credit', -450.0)):
+            account = Account(id=str(uuid.UUID(int=rng.getrandbits(128))), user_id=user.id, plaid_item_id=item.id,
+                              plaid_account_id=f'{SYNTHETIC_PREFIX}{index}_{len(accounts)}', name=name,
+                              balance=round(balance * rng.uniform(0.5, 1.5), 2), type=account_type)
+            db.session.add(account)
+            accounts.append(account.id)
+
+        month_start = today.replace(day=1)
+        for category in BUDGET_CATEGORIES:
+            db.session.add(Budget(user_id=user.id, budget_category=category,
+                                  budget_limit=rng.choice([100, 200, 300, 500]),
+                                  start_date=month_start, end_date=month_start + timedelta(days=30),
+                                  is_recurring=True, recurrence_period='monthly'))
+        db.session.add(CustomCategory(user_id=user.id, name='Coffee'))
+        for name, target in (('Emergency fund', 5000), ('Holiday', 1500)):
+            db.session.add(FinancialGoal(user_id=user.id, name=name, target_amount=target,
+                                         current_amount=round(target * rng.random(), 2),
+                                         target_date=today + timedelta(days=rng.randrange(90, 720))))
+        db.session.commit()
+
+        share = transactions // users + (1 if index - start < transactions % users else 0)
+        batch = []
+        for row in _transaction_rows(rng, user.id, accounts, share, days, today):
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                db.session.execute(insert(Transaction), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Transaction), batch)
+        db.session.commit()
+        user_ids.append(user.id)
+        if logger:
+            logger.info(f"Seeded synthetic user {user.id} with {share} transactions")
+    return user_ids
+
+
+def plaid_transactions(rng, accounts, count, today=None):
+    """Transactions shaped like Plaid's /transactions/get response, for
+    benchmarking the storing side of a sync without calling Plaid"""
+    today = today or date.today()
+    for _ in range(count):
+        merchant, category, typical = rng.choice(MERCHANTS)
+        day = today - timedelta(days=rng.randrange(30))
+        city, region = rng.choice(CITIES)
+        transaction = {
+            'transaction_id': f'{SYNTHETIC_PREFIX}plaid_{uuid.UUID(int=rng.getrandbits(128)).hex}',
+            'account_id': rng.choice(accounts),
+            'amount': round(rng.lognormvariate(0, 0.5) * typical, 2),
+            'date': day.isoformat(),
+            'authorized_date': day.isoformat(),
+            'name': f'{merchant} {city}',
+            'merchant_name': merchant,
+            'payment_channel': 'in store',
+            'pending': False,
+            'location': {'city': city, 'region': region, 'country': 'GB'},
+            'iso_currency_code': 'GBP'
+        }
+        # Leave some uncategorized so the memo and classifier run too
+        if rng.random() < 0.8:
+            transaction['personal_finance_category'] = {'primary': category, 'detailed': f'{category}_OTHER'}
+        yield transaction
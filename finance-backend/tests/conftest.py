@@ -0,0 +1,158 @@
+"""Fixtures for the benchmark suite: the app on TestConfig over a seeded
+synthetic dataset, and the synthetic user's auth headers.
+
+The dataset goes into TEST_DATABASE_URL, or a scratch SQLite file for the
+session when it is unset (run `flask db upgrade` on a PostgreSQL database
+first). --scale picks its size.
+"""
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import pytest
+
+_scratch_dir = None
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('finance', 'synthetic dataset')
+    group.addoption('--scale', choices=['1k', '10k', '100k', '1m'], default='1k',
+                    help='Synthetic transactions to seed (default 1k).')
+    group.addoption('--seed', type=int, default=0, help='Random seed for the synthetic data.')
+
+
+def pytest_configure(config):
+    global _scratch_dir
+    _scratch_dir = tempfile.mkdtemp(prefix='finance-benchmark-')
+    # config.py reads these on import
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    os.environ.setdefault('TEST_DATABASE_URL', f"sqlite:///{os.path.join(_scratch_dir, 'benchmark.db')}")
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-placeholder-secret')
+    os.environ.setdefault('ADMIN_TOKEN', 'benchmark-admin')
+    os.environ.setdefault('METRICS_TOKEN', 'benchmark-metrics')
+    os.environ.pop('SCHEDULER_ENABLED', None)
+
+
+def pytest_unconfigure(config):
+    if _scratch_dir:
+        shutil.rmtree(_scratch_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def benchmark_app():
+    from config import TestConfig
+    from app import create_app
+
+    class BenchmarkConfig(TestConfig):
+        # Every case runs many times from one client
+        RATELIMIT_ENABLED = False
+        # Statement logging would be timed along with the statements
+        SQLALCHEMY_ECHO = False
+        PROFILE_DIR = os.path.join(_scratch_dir, 'profiles')
+
+    # The app writes its log folder into the working directory
+    cwd = os.getcwd()
+    os.chdir(_scratch_dir)
+    try:
+        yield create_app(BenchmarkConfig)
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope='session')
+def benchmark_client(benchmark_app):
+    return benchmark_app.test_client()
+
+
+@pytest.fixture(scope='session')
+def dataset(benchmark_app, pytestconfig):
+    """Seed the database if needed and collect the synthetic user's ids"""
+    from extensions import db
+    from models import User, Account, Budget, BudgetAlert, FinancialGoal, Transaction
+    from synthetic_data import seed_synthetic_data, SCALES, SYNTHETIC_PREFIX, SYNTHETIC_PASSWORD
+
+    with benchmark_app.app_context():
+        db.create_all()
+        user = User.query.filter(User.username.startswith(SYNTHETIC_PREFIX)).order_by(User.id).first()
+        if user is None:
+            started = time.perf_counter()
+            transactions = SCALES[pytestconfig.getoption('scale')]
+            seed_synthetic_data(transactions, seed=pytestconfig.getoption('seed'))
+            print(f"Seeded {transactions} transactions in {time.perf_counter() - started:.1f} s")
+            user = User.query.filter(User.username.startswith(SYNTHETIC_PREFIX)).order_by(User.id).first()
+
+        budget = Budget.query.filter_by(user_id=user.id).order_by(Budget.id).first()
+        alert = BudgetAlert.query.filter_by(user_id=user.id).first()
+        if alert is None:
+            alert = BudgetAlert(user_id=user.id, budget_id=budget.id, alert_type='80%', message='Benchmark alert')
+            db.session.add(alert)
+            db.session.commit()
+        transaction_ids = [row.id for row in Transaction.query.filter_by(user_id=user.id)
+                           .order_by(Transaction.date.desc()).limit(50)]
+        return {
+            'user_id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'password': SYNTHETIC_PASSWORD,
+            'budget_id': budget.id,
+            'alert_id': alert.id,
+            'goal_id': FinancialGoal.query.filter_by(user_id=user.id).order_by(FinancialGoal.id).first().id,
+            'account_id': Account.query.filter_by(user_id=user.id).first().id,
+            'plaid_account_ids': [account.plaid_account_id for account in Account.query.filter_by(user_id=user.id)],
+            'transaction_id': transaction_ids[0],
+            'transaction_ids': transaction_ids,
+        }
+
+
+@pytest.fixture(scope='session')
+def auth_headers(benchmark_app, dataset):
+    from flask_jwt_extended import create_access_token
+
+    with benchmark_app.app_context():
+        return {'Authorization': f"Bearer {create_access_token(identity=dataset['user_id'])}"}
+
+
+@pytest.fixture(scope='session')
+def admin_headers(benchmark_app):
+    return {'Authorization': f"Bearer {benchmark_app.config['ADMIN_TOKEN']}"}
+
+
+@pytest.fixture
+def measure(benchmark, request):
+    """Benchmark a function with the app cache cleared before each round.
+
+    The most SQL statements a round ran is saved with the results, and a
+    case fails when it runs more than the run given to --benchmark-compare.
+    """
+    from extensions import cache
+    from query_budget import record_queries
+
+    def run(function):
+        statements = []
+
+        def recorded():
+            # budget_service prints as it goes; keep the report readable
+            with record_queries() as recorder, contextlib.redirect_stdout(io.StringIO()):
+                result = function()
+            statements.append(recorder.count)
+            return result
+
+        def clear_cache():
+            # pedantic would take a returned value as the target's arguments
+            cache.clear()
+
+        result = benchmark.pedantic(recorded, setup=clear_cache, warmup_rounds=1,
+                                    rounds=request.config.getoption('benchmark_min_rounds'))
+        # The warmup round fills the caches of the code under test
+        count = max(statements[1:] or statements)
+        benchmark.extra_info['sql_statements'] = count
+
+        compared_runs = request.config._benchmarksession.compared_mapping or {}
+        for path, compared in compared_runs.items():
+            before = compared.get(benchmark.fullname, {}).get('extra_info', {}).get('sql_statements')
+            if before is not None and count > before:
+                pytest.fail(f"SQL statements {before} -> {count} since {os.path.basename(path)}")
+        return result
+    return run
@@ -0,0 +1,183 @@
+"""Time every endpoint as the synthetic user, on the seeded dataset, and
+explain the statements each one runs.
+
+A route that is neither benchmarked here nor listed in SKIPPED fails
+test_every_route_is_covered, so new endpoints get added.
+"""
+import itertools
+from datetime import date, timedelta
+import pytest
+
+# Routes that are not benchmarked, and why
+SKIPPED = {
+    'GET /events': 'streams until the client disconnects',
+    'GET /static/<path:filename>': 'static files',
+    'GET /accounts/<int:account_id>': 'takes an integer id but account ids are UUID strings',
+    'GET /download_receipt/<transaction_id>': 'needs an uploaded receipt',
+    'GET /recurring_transactions': 'calls Plaid',
+    'GET /fetch_account_info': 'calls Plaid',
+    'POST /fetch_account_info': 'calls Plaid',
+    'POST /create_link_token': 'calls Plaid',
+    'POST /set_access_token': 'calls Plaid',
+    'POST /sync_transactions': 'calls Plaid; store_plaid_transactions is benchmarked instead',
+    'POST /plaid_webhook': 'calls Plaid; store_plaid_transactions is benchmarked instead',
+    'POST /refresh_token': 'needs a refresh token',
+    'POST /register': 'adds a user per run',
+    'POST /stop_recurring_budget/<int:budget_id>': 'only succeeds once per budget',
+    'POST /add_custom_category': 'adds a category and a recategorize job per run',
+    'DELETE /accounts/<string:account_id>': 'destructive',
+    'DELETE /delete_budget/<int:budget_id>': 'destructive',
+    'DELETE /financial_goals/<int:goal_id>': 'destructive',
+}
+
+# Benchmarked routes that currently fail, and why
+BROKEN = {
+    'GET /accounts_summary': 'calls get_real_time_balances, which is not defined',
+}
+
+GET_CASES = [
+    'GET /accounts',
+    'GET /accounts_summary',
+    'GET /admin/profiles',
+    'GET /admin/profiles/<profile_id>',
+    'GET /admin/profiles/<profile_id>/download',
+    'GET /admin/slow_queries',
+    'GET /balance_history',
+    'GET /budget_alerts',
+    'GET /budget_history/<int:budget_id>',
+    'GET /budget_status',
+    'GET /budget_summary',
+    'GET /category_keywords',
+    'GET /check_users',
+    'GET /financial_goals',
+    'GET /financial_health_score',
+    'GET /get_categories',
+    'GET /metrics',
+    'GET /profile',
+    'GET /protected',
+    'GET /recategorize/<job_id>',
+    'GET /recent_transactions',
+    'GET /recurring_budgets',
+    'GET /spending_trends',
+    'GET /stored_transactions',
+    'GET /transactions',
+    'GET /weekly_activity',
+]
+
+# Each recurring budget period and Plaid transaction id may only be stored once
+_periods = itertools.count()
+_transaction_ids = itertools.count()
+
+
+def _recurring_budget():
+    start = date(2000, 1, 1) + timedelta(days=next(_periods))
+    return {'budget_category': 'MEDICAL', 'budget_limit': 50, 'recurrence_period': 'monthly',
+            'start_date': start.isoformat(), 'end_date': (start + timedelta(days=30)).isoformat()}
+
+
+# Request bodies for the routes that are not plain GETs, built for each round
+WRITE_CASES = {
+    'POST /login': lambda ids: {'username': ids['username'], 'password': ids['password']},
+    'POST /logout': lambda ids: None,
+    'PUT /profile': lambda ids: {'email': ids['email']},
+    'POST /set_budget': lambda ids: {'budget_category': 'TRAVEL', 'budget_limit': 250},
+    'POST /set_recurring_budget': lambda ids: _recurring_budget(),
+    'PUT /update_budget/<int:budget_id>': lambda ids: {'budget_limit': 300},
+    'POST /budget_alerts/<int:alert_id>/read': lambda ids: None,
+    'POST /financial_goals': lambda ids: {'name': 'Car', 'target_amount': 3000,
+                                          'target_date': (date.today() + timedelta(days=365)).isoformat()},
+    'PUT /financial_goals/<int:goal_id>': lambda ids: {'current_amount': 250},
+    'POST /stored_transactions': lambda ids: {'account_id': ids['account_id'], 'amount': -4.5,
+                                              'date': date.today().isoformat(), 'name': 'Benchmark coffee',
+                                              'category': 'FOOD_AND_DRINK',
+                                              'transaction_id': f"benchmark_{next(_transaction_ids)}"},
+    'PUT /stored_transactions/<transaction_id>': lambda ids: {'category': 'FOOD_AND_DRINK'},
+    'PUT /stored_transactions/bulk_update': lambda ids: {'transaction_ids': ids['transaction_ids'],
+                                                         'category': 'FOOD_AND_DRINK'},
+    'POST /recategorize': lambda ids: {'dry_run': True},
+    # Read-only sub-requests run on worker threads, so their SQL is not counted
+    'POST /batch': lambda ids: {'requests': [{'path': path} for path in (
+        '/accounts', '/budget_status', '/recent_transactions', '/spending_trends',
+        '/weekly_activity', '/balance_history', '/financial_goals', '/budget_summary'
+    )]},
+    'POST /admin/profile_tokens': lambda ids: {'path': '/budget_status'},
+}
+
+CASES = sorted(GET_CASES + list(WRITE_CASES))
+
+PARAMETERS = [
+    pytest.param(name, marks=pytest.mark.xfail(reason=BROKEN[name])) if name in BROKEN else name
+    for name in CASES
+]
+
+# Tables no endpoint may read in full
+PLAN_CHECKED_TABLES = {'transaction', 'budget', 'budget_alert'}
+
+
+@pytest.fixture(scope='module')
+def ids(benchmark_client, dataset, auth_headers, admin_headers):
+    """The dataset's ids plus a recategorize job and a stored profile"""
+    job = benchmark_client.post('/recategorize', json={'dry_run': True}, headers=auth_headers).get_json()
+    token = benchmark_client.post('/admin/profile_tokens', json={'path': '/budget_status'},
+                                  headers=admin_headers).get_json()
+    profiled = benchmark_client.get('/budget_status', headers={**auth_headers, 'X-Profile-Token': token['token']})
+    return {**dataset, 'job_id': job['job_id'], 'profile_id': profiled.headers['X-Profile-Id']}
+
+
+def _routes(app):
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'handle_options':
+            continue
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            yield f"{method} {rule.rule}", rule
+
+
+def test_every_route_is_covered(benchmark_app):
+    routes = {name for name, _ in _routes(benchmark_app)}
+    assert not routes - set(CASES) - set(SKIPPED), "Benchmark these routes or add them to SKIPPED"
+    assert not (set(CASES) | set(SKIPPED)) - routes, "These routes no longer exist"
+
+
+def _request(name, app, ids, auth_headers, admin_headers):
+    """The case's (method, url, headers, body builder)"""
+    method, path = name.split(' ', 1)
+    rule = dict(_routes(app))[name]
+    url = rule.build({argument: ids[argument] for argument in rule.arguments}, append_unknown=False)[1]
+    headers = admin_headers if path.startswith('/admin') else auth_headers
+    if path == '/metrics':
+        headers = {'Authorization': f"Bearer {app.config['METRICS_TOKEN']}"}
+    return method, url, headers, WRITE_CASES.get(name, lambda ids: None)
+
+
+@pytest.mark.parametrize('name', PARAMETERS)
+def test_endpoint(name, benchmark_app, benchmark_client, ids, auth_headers, admin_headers, measure):
+    method, url, headers, body = _request(name, benchmark_app, ids, auth_headers, admin_headers)
+
+    status = measure(lambda: benchmark_client.open(url, method=method, json=body(ids), headers=headers).status_code)
+    assert status < 400
+
+
+@pytest.mark.parametrize('name', PARAMETERS)
+def test_endpoint_query_plans(name, benchmark_app, benchmark_client, ids, auth_headers, admin_headers):
+    """Explain every statement the endpoint runs, with its parameters, and
+    fail on a sequential scan of a PLAN_CHECKED_TABLES table"""
+    from query_budget import record_queries
+    from query_plans import sequential_scans
+
+    method, url, headers, body = _request(name, benchmark_app, ids, auth_headers, admin_headers)
+    with record_queries(capture_parameters=True) as recorder:
+        status = benchmark_client.open(url, method=method, json=body(ids), headers=headers).status_code
+    assert status < 400
+
+    scans = []
+    with benchmark_app.app_context():
+        for (statement, _, _), parameters in zip(recorder.statements, recorder.parameters):
+            if not statement.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE')):
+                continue
+            if isinstance(parameters, list):
+                # executemany: every row runs the same plan
+                parameters = parameters[0] if parameters else None
+            tables, _ = sequential_scans(statement, parameters)
+            scans += [f"{table}: {' '.join(statement.split())[:300]}"
+                      for table in sorted(set(tables) & PLAN_CHECKED_TABLES)]
+    assert not scans, "Sequential scans:\n" + "\n".join(scans)
@@ -0,0 +1,140 @@
+"""Drain the outbox through a local aiosmtpd server."""
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+import pytest
+from aiosmtpd.controller import Controller
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingHandler:
+    """Keeps every message with the client address it came from"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope))
+        return '250 Message accepted for delivery'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    yield controller, handler
+    if controller._thread is not None:
+        controller.stop()
+
+
+@pytest.fixture
+def outbox_app(smtp_server, tmp_path, monkeypatch):
+    """The app on its own database, sending mail to smtp_server"""
+    from config import TestConfig
+    from app import create_app
+    from extensions import db
+    from models import User
+
+    controller, _ = smtp_server
+
+    class OutboxConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp_path, 'outbox.db')}"
+        SQLALCHEMY_ECHO = False
+        MAIL_SERVER = controller.hostname
+        MAIL_PORT = controller.port
+        MAIL_USE_TLS = False
+        # Flask-Mail sends nothing under TESTING unless told to
+        MAIL_SUPPRESS_SEND = False
+
+    # The app writes its log folder into the working directory
+    monkeypatch.chdir(tmp_path)
+    app = create_app(OutboxConfig)
+    with app.app_context():
+        db.create_all()
+        for index in range(2):
+            user = User(username=f'outbox{index}', email=f'outbox{index}@example.com')
+            user.set_password('outbox-password')
+            db.session.add(user)
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _queue(user_ids, per_user):
+    from extensions import db
+    from notification_service import queue_notification
+
+    for user_id in user_ids:
+        for index in range(per_user):
+            queue_notification(user_id, 'Budget Alert', f'Alert {index}')
+    db.session.commit()
+
+
+def test_drain_outbox_sends_one_digest_per_user_over_one_connection(outbox_app, smtp_server):
+    from models import User, OutboxMessage
+    from notification_service import drain_outbox
+
+    _, handler = smtp_server
+    users = User.query.order_by(User.id).all()
+    _queue([user.id for user in users], 3)
+    due = datetime.utcnow() + timedelta(seconds=outbox_app.config['OUTBOX_DIGEST_DELAY_SECONDS'] + 1)
+
+    assert drain_outbox(logger, now=due) == 2
+
+    assert sorted(envelope.rcpt_tos[0] for _, envelope in handler.messages) == [user.email for user in users]
+    assert len({peer for peer, _ in handler.messages}) == 1
+    for _, envelope in handler.messages:
+        assert b'Subject: 3 new notifications' in envelope.content
+    assert {message.status for message in OutboxMessage.query} == {'sent'}
+
+
+def test_drain_outbox_holds_back_a_burst_until_the_digest_delay(outbox_app, smtp_server):
+    from models import User, OutboxMessage
+    from notification_service import drain_outbox
+
+    _, handler = smtp_server
+    _queue([User.query.first().id], 2)
+
+    assert drain_outbox(logger) == 0
+    assert handler.messages == []
+    assert {message.status for message in OutboxMessage.query} == {'pending'}
+
+
+def test_drain_outbox_backs_off_while_the_server_is_down(outbox_app, smtp_server):
+    from extensions import db
+    from models import User, OutboxMessage
+    from notification_service import drain_outbox
+
+    controller, _ = smtp_server
+    controller.stop()
+    _queue([user.id for user in User.query], 1)
+    config = outbox_app.config
+    now = datetime.utcnow() + timedelta(seconds=config['OUTBOX_DIGEST_DELAY_SECONDS'] + 1)
+
+    for attempt in range(1, config['OUTBOX_MAX_ATTEMPTS'] + 1):
+        assert drain_outbox(logger, now=now) == 0
+        db.session.expire_all()
+        messages = OutboxMessage.query.all()
+        assert {message.attempts for message in messages} == {attempt}
+        assert all(message.last_error for message in messages)
+        if attempt < config['OUTBOX_MAX_ATTEMPTS']:
+            delay = min(config['OUTBOX_RETRY_BASE_SECONDS'] * 2 ** (attempt - 1), config['OUTBOX_RETRY_MAX_SECONDS'])
+            assert {message.status for message in messages} == {'pending'}
+            assert {message.next_attempt_at for message in messages} == {now + timedelta(seconds=delay)}
+            # Not due again until the backoff has passed
+            assert drain_outbox(logger, now=now + timedelta(seconds=delay - 1)) == 0
+            db.session.expire_all()
+            assert {message.attempts for message in OutboxMessage.query} == {attempt}
+            now += timedelta(seconds=delay)
+
+    assert {message.status for message in OutboxMessage.query} == {'failed'}
@@ -0,0 +1,60 @@
+"""Time the budget and sync hot paths on the seeded dataset."""
+import random
+import pytest
+
+
+@pytest.fixture
+def in_app(benchmark_app):
+    """Run a function in its own app context, as a job or request would"""
+    def wrap(function):
+        def run():
+            with benchmark_app.app_context():
+                return function()
+        return run
+    return wrap
+
+
+def test_update_budget_spending(dataset, in_app, measure):
+    from budget_service import update_budget_spending
+    measure(in_app(lambda: update_budget_spending(dataset['user_id'])))
+
+
+def test_check_budget_alerts(dataset, in_app, measure):
+    from budget_service import check_budget_alerts
+    measure(in_app(lambda: check_budget_alerts(dataset['user_id'])))
+
+
+def test_evaluate_budget_alerts(dataset, in_app, measure):
+    from budget_service import evaluate_budget_alerts
+    measure(in_app(evaluate_budget_alerts))
+
+
+def test_budget_history(dataset, in_app, measure):
+    from extensions import db
+    from models import Budget
+    from budget_service import budget_history
+    measure(in_app(lambda: budget_history(db.session.get(Budget, dataset['budget_id']), 24)))
+
+
+def test_create_next_recurring_budgets(dataset, in_app, measure):
+    from budget_service import create_next_recurring_budgets
+    measure(in_app(create_next_recurring_budgets))
+
+
+def test_store_new_plaid_transactions(benchmark_app, dataset, in_app, measure):
+    from plaid_service import store_plaid_transactions
+    from synthetic_data import plaid_transactions
+
+    rng = random.Random(0)
+    measure(in_app(lambda: store_plaid_transactions(
+        dataset['user_id'], list(plaid_transactions(rng, dataset['plaid_account_ids'], 500)), benchmark_app.logger
+    )))
+
+
+def test_store_already_stored_plaid_transactions(benchmark_app, dataset, in_app, measure):
+    from plaid_service import store_plaid_transactions
+    from synthetic_data import plaid_transactions
+
+    already_stored = list(plaid_transactions(random.Random(1), dataset['plaid_account_ids'], 500))
+    in_app(lambda: store_plaid_transactions(dataset['user_id'], already_stored, benchmark_app.logger))()
+    measure(in_app(lambda: store_plaid_transactions(dataset['user_id'], already_stored, benchmark_app.logger)))
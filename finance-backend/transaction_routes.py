@@ -0,0 +1,267 @@
+import traceback
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, jsonify, request, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db, cache
+from replica_routing import read_only
+from query_budget import query_budget
+from models import Account, Transaction
+from category_service import auto_categorize_transaction, update_category_keywords
+from budget_service import check_budget_alerts
+from merchant_memo_service import record_merchant_categories
+from archive_service import with_archived
+
+transaction_bp = Blueprint('transaction', __name__)
+
+
+@transaction_bp.route('/transactions', methods=['GET'])
+@jwt_required()
+# One entry per user, which cache.delete(f'transactions_user_{user_id}')
+# invalidates; other day ranges are not cached
+@cache.cached(timeout=3600, key_prefix=lambda: f'transactions_user_{get_jwt_identity()}',
+              unless=lambda: 'days' in request.args)
+@read_only
+@query_budget(2)
+def get_transactions():
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"Fetching transactions for user {user_id}")
+
+    try:
+        # Get parameters
+        days = request.args.get('days', default=30, type=int)
+        start_date = datetime.now().date() - timedelta(days=days)
+
+        # Query stored transactions
+        transactions = Transaction.query.filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= start_date
+        ).order_by(Transaction.date.desc()).all()
+        # Ranges reaching past the archive horizon also read the archive
+        transactions = with_archived(transactions, user_id, start_date)
+
+        return jsonify([t.to_dict() for t in transactions]), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error in get_transactions: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+
+@transaction_bp.route('/recent_transactions', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(1)
+def get_recent_transactions():
+    user_id = get_jwt_identity()
+    limit = request.args.get('limit', 5, type=int)  # Default to 5 recent transactions
+    transactions = Transaction.query.filter_by(user_id=user_id).order_by(Transaction.date.desc()).limit(limit).all()
+    return jsonify([{
+        'id': t.id,
+        'date': t.date.isoformat(),
+        'description': t.name,
+        'amount': float(t.amount),
+        'category': t.category
+    } for t in transactions]), 200
+
+
+@transaction_bp.route('/stored_transactions', methods=['POST'])
+@jwt_required()
+def add_transaction():
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    # Validate input data
+    required_fields = ['amount', 'date', 'name', 'account_id']
+    if not all(field in data for field in required_fields):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    # Auto-categorize the transaction if no category is provided
+    category = data.get('category') or auto_categorize_transaction(user_id, data['name'], data.get('merchant_name'))
+
+    try:
+        # Create new transaction
+        new_transaction = Transaction(
+            user_id=user_id,
+            transaction_id=data.get('transaction_id'),
+            amount=float(data['amount']),
+            date=datetime.fromisoformat(data['date']),
+            name=data['name'],
+            merchant_name=data.get('merchant_name'),
+            category=category,
+            account_id=data['account_id']
+        )
+        db.session.add(new_transaction)
+
+        # Update account balance
+        account = Account.query.get(data['account_id'])
+        if not account or account.user_id != user_id:
+            return jsonify({"error": "Invalid account"}), 400
+
+        account.balance += float(data['amount'])
+
+        db.session.commit()
+        cache.delete(f'transactions_user_{user_id}')
+        cache.delete(f'accounts_user_{user_id}')
+
+        # Check budget alerts
+        alerts = check_budget_alerts(user_id)
+
+        return jsonify({
+            "message": "Transaction added successfully",
+            "transaction": new_transaction.to_dict(),
+            "account": account.to_dict(),
+            "budget_alerts": [{
+                'id': alert.id,
+                'budget_category': alert.budget.budget_category,
+                'alert_type': alert.alert_type,
+                'message': alert.message,
+                'created_at': alert.created_at.isoformat()
+            } for alert in alerts]
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error adding transaction: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@transaction_bp.route('/stored_transactions', methods=['GET'])
+@jwt_required()
+@read_only
+@query_budget(2)
+def get_stored_transactions():
+    user_id = get_jwt_identity()
+    try:
+        days_requested = request.args.get('days_requested', default=30, type=int)
+        start_date = datetime.now().date() - timedelta(days=days_requested)
+
+        transactions = Transaction.query.filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= start_date
+        ).order_by(Transaction.date.desc()).all()
+        transactions = with_archived(transactions, user_id, start_date)
+
+        transactions_list = []
+        for transaction in transactions:
+            transaction_dict = {
+                'id': transaction.id,
+                'date': transaction.date.isoformat(),
+                'name': transaction.name,
+                'amount': float(transaction.amount),
+                'category': transaction.category,
+                'subcategory': transaction.subcategory,
+                'merchant_name': transaction.merchant_name,
+                'payment_channel': transaction.payment_channel,
+                'pending': transaction.pending,
+                'location': {
+                    'address': transaction.location_address,
+                    'city': transaction.location_city,
+                    'region': transaction.location_region,
+                    'postal_code': transaction.location_postal_code,
+                    'country': transaction.location_country,
+                    'lat': transaction.location_lat,
+                    'lon': transaction.location_lon
+                } if transaction.location_city else None,
+                'authorized_date': transaction.authorized_date.isoformat() if transaction.authorized_date else None,
+                'personal_finance_category': transaction.personal_finance_category,
+                'logo_url': transaction.logo_url,
+                'website': transaction.website,
+                'iso_currency_code': transaction.iso_currency_code,
+                'account_id': transaction.account_id
+            }
+            transactions_list.append(transaction_dict)
+
+        return jsonify({'transactions': transactions_list}), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error in get_stored_transactions: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+@transaction_bp.route('/stored_transactions/bulk_update', methods=['PUT'])
+@jwt_required()
+def bulk_update_transaction_categories():
+    # The classifier pulls in numpy, so it is loaded on the first correction
+    from classifier_service import learn_categories
+
+    user_id = get_jwt_identity()
+    data = request.json
+    transaction_ids = data.get('transaction_ids', [])
+    new_category = data.get('category')
+
+    if not transaction_ids or not new_category:
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    try:
+        updated_count = Transaction.query.filter(
+            Transaction.id.in_(transaction_ids),
+            Transaction.user_id == user_id
+        ).update({Transaction.category: new_category}, synchronize_session=False)
+
+        # Count the corrections towards the shared merchant memo and the user's classifier
+        merchants = db.session.query(Transaction.merchant_name, Transaction.name).filter(
+            Transaction.id.in_(transaction_ids),
+            Transaction.user_id == user_id
+        ).all()
+        record_merchant_categories(
+            [(merchant_name or name, new_category) for merchant_name, name in merchants], 'user', user_id
+        )
+        learn_categories(user_id, [(name, merchant_name) for merchant_name, name in merchants], new_category)
+
+        db.session.commit()
+
+        return jsonify({
+            'message': f'Successfully updated {updated_count} transactions',
+            'updated_count': updated_count
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@transaction_bp.route('/stored_transactions/<transaction_id>', methods=['PUT'])
+@jwt_required()
+def update_stored_transaction_category(transaction_id):
+    from classifier_service import learn_categories
+
+    if transaction_id == 'null' or transaction_id == 'undefined':
+        return jsonify({'error': 'Invalid transaction ID'}), 400
+
+    user_id = get_jwt_identity()
+    data = request.json
+    new_category = data.get('category')
+
+    transaction = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
+    if not transaction:
+        current_app.logger.error(f"Stored transaction not found for id: {transaction_id}")
+        return jsonify({'error': 'Stored transaction not found'}), 404
+
+    transaction.category = new_category
+    record_merchant_categories([(transaction.merchant_name or transaction.name, new_category)], 'user', user_id)
+    learn_categories(user_id, [(transaction.name, transaction.merchant_name)], new_category)
+    db.session.commit()
+    cache.delete(f'transactions_user_{user_id}')
+
+    # Update category keywords
+    update_category_keywords(user_id, new_category, transaction.name)
+
+    return jsonify({'message': 'Stored transaction category updated successfully'}), 200
+
+
+@transaction_bp.route('/download_receipt/<transaction_id>', methods=['GET'])
+@jwt_required()
+def download_receipt(transaction_id):
+    user_id = get_jwt_identity()
+    transaction = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
+
+    if not transaction:
+        return jsonify({'error': 'Transaction not found'}), 404
+
+    if not transaction.receipt_path:
+        return jsonify({'error': 'No receipt available for this transaction'}), 404
+
+    try:
+        return send_file(transaction.receipt_path, as_attachment=True)
+    except Exception as e:
+        current_app.logger.error(f"Error downloading receipt: {str(e)}")
+        return jsonify({'error': 'Failed to download receipt'}), 500